@@ -0,0 +1,84 @@
+from typing import Optional, Tuple
+from vec3 import Point3
+from ray import Ray
+
+
+class AABB:
+    def __init__(self, minimum: Point3, maximum: Point3):
+        self.minimum = minimum
+        self.maximum = maximum
+
+    # slab test, returns the entry distance or None on a miss
+    def hit(self, r: Ray, t_min: float, t_max: float) -> Optional[float]:
+        interval = self.interval(r, t_min, t_max)
+        return None if interval is None else interval[0]
+
+    # (entry, exit) distances clipped to [t_min, t_max], or None on a miss
+    def interval(self, r: Ray, t_min: float, t_max: float) -> Optional[Tuple[float, float]]:
+        # unrolled per axis, a loop over indices costs more than the test itself
+        o = r.origin
+        d = r.direction
+        minimum = self.minimum
+        maximum = self.maximum
+        if d.x != 0.0:
+            inv_d = 1.0 / d.x
+            t0 = (minimum.x - o.x) * inv_d
+            t1 = (maximum.x - o.x) * inv_d
+            if inv_d < 0.0:
+                t0, t1 = t1, t0
+            if t0 > t_min:
+                t_min = t0
+            if t1 < t_max:
+                t_max = t1
+            if t_max < t_min:
+                return None
+        elif o.x < minimum.x or o.x > maximum.x:
+            return None
+        if d.y != 0.0:
+            inv_d = 1.0 / d.y
+            t0 = (minimum.y - o.y) * inv_d
+            t1 = (maximum.y - o.y) * inv_d
+            if inv_d < 0.0:
+                t0, t1 = t1, t0
+            if t0 > t_min:
+                t_min = t0
+            if t1 < t_max:
+                t_max = t1
+            if t_max < t_min:
+                return None
+        elif o.y < minimum.y or o.y > maximum.y:
+            return None
+        if d.z != 0.0:
+            inv_d = 1.0 / d.z
+            t0 = (minimum.z - o.z) * inv_d
+            t1 = (maximum.z - o.z) * inv_d
+            if inv_d < 0.0:
+                t0, t1 = t1, t0
+            if t0 > t_min:
+                t_min = t0
+            if t1 < t_max:
+                t_max = t1
+            if t_max < t_min:
+                return None
+        elif o.z < minimum.z or o.z > maximum.z:
+            return None
+        return t_min, t_max
+
+    def centroid(self, axis: int) -> float:
+        return 0.5 * (self.minimum[axis] + self.maximum[axis])
+
+    def surface_area(self) -> float:
+        dx = self.maximum.x - self.minimum.x
+        dy = self.maximum.y - self.minimum.y
+        dz = self.maximum.z - self.minimum.z
+        return 2.0 * (dx * dy + dy * dz + dz * dx)
+
+    @staticmethod
+    def surrounding_box(box0: 'AABB', box1: 'AABB') -> 'AABB':
+        small = Point3(min(box0.minimum.x, box1.minimum.x),
+                       min(box0.minimum.y, box1.minimum.y),
+                       min(box0.minimum.z, box1.minimum.z))
+        big = Point3(max(box0.maximum.x, box1.maximum.x),
+                     max(box0.maximum.y, box1.maximum.y),
+                     max(box0.maximum.z, box1.maximum.z))
+        return AABB(small, big)
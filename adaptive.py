@@ -0,0 +1,48 @@
+from math import sqrt
+from typing import Sequence
+from vec3 import Color
+
+# two sided 95% confidence
+Z_95 = 1.96
+# keeps the display-space error finite for black pixels
+MIN_LUMINANCE = 1e-4
+
+
+def luminance(color: Color) -> float:
+    return 0.2126 * color.x + 0.7152 * color.y + 0.0722 * color.z
+
+
+class AdaptiveSampling:
+    def __init__(self, min_spp: int = 16, max_spp: int = 100, noise_threshold: float = 0.01, batch: int = 4):
+        if not 1 <= min_spp <= max_spp:
+            raise ValueError(f"need 1 <= min_spp <= max_spp, got {min_spp} and {max_spp}")
+        if batch < 1:
+            raise ValueError(f"need a batch of at least 1 sample, got {batch}")
+        self.min_spp = min_spp
+        self.max_spp = max_spp
+        self.noise_threshold = noise_threshold
+        self.batch = batch
+
+    # n samples with running luminance mean and sum of squared deviations m2 (Welford)
+    def converged(self, n: int, mean: float, m2: float) -> bool:
+        if n < self.min_spp:
+            return False
+        if n >= self.max_spp:
+            return True
+        # the variance needs two samples, whatever min_spp allows
+        if n < 2 or n % self.batch:
+            return False
+        half_width = Z_95 * sqrt(m2 / (n - 1) / n)
+        # write_color applies gamma 2, so an error dL shows up as dL / (2 sqrt(L)) on screen
+        return half_width / (2 * sqrt(max(mean, MIN_LUMINANCE))) < self.noise_threshold
+
+
+# sample counts as a P3 image, blue for min_spp through red for max_spp, rows bottom-up like the framebuffer
+def write_heatmap(path: str, counts: Sequence[float], width: int, height: int, min_spp: int, max_spp: int):
+    span = max(1, max_spp - min_spp)
+    with open(path, "w") as f:
+        f.write(f"P3\n{width} {height}\n255\n")
+        for row in reversed(range(height)):
+            for x in range(width):
+                t = min(1.0, max(0.0, (counts[row * width + x] - min_spp) / span))
+                f.write(f"{int(255 * t)} {int(255 * (1 - abs(2 * t - 1)))} {int(255 * (1 - t))}\n")
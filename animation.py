@@ -0,0 +1,122 @@
+import json
+from typing import Dict, List, Optional, Sequence, Tuple
+from bvh import BVHNode
+from camera import Camera
+from hittable import HittableList, Instance, Torus, Transform
+from integrator import PathStats
+from samplers import Sampler
+from vec3 import Point3, Vec3
+
+# keyframe fields, points are [x, y, z] in the spec file
+CAMERA_FIELDS = ("lookfrom", "lookat", "vup", "vfov", "aperture", "focus_dist")
+VECTOR_FIELDS = ("lookfrom", "lookat", "vup", "center")
+
+
+# linear between the keys on either side of frame, held constant before the first and after the last.
+# keys are (frame, value) sorted by frame, values are floats or Vec3
+def interpolate(keys: Sequence[Tuple[int, object]], frame: float):
+    if frame <= keys[0][0]:
+        return keys[0][1]
+    for (f0, a), (f1, b) in zip(keys, keys[1:]):
+        if frame <= f1:
+            u = (frame - f0) / (f1 - f0)
+            return a + (b - a) * u
+    return keys[-1][1]
+
+
+def _value(field: str, raw):
+    return Vec3(*raw) if field in VECTOR_FIELDS else float(raw)
+
+
+# what the spec file describes: a frame count, camera keys and per-object center keys
+class Animation:
+    def __init__(self, frames: int, camera_keys: Dict[str, List[Tuple[int, object]]], motions: Dict[int, List[Tuple[int, Point3]]]):
+        if frames < 1:
+            raise ValueError("an animation needs at least one frame")
+        self.frames = frames
+        self.camera_keys = camera_keys
+        self.motions = motions
+
+    # {"frames": 48,
+    #  "camera": [{"frame": 0, "lookfrom": [13, 2, 3], "vfov": 20}, {"frame": 47, "lookfrom": [9, 2, 8]}],
+    #  "motion": [{"object": 484, "keys": [{"frame": 0, "center": [4, 1, 0]}, {"frame": 47, "center": [4, 2, 0]}]}]}
+    # a camera field only needs to appear in the keys where it changes, fields never keyed keep the still camera's value
+    @staticmethod
+    def load(path: str) -> 'Animation':
+        with open(path) as f:
+            spec = json.load(f)
+        camera_keys: Dict[str, List[Tuple[int, object]]] = {}
+        for key in sorted(spec.get("camera", []), key=lambda key: key["frame"]):
+            for field in CAMERA_FIELDS:
+                if field in key:
+                    camera_keys.setdefault(field, []).append((key["frame"], _value(field, key[field])))
+        motions = {}
+        for motion in spec.get("motion", []):
+            keys = sorted(motion["keys"], key=lambda key: key["frame"])
+            motions[motion["object"]] = [(key["frame"], _value("center", key["center"])) for key in keys]
+        return Animation(spec["frames"], camera_keys, motions)
+
+
+# the static world and its BVH, built once and shipped to each worker once, posed per frame in place.
+# only the moving objects' centers change, and only the BVH boxes above them are refit. an instance has no center
+# of its own: its center is where its transform puts the middle of its object's box, and it moves by a translation
+# on top of the transform it started with
+class AnimatedScene:
+    def __init__(self, world: HittableList, animation: Animation, camera_defaults: Dict[str, object], aspect_ratio: float):
+        # object index: (transform at rest, center at rest) of each moving instance
+        self.instances: Dict[int, Tuple[Transform, Point3]] = {}
+        for index in animation.motions:
+            if not 0 <= index < len(world.objects):
+                raise ValueError(f"motion for object {index}, the world has {len(world.objects)}")
+            obj = world.objects[index]
+            if isinstance(obj, Instance):
+                box = obj.object.bounding_box()
+                if box is None:
+                    raise ValueError(f"motion for object {index}, an instance of unbounded {type(obj.object).__name__} has no center")
+                self.instances[index] = (obj.transform, obj.transform.point((box.minimum + box.maximum) * 0.5))
+            elif not hasattr(obj, "center"):
+                raise ValueError(f"motion for object {index}, a {type(obj).__name__} has no center to move")
+        self.animation = animation
+        self.camera_defaults = camera_defaults
+        self.aspect_ratio = aspect_ratio
+        self.world = world
+        self.bvh = BVHNode(world)
+        # pickled together with the tree, so the paths still point into each worker's copy of it
+        self.paths = {index: self.bvh.path_to(world.objects[index]) for index in animation.motions}
+        self.frame: Optional[int] = None
+        self.camera: Optional[Camera] = None
+
+    def camera_at(self, frame: int) -> Camera:
+        p = {field: interpolate(self.animation.camera_keys[field], frame) if field in self.animation.camera_keys else self.camera_defaults[field]
+             for field in CAMERA_FIELDS}
+        return Camera(p["lookfrom"], p["lookat"], p["vup"], p["aperture"], p["focus_dist"], self.aspect_ratio, p["vfov"])
+
+    # a worker keeps the last frame it posed, tiles of the same frame mostly land together
+    def pose(self, frame: int) -> Tuple[Camera, BVHNode]:
+        if frame != self.frame:
+            for index, keys in self.animation.motions.items():
+                obj = self.world.objects[index]
+                center = interpolate(keys, frame)
+                if index in self.instances:
+                    transform, rest = self.instances[index]
+                    obj.transform = Transform.translate(center - rest) @ transform
+                else:
+                    obj.center = center
+                if isinstance(obj, Torus):
+                    obj.box = obj.bounding_box()
+                BVHNode.refit(self.paths[index])
+            self.camera = self.camera_at(frame)
+            self.frame = frame
+        return self.camera, self.bvh
+
+
+# generate.render_tile for one frame of an AnimatedScene, the tile renderer for scheduler.render_frames
+def render_tile(width: int, height: int, samples_per_pixel: int, scene: AnimatedScene, x0: int, y0: int, x1: int, y1: int, frame: int = 0, iterative: bool = False, roulette_depth: Optional[int] = None, stats: Optional[PathStats] = None, sampler: Optional[Sampler] = None, max_depth: Optional[int] = None) -> tuple:
+    from generate import render_tile as render_still_tile
+    camera, world = scene.pose(frame)
+    return render_still_tile(width, height, samples_per_pixel, camera, world, x0, y0, x1, y1, iterative, roulette_depth, stats, sampler, max_depth)
+
+
+# output path for a frame, from a printf style pattern like frames/frame_%04d.png
+def frame_path(pattern: str, frame: int) -> str:
+    return pattern % frame
@@ -0,0 +1,190 @@
+import importlib.util
+import sys
+from typing import Callable, Dict, List
+from camera import Camera
+from hittable import HittableList, Sphere, Torus
+from material import Dielectric, Lambertian, Material, Metal
+
+# material kinds in SceneBuffers.material_kind
+LAMBERTIAN = 0
+METAL = 1
+DIELECTRIC = 2
+
+
+# struct-of-arrays copy of a HittableList and Camera for compiled kernels
+class SceneBuffers:
+    def __init__(self, world: HittableList, camera: Camera):
+        import numpy as np
+        materials: List[Material] = []
+        material_ids: Dict[int, int] = {}
+
+        def material_id(material: Material) -> int:
+            key = id(material)
+            if key not in material_ids:
+                material_ids[key] = len(materials)
+                materials.append(material)
+            return material_ids[key]
+
+        spheres = [obj for obj in world.objects if isinstance(obj, Sphere)]
+        tori = [obj for obj in world.objects if isinstance(obj, Torus)]
+        if len(spheres) + len(tori) != len(world.objects):
+            unsupported = {type(obj).__name__ for obj in world.objects if not isinstance(obj, (Sphere, Torus))}
+            raise TypeError(f"compiled backends only support Sphere and Torus, got {', '.join(sorted(unsupported))}")
+
+        self.sphere_centers = np.array([s.center.e for s in spheres], dtype=np.float64).reshape(len(spheres), 3)
+        self.sphere_radii = np.array([s.radius for s in spheres], dtype=np.float64)
+        self.sphere_material = np.array([material_id(s.material) for s in spheres], dtype=np.int64)
+        self.torus_centers = np.array([t.center.e for t in tori], dtype=np.float64).reshape(len(tori), 3)
+        # major, minor
+        self.torus_radii = np.array([(t.major_radius, t.minor_radius) for t in tori], dtype=np.float64).reshape(len(tori), 2)
+        self.torus_material = np.array([material_id(t.material) for t in tori], dtype=np.int64)
+
+        n = len(materials)
+        self.material_kind = np.zeros(n, dtype=np.int64)
+        self.material_albedo = np.ones((n, 3), dtype=np.float64)
+        self.material_fuzz = np.zeros(n, dtype=np.float64)
+        self.material_ior = np.ones(n, dtype=np.float64)
+        for i, material in enumerate(materials):
+            if isinstance(material, Lambertian):
+                self.material_kind[i] = LAMBERTIAN
+                self.material_albedo[i] = material.albedo.e
+            elif isinstance(material, Metal):
+                self.material_kind[i] = METAL
+                self.material_albedo[i] = material.albedo.e
+                self.material_fuzz[i] = material.fuzz
+            elif isinstance(material, Dielectric):
+                self.material_kind[i] = DIELECTRIC
+                self.material_ior[i] = material.index_of_refraction
+            else:
+                raise TypeError(f"compiled backends do not support {type(material).__name__}")
+
+        self.camera = camera_array(camera)
+        self.scene_file = None
+
+    # geometry views straight into a scene_file.SceneFile's map, pickled as its path
+    @classmethod
+    def from_scene_file(cls, scene) -> 'SceneBuffers':
+        import numpy as np
+        from scene_file import MATERIAL_PARAMS, SPHERE_FIELDS, TORUS_FIELDS
+        buffers = cls.__new__(cls)
+        buffers.scene_file = scene
+        spheres = np.frombuffer(scene.sphere_geometry, dtype=np.float64).reshape(-1, SPHERE_FIELDS)
+        buffers.sphere_centers = spheres[:, :3]
+        buffers.sphere_radii = spheres[:, 3]
+        buffers.sphere_material = np.frombuffer(scene.sphere_material, dtype=np.int64)
+        tori = np.frombuffer(scene.torus_geometry, dtype=np.float64).reshape(-1, TORUS_FIELDS)
+        buffers.torus_centers = tori[:, :3]
+        buffers.torus_radii = tori[:, 3:]
+        buffers.torus_material = np.frombuffer(scene.torus_material, dtype=np.int64)
+        # the material table is small, so the per-kind columns are plain copies
+        buffers.material_kind = np.frombuffer(scene.material_kind, dtype=np.int64)
+        params = np.frombuffer(scene.material_params, dtype=np.float64).reshape(-1, MATERIAL_PARAMS)
+        buffers.material_albedo = params[:, :3].copy()
+        buffers.material_fuzz = np.where(buffers.material_kind == METAL, params[:, 3], 0.0)
+        buffers.material_ior = np.where(buffers.material_kind == DIELECTRIC, params[:, 3], 1.0)
+        buffers.camera = camera_array(scene.camera())
+        return buffers
+
+    def __getstate__(self):
+        if self.scene_file is None:
+            return self.__dict__
+        return {"scene_file": self.scene_file}
+
+    def __setstate__(self, state):
+        if state.get("scene_file") is not None:
+            state = SceneBuffers.from_scene_file(state["scene_file"]).__dict__
+        self.__dict__.update(state)
+
+
+# origin, lower left corner, horizontal, vertical, u, v, lens radius
+def camera_array(camera: Camera):
+    import numpy as np
+    return np.array(
+        camera.origin.e + camera.lower_left_corner.e + camera.horizontal.e
+        + camera.vertical.e + camera.u.e + camera.v.e + (camera.lens_radius,),
+        dtype=np.float64)
+
+
+class Backend:
+    name = ""
+
+    @staticmethod
+    def available() -> bool:
+        return True
+
+    # a picklable function with the scheduler's tile renderer signature
+    def tile_renderer(self) -> Callable:
+        raise NotImplementedError
+
+    # everything between (width, height) and the tile rectangle
+    def render_args(self, samples_per_pixel: int, camera: Camera, world: HittableList) -> tuple:
+        raise NotImplementedError
+
+    # the same from a scene_file.SceneFile, backends that can read its map directly override this
+    def scene_file_render_args(self, samples_per_pixel: int, scene) -> tuple:
+        return self.render_args(samples_per_pixel, scene.camera(), scene.world())
+
+
+# the pure-python path, the reference the others are checked against
+class ReferenceBackend(Backend):
+    name = "scalar"
+
+    def tile_renderer(self) -> Callable:
+        from generate import render_tile
+        return render_tile
+
+    def render_args(self, samples_per_pixel: int, camera: Camera, world: HittableList) -> tuple:
+        from bvh import BVHNode
+        return (samples_per_pixel, camera, BVHNode(world))
+
+    def scene_file_render_args(self, samples_per_pixel: int, scene) -> tuple:
+        from scene_file import SceneBVH
+        return (samples_per_pixel, scene.camera(), SceneBVH(scene))
+
+
+class WavefrontBackend(Backend):
+    name = "wavefront"
+
+    @staticmethod
+    def available() -> bool:
+        return importlib.util.find_spec("numpy") is not None
+
+    def tile_renderer(self) -> Callable:
+        import wavefront
+        return wavefront.render_tile
+
+    def render_args(self, samples_per_pixel: int, camera: Camera, world: HittableList) -> tuple:
+        import wavefront
+        return (samples_per_pixel, wavefront.CameraArrays(camera), wavefront.SceneArrays(world))
+
+
+class NumbaBackend(Backend):
+    name = "numba"
+
+    @staticmethod
+    def available() -> bool:
+        return importlib.util.find_spec("numba") is not None and importlib.util.find_spec("numpy") is not None
+
+    def tile_renderer(self) -> Callable:
+        import numba_kernels
+        return numba_kernels.render_tile
+
+    def render_args(self, samples_per_pixel: int, camera: Camera, world: HittableList) -> tuple:
+        return (samples_per_pixel, SceneBuffers(world, camera))
+
+    def scene_file_render_args(self, samples_per_pixel: int, scene) -> tuple:
+        return (samples_per_pixel, SceneBuffers.from_scene_file(scene))
+
+
+BACKENDS: Dict[str, type] = {backend.name: backend for backend in (ReferenceBackend, WavefrontBackend, NumbaBackend)}
+
+
+# falls back to the reference backend, with a note on stderr, when the requested one can't be imported
+def get_backend(name: str) -> Backend:
+    if name not in BACKENDS:
+        raise ValueError(f"unknown backend {name!r}, expected one of {tuple(BACKENDS)}")
+    backend = BACKENDS[name]
+    if not backend.available():
+        print(f"backend {name!r} is not available here, falling back to {ReferenceBackend.name!r}", file=sys.stderr)
+        backend = ReferenceBackend
+    return backend()
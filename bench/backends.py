@@ -0,0 +1,64 @@
+# parity and speed of each available backend against the pure-python reference
+# run from the repo root: python -m bench.backends, exits non-zero if a backend drifts past --tolerance
+import argparse
+import sys
+import time
+import backends
+import generate
+from hittable import HittableList, Torus
+from material import Metal
+from vec3 import Color, Point3
+
+
+# the same seeded world, the second time with a torus added
+def scenes(seed: int):
+    yield "random_scene", generate.random_scene(seed)
+    world = generate.random_scene(seed)
+    world.add(Torus(Point3(0, 1, 2), 1.2, 0.3, Metal(Color(0.8, 0.8, 0.9), 0.1)))
+    yield "random_scene+torus", world
+
+
+# per-pixel mean colors of a whole image rendered as one tile
+def render(backend: backends.Backend, world: HittableList, width: int, height: int, spp: int):
+    render_tile = backend.tile_renderer()
+    args = backend.render_args(spp, generate.camera, world)
+    start = time.perf_counter()
+    colors, counts = render_tile(width, height, *args, 0, 0, width, height)
+    elapsed = time.perf_counter() - start
+    return [(c.x / n, c.y / n, c.z / n) for c, n in zip(colors, counts)], elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--width", type=int, default=48)
+    parser.add_argument("--spp", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tolerance", type=float, default=0.02, help="largest allowed difference of the image means")
+    args = parser.parse_args()
+    height = int(args.width / generate.aspect_ratio)
+
+    failed = False
+    print(f"{'scene':>20} {'backend':>10} {'seconds':>8} {'mean abs px err':>16} {'image mean err':>15}")
+    for scene_name, world in scenes(args.seed):
+        reference, elapsed = render(backends.ReferenceBackend(), world, args.width, height, args.spp)
+        reference_mean = sum(sum(p) for p in reference) / (3 * len(reference))
+        print(f"{scene_name:>20} {'scalar':>10} {elapsed:>8.2f} {'-':>16} {'-':>15}")
+        for name, backend in backends.BACKENDS.items():
+            if name == "scalar" or not backend.available():
+                continue
+            try:
+                pixels, elapsed = render(backend(), world, args.width, height, args.spp)
+            except TypeError as error:
+                print(f"{scene_name:>20} {name:>10} skipped: {error}")
+                continue
+            pixel_error = sum(abs(a - b) for p, q in zip(pixels, reference) for a, b in zip(p, q)) / (3 * len(reference))
+            mean_error = abs(sum(sum(p) for p in pixels) / (3 * len(pixels)) - reference_mean)
+            failed |= mean_error > args.tolerance
+            print(f"{scene_name:>20} {name:>10} {elapsed:>8.2f} {pixel_error:>16.4f} {mean_error:>15.4f}")
+    if failed:
+        print(f"image mean error above {args.tolerance}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
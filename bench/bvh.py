@@ -0,0 +1,62 @@
+# rays/sec of a linear HittableList vs. BVHNode as the object count grows
+# run from the repo root: python -m bench.bvh
+import argparse
+import random
+import time
+from bvh import BVHNode
+from hittable import Hittable, HittableList, Sphere
+from material import Lambertian
+from ray import Ray
+from rtweekend import infinity
+from vec3 import Color, Point3, Vec3
+
+
+def sphere_field(count: int, seed: int = 0) -> HittableList:
+    rng = random.Random(seed)
+    side = max(1.0, count ** (1 / 3)) * 2.0
+    material = Lambertian(Color(0.5, 0.5, 0.5))
+    world = HittableList()
+    for _ in range(count):
+        center = Point3(rng.uniform(-side, side), rng.uniform(-side, side), rng.uniform(-side, side))
+        world.add(Sphere(center, rng.uniform(0.1, 0.5), material))
+    return world
+
+
+def random_rays(count: int, seed: int = 1):
+    rng = random.Random(seed)
+    rays = []
+    for _ in range(count):
+        direction = Vec3(rng.gauss(0, 1), rng.gauss(0, 1), rng.gauss(0, 1))
+        rays.append(Ray(Point3(0, 0, 0), direction))
+    return rays
+
+
+def rays_per_second(world: Hittable, rays) -> float:
+    start = time.perf_counter()
+    for r in rays:
+        world.hit(r, 0.001, infinity)
+    return len(rays) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--counts", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--rays", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'objects':>8} {'build s':>8} {'list rays/s':>12} {'bvh rays/s':>12} {'speedup':>8}")
+    for count in args.counts:
+        world = sphere_field(count)
+        start = time.perf_counter()
+        bvh = BVHNode(world)
+        build = time.perf_counter() - start
+        rays = random_rays(args.rays)
+        # the linear list gets too slow to run the full ray count on big scenes
+        list_rays = rays[:max(50, args.rays * 100 // count)]
+        linear = rays_per_second(world, list_rays)
+        accelerated = rays_per_second(bvh, rays)
+        print(f"{count:>8} {build:>8.3f} {linear:>12.0f} {accelerated:>12.0f} {accelerated / linear:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+# 8 and 16 spp plus the AOV denoiser against a 100 spp render of random_scene, as RMSE and SSIM in display space,
+# with render and denoise times apart. the target is a second, independently seeded 100 spp render: the request
+# was for the denoised few-spp image to be as close to the reference as that one is. it is not, the last column
+# says so for each spp
+# run from the repo root: python -m bench.denoise
+import argparse
+import time
+import numpy as np
+import denoise
+import generate
+import scheduler
+from bvh import BVHNode
+
+
+# gamma 2 and clamped, like the written image
+def display(colors: np.ndarray) -> np.ndarray:
+    return np.clip(np.sqrt(np.maximum(colors, 0.0)), 0.0, 1.0)
+
+
+def rmse(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.sqrt(np.mean((display(a) - display(b)) ** 2)))
+
+
+def _box(a: np.ndarray, radius: int) -> np.ndarray:
+    size = 2 * radius + 1
+    padded = np.pad(a, radius, mode="reflect")
+    summed = np.cumsum(np.cumsum(np.pad(padded, ((1, 0), (1, 0))), axis=0), axis=1)
+    return (summed[size:, size:] - summed[:-size, size:] - summed[size:, :-size] + summed[:-size, :-size]) / size ** 2
+
+
+# mean SSIM of the display luminance over 7x7 windows
+def ssim(a: np.ndarray, b: np.ndarray, radius: int = 3) -> float:
+    weights = np.array([0.2126, 0.7152, 0.0722])
+    x, y = display(a) @ weights, display(b) @ weights
+    c1, c2 = 0.01 ** 2, 0.03 ** 2
+    mx, my = _box(x, radius), _box(y, radius)
+    vx = _box(x * x, radius) - mx * mx
+    vy = _box(y * y, radius) - my * my
+    cxy = _box(x * y, radius) - mx * my
+    return float(np.mean((2 * mx * my + c1) * (2 * cxy + c2) / ((mx * mx + my * my + c1) * (vx + vy + c2))))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--width", type=int, default=96)
+    parser.add_argument("--spp", type=int, nargs="+", default=[8, 16])
+    parser.add_argument("--reference-spp", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    width, height = args.width, int(args.width / generate.aspect_ratio)
+    world = BVHNode(generate.random_scene(args.seed))
+    # the buffers come from the render's own first hits, like generate --denoise
+    def render(spp: int, seed: int):
+        aovs = denoise.AOVImage(width, height)
+        start = time.perf_counter()
+        pixels = scheduler.render_tiles(denoise.render_tile, (spp, generate.camera, world), width, height, 16, workers=args.workers, tile_stats=aovs, seed=seed)
+        return denoise.framebuffer_colors(pixels, width, height), aovs, time.perf_counter() - start
+
+    reference, _, seconds = render(args.reference_spp, args.seed + 1)
+    print(f"reference: {args.reference_spp} spp in {seconds:.1f}s")
+    target, _, _ = render(args.reference_spp, args.seed + 2)
+    target_rmse, target_ssim = rmse(target, reference), ssim(target, reference)
+    print(f"target, another {args.reference_spp} spp render: rmse {target_rmse:.4f}, ssim {target_ssim:.4f}")
+    print(f"{'spp':>4} {'render s':>9} {'rmse':>8} {'ssim':>7} {'denoise s':>10} {'rmse':>8} {'ssim':>7}  target")
+    missed = []
+    for spp in args.spp:
+        noisy, aovs, seconds = render(spp, args.seed)
+        start = time.perf_counter()
+        denoised = denoise.denoise(noisy, aovs)
+        denoise_seconds = time.perf_counter() - start
+        denoised_rmse, denoised_ssim = rmse(denoised, reference), ssim(denoised, reference)
+        met = denoised_rmse <= target_rmse and denoised_ssim >= target_ssim
+        print(f"{spp:>4} {seconds:>9.2f} {rmse(noisy, reference):>8.4f} {ssim(noisy, reference):>7.4f} "
+              f"{denoise_seconds:>10.3f} {denoised_rmse:>8.4f} {denoised_ssim:>7.4f}  {'met' if met else 'NOT MET'}")
+        if not met:
+            missed.append(spp)
+    if missed:
+        print(f"target not met at {', '.join(map(str, missed))} spp: the denoised image is further from the reference than "
+              f"another {args.reference_spp} spp render")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+# a distributed render over localhost workers against the local scheduler, with a worker that dies holding a lease,
+# one that stalls past the lease timeout and one that joins mid-render
+# run from the repo root: python -m bench.distributed, exits non-zero if the images differ
+import argparse
+import socket
+import sys
+import time
+import distributed
+import generate
+import scheduler
+from bvh import BVHNode
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--width", type=int, default=64)
+    parser.add_argument("--spp", type=int, default=4)
+    parser.add_argument("--tile-size", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    height = int(args.width / generate.aspect_ratio)
+    render_args = (args.spp, generate.camera, BVHNode(generate.random_scene(args.seed)))
+    start = time.perf_counter()
+    local = scheduler.render_tiles(generate.render_tile, render_args, args.width, height, args.tile_size, workers=args.workers, seed=args.seed)
+    print(f"local: {time.perf_counter() - start:.3f}s")
+
+    coordinator = distributed.Coordinator(generate.render_tile, render_args, args.width, height, args.tile_size, seed=args.seed, lease_timeout=1.0)
+    host, port = coordinator.serve("127.0.0.1", 0)
+    # takes a lease and never answers it
+    def lease(name: str) -> socket.socket:
+        sock = socket.create_connection((host, port))
+        distributed.join(sock, coordinator.token, name)
+        distributed.send(sock, {"type": "lease"})
+        distributed.recv(sock)
+        return sock
+
+    lease("dies").close()
+    stalls = lease("stalls")
+    distributed.start_local_workers(host, port, max(1, args.workers - 1), coordinator.token)
+    time.sleep(0.5)
+    distributed.start_local_workers(host, port, 1, coordinator.token)
+    pixels = coordinator.wait(600)
+    stalls.close()
+    print(coordinator.report())
+    if pixels.tobytes() != local.tobytes():
+        print("distributed render differs from the local render", file=sys.stderr)
+        sys.exit(1)
+    print("identical to the local render")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+# wall time of one seeded render on each scheduler executor at each --workers count, with the speedup over the
+# serial executor and a check that every framebuffer matches the serial one. threads only scale where the GIL
+# is disabled (free-threaded 3.13t). run from the repo root: python -m bench.executors
+import argparse
+import os
+import sys
+import time
+import generate
+import scheduler
+from bvh import BVHNode
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--width", type=int, default=96)
+    parser.add_argument("--spp", type=int, default=4)
+    parser.add_argument("--tile-size", type=int, default=16)
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument("--executors", nargs="+", choices=scheduler.EXECUTORS, default=list(scheduler.EXECUTORS))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    height = int(args.width / generate.aspect_ratio)
+    render_args = (args.spp, generate.camera, BVHNode(generate.random_scene(args.seed)))
+
+    def render(executor: str, workers: int):
+        start = time.perf_counter()
+        pixels = scheduler.render_tiles(generate.render_tile, render_args, args.width, height, args.tile_size, workers=workers,
+                                        seed=args.seed, executor=executor)
+        return time.perf_counter() - start, pixels.tobytes()
+
+    print(f"python {sys.version.split()[0]}, GIL {'disabled' if scheduler.gil_disabled() else 'enabled'}, "
+          f"{os.cpu_count()} cpus, default executor {scheduler.default_executor()}")
+    baseline, reference = render("serial", 1)
+    print(f"{'executor':<10} {'workers':>7} {'seconds':>8} {'speedup':>8}")
+    failed = False
+    for executor in args.executors:
+        for workers in [1] if executor == "serial" else args.workers:
+            seconds, pixels = (baseline, reference) if executor == "serial" else render(executor, workers)
+            same = pixels == reference
+            failed |= not same
+            print(f"{executor:<10} {workers:>7} {seconds:>8.3f} {baseline / seconds:>7.2f}x{'' if same else '  DIFFERS'}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+# memory and pickled size per sphere of three ways to build the same number of small spheres under a BVH:
+# one Sphere and fresh material each (random_scene before interning), the same with interned materials, and
+# instances of a shared --cluster sphere BVH placed by a translate/rotate transform each. also rays per second
+# through each. run from the repo root: python -m bench.instancing
+import argparse
+import pickle
+import time
+import tracemalloc
+from bvh import BVHNode
+from hittable import Instance, Sphere, Transform
+from material import Lambertian, Metal, intern
+from ray import Ray
+from rtweekend import random_double, random_uniform, seed_rng
+from vec3 import Color, Point3, Vec3
+
+# materials the spheres draw from, interning collapses each to one object
+PALETTE = 8
+
+
+def palette_material(index: int):
+    shade = (index + 1) / (PALETTE + 1)
+    return Lambertian(Color(shade, 0.5, 1 - shade)) if index % 2 else Metal(Color(shade, shade, 0.5), 0.1)
+
+
+# spheres spread over a square of side extent in the xz plane
+def flat(count: int, extent: float, shared: bool) -> BVHNode:
+    spheres = []
+    for _ in range(count):
+        material = palette_material(int(random_double() * PALETTE))
+        center = Point3(random_uniform(-extent, extent), random_uniform(0, 1), random_uniform(-extent, extent))
+        spheres.append(Sphere(center, 0.2, intern(material) if shared else material))
+    return BVHNode(spheres)
+
+
+def instanced(count: int, extent: float, cluster: int) -> BVHNode:
+    prototype = BVHNode([Sphere(Point3(random_uniform(-1, 1), random_uniform(0, 1), random_uniform(-1, 1)), 0.2,
+                                intern(palette_material(i % PALETTE))) for i in range(cluster)])
+    up = Vec3(0, 1, 0)
+    instances = [Instance(prototype, Transform.translate(Vec3(random_uniform(-extent, extent), 0, random_uniform(-extent, extent)))
+                          @ Transform.rotate(up, random_uniform(0, 360)))
+                 for _ in range(count // cluster)]
+    return BVHNode(instances)
+
+
+# (bytes traced while building, the world)
+def build(make):
+    tracemalloc.start()
+    try:
+        world = make()
+        return tracemalloc.get_traced_memory()[0], world
+    finally:
+        tracemalloc.stop()
+
+
+def rays_per_second(world: BVHNode, extent: float, rays: int) -> float:
+    seed_rng("rays")
+    start = time.perf_counter()
+    for _ in range(rays):
+        origin = Point3(random_uniform(-extent, extent), 5, random_uniform(-extent, extent))
+        world.hit(Ray(origin, Vec3(random_uniform(-1, 1), -1, random_uniform(-1, 1))), 0.001, float("inf"))
+    return rays / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--objects", type=int, default=16000, help="spheres in each scene")
+    parser.add_argument("--cluster", type=int, default=64, help="spheres per instanced prototype")
+    parser.add_argument("--rays", type=int, default=20000)
+    args = parser.parse_args()
+    extent = args.objects ** 0.5
+    scenes = (("sphere each, fresh materials", lambda: flat(args.objects, extent, False)),
+              ("sphere each, interned", lambda: flat(args.objects, extent, True)),
+              (f"instances of {args.cluster}", lambda: instanced(args.objects, extent, args.cluster)))
+    print(f"{'scene':<30} {'memory B/sphere':>16} {'pickle B/sphere':>16} {'rays/s':>10}")
+    for name, make in scenes:
+        seed_rng("scene")
+        memory, world = build(make)
+        pickled = len(pickle.dumps(world, protocol=pickle.HIGHEST_PROTOCOL))
+        print(f"{name:<30} {memory / args.objects:>16.1f} {pickled / args.objects:>16.1f} {rays_per_second(world, extent, args.rays):>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+# peak resident memory of a large 1 spp render, process tree summed, with the framebuffer in memory and in a file
+# (--framebuffer), at each --widths. the file render's peak should stay flat as the image grows and under --budget
+# megabytes, and its image should match the in-memory one. run from the repo root: python -m bench.outofcore
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# resident kB of pid and every process below it
+def tree_rss(pid: int) -> int:
+    children: dict = {}
+    rss = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/status") as f:
+                fields = dict(line.split(":", 1) for line in f if ":" in line)
+        except OSError:
+            continue
+        children.setdefault(int(fields["PPid"]), []).append(int(entry))
+        rss[int(entry)] = int(fields.get("VmRSS", "0 kB").split()[0])
+    total, stack = 0, [pid]
+    while stack:
+        p = stack.pop()
+        total += rss.get(p, 0)
+        stack.extend(children.get(p, ()))
+    return total
+
+
+# (seconds, peak MB) of generate.py with argv
+def measure(argv, interval: float):
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "generate.py", *argv], cwd=ROOT, stderr=subprocess.DEVNULL)
+    peak = 0
+    while process.poll() is None:
+        peak = max(peak, tree_rss(process.pid))
+        time.sleep(interval)
+    if process.returncode:
+        raise SystemExit(f"generate.py {' '.join(argv)} failed with {process.returncode}")
+    return time.perf_counter() - start, peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--widths", type=int, nargs="+", default=[1024, 2048])
+    parser.add_argument("--engine", default="wavefront")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--budget", type=float, default=150, help="megabytes the framebuffer file render may peak at")
+    parser.add_argument("--interval", type=float, default=0.02, help="seconds between memory samples")
+    args = parser.parse_args()
+    directory = tempfile.mkdtemp(prefix="outofcore")
+    scene = os.path.join(directory, "small.scene")
+    subprocess.run([sys.executable, "raytrace.py", "scene", "export", scene, "--seed", "0", "--grid", "1"], cwd=ROOT, check=True)
+    failed = False
+    print(f"{'width':>6} {'height':>6} {'buffer MB':>10} {'memory s':>9} {'memory MB':>10} {'file s':>7} {'file MB':>8}")
+    try:
+        for width in args.widths:
+            common = ["--scene", scene, "--width", str(width), "--spp", "1", "--max-depth", "2", "--seed", "0", "--engine", args.engine]
+            if args.workers is not None:
+                common += ["--workers", str(args.workers)]
+            in_memory = os.path.join(directory, "memory.ppm")
+            on_disk = os.path.join(directory, "file.ppm")
+            framebuffer = os.path.join(directory, "framebuffer.bin")
+            memory_seconds, memory_peak = measure(common + ["--output", in_memory], args.interval)
+            file_seconds, file_peak = measure(common + ["--output", on_disk, "--framebuffer", framebuffer], args.interval)
+            height = width * 9 // 16
+            over = file_peak > args.budget
+            with open(in_memory, "rb") as a, open(on_disk, "rb") as b:
+                same = a.read() == b.read()
+            failed |= over or not same
+            print(f"{width:>6} {height:>6} {os.path.getsize(framebuffer) / (1 << 20):>10.1f} {memory_seconds:>9.2f} {memory_peak:>10.1f} "
+                  f"{file_seconds:>7.2f} {file_peak:>8.1f}{'  OVER' if over else ''}{'' if same else '  DIFFERS'}")
+            os.remove(framebuffer)
+    finally:
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        os.rmdir(directory)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
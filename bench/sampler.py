@@ -0,0 +1,55 @@
+# image error against a high-spp reference as samples per pixel grow, for each sampler, and the time it took
+# run from the repo root: python -m bench.sampler
+import argparse
+import math
+import time
+from typing import List
+import generate
+import samplers
+import scheduler
+from bvh import BVHNode
+
+
+# gamma 2 display values clamped to [0, 1], the way Vec3.write_color turns sums into pixels
+def display(pixels) -> List[float]:
+    values = []
+    for i in range(0, len(pixels), scheduler.CHANNELS):
+        n = pixels[i + scheduler.SAMPLES]
+        values.extend(min(1.0, math.sqrt(max(0.0, pixels[i + c] / n))) for c in range(3))
+    return values
+
+
+def rmse(a: List[float], b: List[float]) -> float:
+    return math.sqrt(sum((x - y) ** 2 for x, y in zip(a, b)) / len(a))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--width", type=int, default=48)
+    parser.add_argument("--spp", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--reference-spp", type=int, default=512)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    height = int(args.width / generate.aspect_ratio)
+    world = BVHNode(generate.random_scene(args.seed))
+    def render(spp: int, sampler: samplers.Sampler, seed: int):
+        return scheduler.render_tiles(generate.render_tile, (spp, generate.camera, world), args.width, height, 8,
+                                      workers=args.workers, render_kwargs={"sampler": sampler}, seed=seed)
+
+    start = time.perf_counter()
+    reference = display(render(args.reference_spp, samplers.SobolSampler(), args.seed + 1))
+    print(f"reference: {args.reference_spp} spp sobol, {time.perf_counter() - start:.1f}s")
+    print(f"{'spp':>5} " + " ".join(f"{name + ' rmse':>12} {'s':>6}" for name in samplers.SAMPLERS))
+    for spp in args.spp:
+        cells = []
+        for name in samplers.SAMPLERS:
+            start = time.perf_counter()
+            image = display(render(spp, samplers.get_sampler(name), args.seed))
+            cells.append(f"{rmse(image, reference):>12.5f} {time.perf_counter() - start:>6.2f}")
+        print(f"{spp:>5} " + " ".join(cells))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+# scene file export and load times, and worker memory for a pickled vs. memory-mapped scene
+# run from the repo root: python -m bench.scene_file
+import argparse
+import multiprocessing
+import os
+import pickle
+import tempfile
+import time
+from typing import Tuple
+from concurrent.futures import ProcessPoolExecutor
+import generate
+import scene_file
+from backends import SceneBuffers
+from bench.bvh import sphere_field
+
+_scene = None
+
+
+def _receive(scene):
+    global _scene
+    _scene = scene
+
+
+# private and file-backed resident KB of a worker after it touched every sphere.
+# ru_maxrss would carry over the parent's peak through exec, and mapped pages are shared through the page cache
+def _worker_rss() -> Tuple[int, int]:
+    import numpy as np
+    float(np.sum(_scene.sphere_centers))
+    with open("/proc/self/status") as f:
+        fields = dict(line.split(":", 1) for line in f)
+    return int(fields["RssAnon"].split()[0]), int(fields["RssFile"].split()[0])
+
+
+def worker_rss(scene) -> Tuple[int, int]:
+    # spawn pickles the initializer arguments, the way every platform but fork does
+    with ProcessPoolExecutor(1, multiprocessing.get_context("spawn"), initializer=_receive, initargs=(scene,)) as executor:
+        return executor.submit(_worker_rss).result()
+
+
+def timed(call):
+    start = time.perf_counter()
+    value = call()
+    return value, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--spheres", type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "random_scene.rtsc")
+        world = generate.random_scene(0)
+        _, export = timed(lambda: scene_file.save(path, world, generate.camera))
+        print(f"random_scene export:  {len(world.objects)} objects, {os.path.getsize(path)} bytes, {export:.2f} ms")
+        print(f"  pickled world:      {len(pickle.dumps(world))} bytes")
+
+        import numpy  # noqa: F401, kept out of the timings below
+        path = os.path.join(directory, "field.rtsc")
+        world = sphere_field(args.spheres)
+        _, export = timed(lambda: scene_file.save(path, world, generate.camera))
+        scene, opened = timed(lambda: scene_file.SceneFile(path))
+        buffers, viewed = timed(lambda: SceneBuffers.from_scene_file(scene))
+        _, built = timed(scene.world)
+        print(f"{args.spheres} sphere field: {os.path.getsize(path)} bytes")
+        print(f"  export:             {export:.2f} ms")
+        print(f"  open (mmap):        {opened:.2f} ms")
+        print(f"  numpy views:        {viewed:.2f} ms")
+        print(f"  HittableList:       {built:.2f} ms")
+        print(f"  pickled arrays:     {len(pickle.dumps(SceneBuffers(world, generate.camera)))} bytes")
+        print(f"  mapped arrays:      {len(pickle.dumps(buffers))} bytes")
+        print("worker RSS:           private KB  file KB")
+        for name, scene_buffers in (("pickled arrays", SceneBuffers(world, generate.camera)), ("mapped arrays", buffers)):
+            private, shared = worker_rss(scene_buffers)
+            print(f"  {name + ':':<19} {private:>10} {shared:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+# a render service on localhost: a low priority job preempted by a high priority one, a cancelled job and a repeat
+# job on the warm scene cache, with their timings and the service's metrics. tests/test_service.py checks the same
+# behavior. run from the repo root: python -m bench.service
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def request(port: int, method: str, path: str, payload=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=600)
+    conn.request(method, path, json.dumps(payload) if payload is not None else None)
+    response = conn.getresponse()
+    return response.status, response.read()
+
+
+def submit(port: int, **spec) -> int:
+    status, body = request(port, "POST", "/jobs", spec)
+    if status != 202:
+        raise RuntimeError(body.decode())
+    return json.loads(body)["id"]
+
+
+# reads the tile stream to the end, returns the seconds to the first tile, to the end, and the final status line
+def stream(port: int, job: int):
+    start = time.perf_counter()
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=600)
+    conn.request("GET", f"/jobs/{job}/tiles")
+    response = conn.getresponse()
+    first = None
+    tiles = 0
+    for line in response:
+        event = json.loads(line)
+        if "tile" not in event:
+            return first, time.perf_counter() - start, tiles, event
+        tiles += 1
+        if first is None:
+            first = time.perf_counter() - start
+    raise RuntimeError("stream ended without a status line")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--width", type=int, default=64)
+    parser.add_argument("--spp", type=int, default=4)
+    parser.add_argument("--tile-size", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    service = subprocess.Popen([sys.executable, "service.py", "--listen", "127.0.0.1:0", "--workers", str(args.workers)],
+                               cwd=ROOT, stderr=subprocess.PIPE, text=True)
+    try:
+        port = int(service.stderr.readline().split()[2].rpartition(":")[2])
+        job = dict(scene={"seed": args.seed}, width=args.width, spp=args.spp, tile_size=args.tile_size, seed=args.seed)
+        background = submit(port, **dict(job, width=2 * args.width, priority=0))
+        doomed = submit(port, **dict(job, priority=0))
+        time.sleep(0.5)
+        urgent = submit(port, **dict(job, priority=10))
+        first, total, tiles, status = stream(port, urgent)
+        print(f"priority 10 job: first tile {first:.3f}s, {tiles} tiles in {total:.3f}s, {status['state']}")
+        request(port, "DELETE", f"/jobs/{doomed}")
+        print(f"cancelled job: {json.loads(request(port, 'GET', f'/jobs/{doomed}')[1])['state']}")
+        first, total, tiles, status = stream(port, background)
+        print(f"priority 0 job: {tiles} tiles, done {total:.3f}s after the urgent one, {status['state']}")
+        _, loads_before = request(port, "GET", "/metrics")
+        repeat = submit(port, **dict(job, priority=0))
+        first, total, tiles, status = stream(port, repeat)
+        metrics = json.loads(request(port, "GET", "/metrics")[1])
+        print(f"repeat job on the warm scene: {total:.3f}s, scene loads {json.loads(loads_before)['scene_loads']} -> {metrics['scene_loads']}")
+        print(json.dumps(metrics, indent=2))
+    finally:
+        service.terminate()
+        service.wait()
+
+
+if __name__ == '__main__':
+    main()
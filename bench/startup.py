@@ -0,0 +1,43 @@
+# wall time of the commands that should start fast, best of --repeat fresh interpreters each, against a budget.
+# run from the repo root: python -m bench.startup. tests/test_startup.py asserts the same budgets
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+# (name, argv after the interpreter, budget in seconds). the worker is what a spawned pool process or a
+# distributed worker pays before its first tile: a fresh interpreter unpickling generate.render_tile
+COMMANDS = [
+    ("raytrace --help", ["raytrace.py", "--help"], 0.10),
+    ("raytrace render --help", ["raytrace.py", "render", "--help"], 0.30),
+    ("import generate", ["-c", "import generate"], 0.12),
+    ("spawned worker", ["-c", "import pickle, generate; pickle.loads(pickle.dumps(generate.render_tile))"], 0.12),
+]
+
+
+def best_of(argv, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *argv], check=True, stdout=subprocess.DEVNULL, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply every budget, for slow machines")
+    args = parser.parse_args()
+    baseline = best_of(["-c", "pass"], args.repeat)
+    print(f"{'command':<26} {'seconds':>8} {'budget':>8}")
+    print(f"{'python -c pass':<26} {baseline:>8.3f}")
+    for name, argv, budget in COMMANDS:
+        seconds = best_of(argv, args.repeat)
+        budget *= args.scale
+        print(f"{name:<26} {seconds:>8.3f} {budget:>8.3f}{'  OVER' if seconds > budget else ''}")
+
+
+if __name__ == '__main__':
+    main()
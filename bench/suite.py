@@ -0,0 +1,181 @@
+# canonical render workloads with fixed seeds, reported as JSON and checked against the stored baseline in
+# bench/baseline.json when that was recorded on the same machine. each workload runs in a fresh interpreter, so its
+# peak RSS is its own.
+# run from the repo root: python -m bench [--baseline PATH] [--save-baseline PATH]
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Sequence
+import first_image
+import generate
+import scheduler
+import torus
+from bvh import BVHNode
+from integrator import PathStats
+
+# (width, samples per pixel, grid) for random_scene, grid 11 is the full ~480 sphere scene
+RANDOM_SCENE_WORKLOADS = [(64, 4, 11), (128, 4, 11), (64, 16, 11), (64, 4, 5), (64, 4, 22)]
+QUICK_RANDOM_SCENE_WORKLOADS = [(32, 2, 11), (32, 2, 5)]
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(ROOT, "bench", "baseline.json")
+
+
+# of this process and its finished workers. ru_maxrss only ever grows, so it is per workload only because each
+# workload has a process to itself
+def peak_rss_kb() -> int:
+    # ru_maxrss is in KB on Linux, workers show up under RUSAGE_CHILDREN once they exit
+    return max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+
+
+def result(name: str, cores: int, wall: float, rays: int, samples: int, **params) -> Dict:
+    return dict(workload=name, cores=cores, wall_seconds=round(wall, 4),
+                rays_per_second=round(rays / wall, 1), samples_per_second=round(samples / wall, 1),
+                peak_rss_kb=peak_rss_kb(), **params)
+
+
+def bench_first_image(quick: bool) -> Dict:
+    size = 64 if quick else 256
+    start = time.perf_counter()
+    for color in first_image.gradient(size, size):
+        color.write_color()
+    wall = time.perf_counter() - start
+    return result(f"first_image_{size}px", 1, wall, 0, size * size, width=size, height=size, spp=1)
+
+
+def bench_torus(quick: bool) -> Dict:
+    width = 100 if quick else 400
+    start = time.perf_counter()
+    pixels = torus.render(width)
+    wall = time.perf_counter() - start
+    return result(f"torus_normals_{width}px", 1, wall, len(pixels), len(pixels), width=width, height=len(pixels) // width, spp=1)
+
+
+def bench_random_scene(width: int, spp: int, grid: int, cores: int, seed: int) -> Dict:
+    height = int(width / generate.aspect_ratio)
+    world = generate.random_scene(seed, grid)
+    path_stats = PathStats()
+    start = time.perf_counter()
+    # the iterative integrator traces the same paths as ray_color and counts them
+    scheduler.render_tiles(generate.render_tile, (spp, generate.camera, BVHNode(world)), width, height,
+                           tile_size=16, workers=cores, render_kwargs={"iterative": True},
+                           tile_stats=path_stats, seed=seed)
+    wall = time.perf_counter() - start
+    # a path that ended after b scatters cast b + 1 rays, except at the depth limit where the last one is never cast
+    rays = sum((bounces + 1) * count for bounces, count in enumerate(path_stats.depth_histogram)) - path_stats.depth_limit
+    name = f"random_scene_{width}px_{spp}spp_{len(world.objects)}obj"
+    return result(name, cores, wall, rays, width * height * spp, width=width, height=height, spp=spp, objects=len(world.objects))
+
+
+def run_workload(spec: List, seed: int, quick: bool) -> Dict:
+    if spec[0] == "first_image":
+        return bench_first_image(quick)
+    if spec[0] == "torus":
+        return bench_torus(quick)
+    _, width, spp, grid, cores = spec
+    return bench_random_scene(width, spp, grid, cores, seed)
+
+
+def run(cores_list: List[int], seed: int, quick: bool) -> Dict:
+    specs: List[List] = [["first_image"], ["torus"]]
+    for width, spp, grid in (QUICK_RANDOM_SCENE_WORKLOADS if quick else RANDOM_SCENE_WORKLOADS):
+        specs.extend([["random_scene", width, spp, grid, cores] for cores in cores_list])
+    results = []
+    for spec in specs:
+        argv = [sys.executable, "-m", "bench.suite", "--workload", json.dumps(spec), "--seed", str(seed)] + (["--quick"] if quick else [])
+        results.append(json.loads(subprocess.run(argv, cwd=ROOT, check=True, stdout=subprocess.PIPE, text=True).stdout))
+        print(f"{results[-1]['workload']} x{results[-1]['cores']}: {results[-1]['samples_per_second']:.0f} samples/s", file=sys.stderr)
+    return dict(
+        meta=dict(python=platform.python_version(), platform=platform.platform(), cpu_count=os.cpu_count(), seed=seed, quick=quick),
+        results=results,
+    )
+
+
+# the meta fields a baseline's numbers depend on. samples/sec from another machine says nothing about this one
+MACHINE_FIELDS = ("cpu_count", "platform", "python")
+
+
+# how the machine that recorded baseline differs from the one that ran report, empty when it is the same one
+def machine_differences(report: Dict, baseline: Dict) -> List[str]:
+    recorded = baseline.get("meta", {})
+    return [f"{field} {recorded.get(field)!r}, here {report['meta'][field]!r}" for field in MACHINE_FIELDS
+            if recorded.get(field) != report["meta"][field]]
+
+
+# report's results replace the baseline's for the same workload and core count, the others stay unless the
+# baseline was recorded on another machine
+def merge(baseline: Dict, report: Dict) -> Dict:
+    kept = baseline.get("results", []) if not machine_differences(report, baseline) else []
+    results = {(r["workload"], r["cores"]): r for r in kept}
+    results.update({(r["workload"], r["cores"]): r for r in report["results"]})
+    return dict(meta=report["meta"], results=list(results.values()))
+
+
+# workloads whose samples/sec fell more than tolerance below the baseline
+def regressions(report: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    expected = {(r["workload"], r["cores"]): r for r in baseline["results"]}
+    failures = []
+    for r in report["results"]:
+        before = expected.get((r["workload"], r["cores"]))
+        if before is None or before["samples_per_second"] <= 0:
+            continue
+        ratio = r["samples_per_second"] / before["samples_per_second"]
+        if ratio < 1.0 - tolerance:
+            failures.append(f"{r['workload']} x{r['cores']}: {r['samples_per_second']:.0f} samples/s is {1 - ratio:.0%} below baseline {before['samples_per_second']:.0f}")
+    return failures
+
+
+def main(argv: Optional[Sequence[str]] = None, prog: Optional[str] = None):
+    parser = argparse.ArgumentParser(prog=prog)
+    parser.add_argument("--cores", type=int, nargs="+", default=sorted({1, os.cpu_count() or 1}))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--quick", action="store_true", help="small images only, for smoke testing")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", default=BASELINE if os.path.exists(BASELINE) else None,
+                        help="fail when a workload is slower than this stored report, bench/baseline.json by default. "
+                             "skipped when the report was recorded on another machine")
+    parser.add_argument("--save-baseline", help="store this run's workloads in this baseline, keeping the others in it")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed fractional slowdown against the baseline")
+    parser.add_argument("--workload", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    # one workload in this process, what run starts each of them as
+    if args.workload:
+        print(json.dumps(run_workload(json.loads(args.workload), args.seed, args.quick)))
+        return
+    report = run(args.cores, args.seed, args.quick)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.save_baseline):
+            with open(args.save_baseline) as f:
+                baseline = json.load(f)
+        with open(args.save_baseline, "w") as f:
+            f.write(json.dumps(merge(baseline, report), indent=2) + "\n")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        differences = machine_differences(report, baseline)
+        if differences:
+            print(f"not comparing against {args.baseline}, it was recorded on another machine: {'; '.join(differences)}. "
+                  f"record one here with --save-baseline", file=sys.stderr)
+            return
+        failures = regressions(report, baseline, args.tolerance)
+        for failure in failures:
+            print(f"regression: {failure}", file=sys.stderr)
+        if failures:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
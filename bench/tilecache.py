@@ -0,0 +1,51 @@
+# a cold render into an empty tile cache, the same render again, then one with twice the passes on top of it,
+# each timed and checked against an uncached render. run from the repo root: python -m bench.tilecache
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+import generate
+import scheduler
+import tilecache
+from bvh import BVHNode
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--width", type=int, default=64)
+    parser.add_argument("--pass-spp", type=int, default=tilecache.BLOCK_SPP)
+    parser.add_argument("--passes", type=int, default=2)
+    parser.add_argument("--tile-size", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    height = int(args.width / generate.aspect_ratio)
+    world = generate.random_scene(args.seed)
+    render_args = (args.pass_spp, generate.camera, BVHNode(world))
+    render = tilecache.render_digest(tilecache.scene_digest(world, generate.camera), args.width, height, args.seed,
+                                     generate.render_tile.__qualname__, args.pass_spp, generate.max_depth, {})
+    directory = tempfile.mkdtemp(prefix="tilecache")
+    failed = False
+    try:
+        for name, passes in (("cold", args.passes), ("warm", args.passes), ("more passes", 2 * args.passes)):
+            cache = tilecache.TileCache(directory, 1 << 30, render)
+            start = time.perf_counter()
+            cached = scheduler.render_tiles(generate.render_tile, render_args, args.width, height, args.tile_size, workers=args.workers,
+                                            passes=passes, seed=args.seed, cache=cache)
+            elapsed = time.perf_counter() - start
+            uncached = scheduler.render_tiles(generate.render_tile, render_args, args.width, height, args.tile_size, workers=args.workers,
+                                              passes=passes, seed=args.seed)
+            same = cached.tobytes() == uncached.tobytes()
+            failed |= not same
+            print(f"{name}: {passes} passes in {elapsed:.3f}s, {cache.stats.hits} hits, {cache.stats.misses} misses, "
+                  f"{'identical to' if same else 'DIFFERS from'} the uncached render")
+    finally:
+        shutil.rmtree(directory)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
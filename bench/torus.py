@@ -0,0 +1,74 @@
+# hits/sec and accuracy of the Torus intersection modes. the reference is a sphere trace down to 1e-12 with no
+# step limit, which never steps past the first surface crossing, and the analytic normal at that point. the
+# residual is the torus distance function at each hit point, how far off the surface it is in world units.
+# run from the repo root: python -m bench.torus
+import argparse
+import math
+import random
+import time
+from hittable import Torus
+from ray import Ray
+from rtweekend import infinity
+from vec3 import Point3, Vec3
+
+
+def torus_rays(count: int, seed: int = 0):
+    # rays from a shell around the torus aimed at jittered points near it, so roughly half hit
+    rng = random.Random(seed)
+    rays = []
+    for _ in range(count):
+        origin = Vec3(rng.gauss(0, 1), rng.gauss(0, 1), rng.gauss(0, 1)).unit_vector() * 4.0
+        target = Point3(rng.uniform(-1.2, 1.2), rng.uniform(-1.2, 1.2), rng.uniform(-0.4, 0.4))
+        rays.append(Ray(origin, target - origin))
+    return rays
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rays", type=int, default=5000)
+    args = parser.parse_args()
+
+    rays = torus_rays(args.rays)
+    center = Point3(0, 0, 0)
+    reference = Torus(center, 1.0, 0.3, material=None, max_steps=10**6, epsilon=1e-12, t_max=infinity, mode="sdf") # type: ignore
+    expected = [reference.hit(r, 0.001, infinity) for r in rays]
+    for r, record in zip(rays, expected):
+        if record is not None:
+            record.set_face_normal(r, reference.analytic_normal(record.point))
+
+    print(f"{'mode':>9} {'rays/s':>9} {'hits':>6} {'missed':>7} {'extra':>6} {'mean t err':>11} {'max t err':>10} "
+          f"{'max residual':>13} {'mean n err deg':>15} {'max n err deg':>14}")
+    for mode in Torus.MODES:
+        torus = Torus(center, 1.0, 0.3, material=None, mode=mode) # type: ignore
+        start = time.perf_counter()
+        records = [torus.hit(r, 0.001, infinity) for r in rays]
+        elapsed = time.perf_counter() - start
+
+        hits = 0
+        missed = 0
+        extra = 0
+        t_errors = []
+        residuals = []
+        normal_errors = []
+        for r, got, want in zip(rays, records, expected):
+            if want is None:
+                extra += got is not None
+                continue
+            if got is None:
+                missed += 1
+                continue
+            hits += 1
+            # t error relative to the ray length so it reads as a world-space distance
+            t_errors.append(abs(got.t - want.t) * r.direction.length())
+            residuals.append(abs(torus.torus_distance_function(got.point)))
+            cosine = max(-1.0, min(1.0, got.normal.dot(want.normal)))
+            normal_errors.append(math.degrees(math.acos(cosine)))
+        t_errors = t_errors or [0.0]
+        normal_errors = normal_errors or [0.0]
+        print(f"{mode:>9} {len(rays) / elapsed:>9.0f} {hits:>6} {missed:>7} {extra:>6} "
+              f"{sum(t_errors) / len(t_errors):>11.2e} {max(t_errors):>10.2e} {max(residuals, default=0.0):>13.2e} "
+              f"{sum(normal_errors) / len(normal_errors):>15.4f} {max(normal_errors):>14.4f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+# per-op Vec3 timings against the old list-backed layout, end-to-end render_row time
+# and tracemalloc bytes per Vec3/Ray/HitRecord
+# run from the repo root: python -m bench.vec3
+import argparse
+import math
+import random
+import time
+import timeit
+import tracemalloc
+from bvh import BVHNode
+from hittable import HitRecord
+from ray import Ray
+from vec3 import Vec3
+
+
+# the previous list-backed Vec3, kept only as the baseline for the per-op numbers
+class ListVec3:
+    def __init__(self, e0=0.0, e1=0.0, e2=0.0):
+        self.e = [e0, e1, e2]
+    def __add__(self, vec3):
+        return ListVec3(self.e[0] + vec3.e[0], self.e[1] + vec3.e[1], self.e[2] + vec3.e[2])
+    def __mul__(self, other):
+        if isinstance(other, ListVec3):
+            return ListVec3(self.e[0]*other.e[0], self.e[1]*other.e[1], self.e[2]*other.e[2])
+        elif isinstance(other, (int, float)):
+            return ListVec3(self.e[0] * other, self.e[1] * other, self.e[2] * other)
+        else:
+            raise TypeError("Operand must be either Vec3 or int/float.")
+    def __rmul__(self, other):
+        return self * other
+    def __truediv__(self, t):
+        return ListVec3(self.e[0] / t, self.e[1] / t, self.e[2] / t)
+    def length(self):
+        return math.sqrt(self.e[0] * self.e[0] + self.e[1] * self.e[1] + self.e[2] * self.e[2])
+    def dot(self, vec3):
+        return self.e[0] * vec3.e[0] + self.e[1] * vec3.e[1] + self.e[2] * vec3.e[2]
+    def unit_vector(self):
+        return self / self.length()
+
+
+OPS = {
+    "construct": "V(1.0, 2.0, 3.0)",
+    "add": "a + b",
+    "scalar mul": "a * 2.0",
+    "rmul": "2.0 * a",
+    "dot": "a.dot(b)",
+    "unit_vector": "a.unit_vector()",
+    "a + t*b": "a + 0.5 * b",
+    "axpy": "V.axpy(a, 0.5, b)",
+}
+
+
+def per_op(number: int):
+    print(f"{'op':>12} {'list ns':>9} {'slots ns':>9} {'speedup':>8}")
+    for name, statement in OPS.items():
+        timings = []
+        for cls in (ListVec3, Vec3):
+            if statement.startswith("V.axpy") and cls is ListVec3:
+                # the old class has no fused form, compare against the two-op expression
+                statement_for_cls = OPS["a + t*b"]
+            else:
+                statement_for_cls = statement
+            env = {"V": cls, "a": cls(1.0, 2.0, 3.0), "b": cls(4.0, 5.0, 6.0)}
+            seconds = min(timeit.repeat(statement_for_cls, globals=env, number=number, repeat=5))
+            timings.append(seconds / number * 1e9)
+        print(f"{name:>12} {timings[0]:>9.1f} {timings[1]:>9.1f} {timings[0] / timings[1]:>7.2f}x")
+
+
+def allocated_bytes(factory, count: int = 10000) -> float:
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    objects = [factory() for _ in range(count)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    total = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    # the list holding the objects is not part of their footprint
+    del objects
+    return (total - count * 8) / count
+
+
+def memory():
+    vec = lambda: Vec3(random.random(), random.random(), random.random())
+    print(f"{'object':>10} {'bytes':>7}")
+    print(f"{'ListVec3':>10} {allocated_bytes(lambda: ListVec3(random.random(), random.random(), random.random())):>7.0f}")
+    print(f"{'Vec3':>10} {allocated_bytes(vec):>7.0f}")
+    print(f"{'Ray':>10} {allocated_bytes(lambda: Ray(vec(), vec())):>7.0f}")
+    print(f"{'HitRecord':>10} {allocated_bytes(lambda: HitRecord(vec(), vec(), None, random.random(), True)):>7.0f}") # type: ignore
+
+
+def render(rows: int, spp: int):
+    import generate
+    world = BVHNode(generate.random_scene(0))
+    width, height = 100, 56
+    start = time.perf_counter()
+    for row in range(height // 2 - rows // 2, height // 2 + rows - rows // 2):
+        generate.render_row(width, height, spp, generate.camera, world, row)
+    elapsed = time.perf_counter() - start
+    print(f"render_row {width}px x {rows} rows x {spp} spp: {elapsed:.3f}s, {rows / elapsed:.1f} rows/s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=200000)
+    parser.add_argument("--rows", type=int, default=20)
+    parser.add_argument("--spp", type=int, default=4)
+    args = parser.parse_args()
+    per_op(args.number)
+    print()
+    memory()
+    print()
+    render(args.rows, args.spp)
+
+
+if __name__ == '__main__':
+    main()
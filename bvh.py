@@ -0,0 +1,138 @@
+from typing import List, Optional
+from aabb import AABB
+from hittable import HitRecord, Hittable, HittableList
+from ray import Ray
+
+# splits below this size use the object midpoint instead of the SAH sweep
+SAH_MIN_OBJECTS = 4
+
+
+class BVHNode(Hittable):
+    def __init__(self, objects: HittableList | List[Hittable]):
+        if isinstance(objects, HittableList):
+            objects = objects.objects
+        if not objects:
+            raise ValueError("BVHNode needs at least one object")
+        boxes = [obj.bounding_box() for obj in objects]
+        if any(box is None for box in boxes):
+            raise ValueError("every object in a BVHNode needs a bounding box")
+        self.left: Hittable
+        self.right: Optional[Hittable] = None
+        self._build(list(zip(objects, boxes)))
+
+    def _build(self, items):
+        box = items[0][1]
+        for _, other in items[1:]:
+            box = AABB.surrounding_box(box, other)
+        self.box = box
+
+        if len(items) == 1:
+            self.left, self.left_box = items[0]
+            return
+        if len(items) == 2:
+            (self.left, self.left_box), (self.right, self.right_box) = items
+            return
+
+        # split along the axis with the widest spread of centroids
+        spans = []
+        for axis in range(3):
+            centroids = [b.centroid(axis) for _, b in items]
+            spans.append(max(centroids) - min(centroids))
+        axis = spans.index(max(spans))
+        items.sort(key=lambda item: item[1].centroid(axis))
+
+        split = len(items) // 2
+        if len(items) >= SAH_MIN_OBJECTS:
+            split = self._sah_split(items)
+
+        self.left = self._child(items[:split])
+        self.left_box = self.left.bounding_box()
+        self.right = self._child(items[split:])
+        self.right_box = self.right.bounding_box()
+
+    @staticmethod
+    def _sah_split(items) -> int:
+        # sweep the sorted items once from each side to get prefix/suffix areas
+        n = len(items)
+        left_areas = [0.0] * n
+        box = items[0][1]
+        for i in range(n):
+            box = AABB.surrounding_box(box, items[i][1])
+            left_areas[i] = box.surface_area()
+        best_cost = float('inf')
+        best_split = n // 2
+        box = items[-1][1]
+        for i in range(n - 1, 0, -1):
+            box = AABB.surrounding_box(box, items[i][1])
+            cost = left_areas[i - 1] * i + box.surface_area() * (n - i)
+            if cost < best_cost:
+                best_cost = cost
+                best_split = i
+        return best_split
+
+    @staticmethod
+    def _child(items) -> Hittable:
+        if len(items) == 1:
+            return items[0][0]
+        node = BVHNode.__new__(BVHNode)
+        node.right = None
+        node._build(items)
+        return node
+
+    def bounding_box(self) -> AABB:
+        return self.box
+
+    def hit(self, r: Ray, t_min: float, t_max: float) -> Optional[HitRecord]:
+        if self.box.hit(r, t_min, t_max) is None:
+            return None
+        return self._traverse(r, t_min, t_max)
+
+    # assumes this node's box has already been hit
+    def _traverse(self, r: Ray, t_min: float, t_max: float) -> Optional[HitRecord]:
+        near, near_t = self.left, self.left_box.hit(r, t_min, t_max)
+        far, far_t = None, None
+        if self.right is not None:
+            far, far_t = self.right, self.right_box.hit(r, t_min, t_max)
+            if near_t is None or (far_t is not None and far_t < near_t):
+                near, near_t, far, far_t = far, far_t, near, near_t
+        if near_t is None:
+            return None
+
+        closest_record = self._hit_child(near, r, t_min, t_max)
+        if closest_record is not None:
+            t_max = closest_record.t
+        # far child can only matter if its box starts before the closest hit so far
+        if far is not None and far_t is not None and far_t <= t_max:
+            temp_record = self._hit_child(far, r, t_min, t_max)
+            if temp_record is not None:
+                closest_record = temp_record
+        return closest_record
+
+    @staticmethod
+    def _hit_child(child: Hittable, r: Ray, t_min: float, t_max: float) -> Optional[HitRecord]:
+        if isinstance(child, BVHNode):
+            return child._traverse(r, t_min, t_max)
+        return child.hit(r, t_min, t_max)
+
+    # the nodes from this one down to the one holding obj as a direct child, empty if obj is not in the tree
+    def path_to(self, obj: Hittable) -> List['BVHNode']:
+        for child in (self.left, self.right):
+            if child is obj:
+                return [self]
+            if isinstance(child, BVHNode):
+                path = child.path_to(obj)
+                if path:
+                    return [self] + path
+        return []
+
+    # after the object at the end of a path_to path moved, regrows the boxes above it without touching the
+    # rest of the tree. the split stays as built, so large motions slowly cost traversal quality
+    @staticmethod
+    def refit(path: List['BVHNode']):
+        for node in reversed(path):
+            node.left_box = node.left.bounding_box()
+            box = node.left_box
+            if node.right is not None:
+                node.right_box = node.right.bounding_box()
+                box = AABB.surrounding_box(box, node.right_box)
+            node.box = box
@@ -1,6 +1,7 @@
 from ray import Ray
 from vec3 import Point3, Vec3
 import rtweekend
+import samplers
 import math
 
 class Camera:
@@ -32,7 +33,15 @@ class Camera:
         self.lens_radius = self.aperture / 2
 
     def get_ray(self, s, t):
-        rd: Vec3 = self.lens_radius * Vec3.random_in_unit_disk()
-        offset: Vec3 = self.u * rd.e[0]  + self.v * rd.e[1]
-        return Ray(self.origin + offset, self.lower_left_corner + s * self.horizontal + t * self.vertical - self.origin - offset)
-        
\ No newline at end of file
+        disk_x, disk_y = samplers.disk(*samplers.active.sampler.get_2d())
+        lens_x = self.lens_radius * disk_x
+        lens_y = self.lens_radius * disk_y
+        u, v = self.u, self.v
+        origin = Vec3(self.origin.x + u.x * lens_x + v.x * lens_y,
+                      self.origin.y + u.y * lens_x + v.y * lens_y,
+                      self.origin.z + u.z * lens_x + v.z * lens_y)
+        corner, horizontal, vertical = self.lower_left_corner, self.horizontal, self.vertical
+        direction = Vec3(corner.x + s * horizontal.x + t * vertical.x - origin.x,
+                         corner.y + s * horizontal.y + t * vertical.y - origin.y,
+                         corner.z + s * horizontal.z + t * vertical.z - origin.z)
+        return Ray(origin, direction)
@@ -0,0 +1,41 @@
+import os
+import struct
+from array import array
+from typing import Optional, Sequence, Tuple
+
+# magic, format version, width, height, channels, finished passes, then float32 pixels
+MAGIC = b"RTCK"
+VERSION = 1
+HEADER = struct.Struct("<4sIIIII")
+
+
+# written to a temporary file and renamed into place, so a killed render never leaves a torn checkpoint
+def save(path: str, pixels: Sequence[float], width: int, height: int, channels: int, passes: int):
+    data = pixels if isinstance(pixels, array) else array("f", pixels)
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, width, height, channels, passes))
+        f.write(data.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+# the accumulated framebuffer and the number of passes in it, None if there is no usable checkpoint
+def load(path: str, width: int, height: int, channels: int) -> Optional[Tuple[array, int]]:
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            return None
+        magic, version, saved_width, saved_height, saved_channels, passes = HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a render checkpoint")
+        if (saved_width, saved_height, saved_channels) != (width, height, channels):
+            raise ValueError(f"{path} holds a {saved_width}x{saved_height} render, expected {width}x{height}")
+        pixels = array("f")
+        pixels.frombytes(f.read())
+    if len(pixels) != width * height * channels:
+        raise ValueError(f"{path} is truncated")
+    return pixels, passes
@@ -0,0 +1,63 @@
+import argparse
+from typing import Dict, Optional, Sequence
+
+# a TOML file of defaults for a command's flags, keys named like the flags with or without the dashes:
+#   width = 800
+#   spp = 64
+#   max-depth = 20
+#   workers = 4
+#   seed = 1
+#   output = "render.png"
+# keys under a table named after the command, like [render], win over top level ones, so one file can serve several.
+# flags on the command line override the file
+
+
+def _toml(path: str) -> dict:
+    try:
+        import tomllib
+    except ModuleNotFoundError:
+        try:
+            import tomli as tomllib
+        except ModuleNotFoundError:
+            raise ValueError("reading TOML needs Python 3.11 or the tomli package") from None
+    with open(path, "rb") as f:
+        return tomllib.load(f)
+
+
+# the file's values as parser defaults, checked against each flag's type and choices
+def load(path: str, parser: argparse.ArgumentParser, section: Optional[str] = None) -> Dict[str, object]:
+    document = _toml(path)
+    settings = {key: value for key, value in document.items() if not isinstance(value, dict)}
+    if section is not None and isinstance(document.get(section), dict):
+        settings.update(document[section])
+    actions = {action.dest: action for action in parser._actions if action.dest not in ("help", "config")}
+    values = {}
+    for key, value in settings.items():
+        dest = key.lstrip("-").replace("-", "_")
+        action = actions.get(dest)
+        if action is None:
+            raise ValueError(f"unknown setting {key!r}")
+        if isinstance(action, (argparse._StoreTrueAction, argparse._StoreFalseAction)):
+            if not isinstance(value, bool):
+                raise ValueError(f"{key} should be true or false, got {value!r}")
+        elif action.type is not None:
+            number = int if action.type is int else (int, float) if action.type is float else None
+            if number is not None and any(isinstance(v, bool) or not isinstance(v, number) for v in (value if isinstance(value, list) else [value])):
+                raise ValueError(f"{key} should be {'an integer' if action.type is int else 'a number'}, got {value!r}")
+            value = [action.type(v) for v in value] if action.nargs in ("+", "*") else action.type(value)
+        if action.choices is not None and value not in action.choices:
+            raise ValueError(f"{key} should be one of {tuple(action.choices)}, got {value!r}")
+        values[dest] = value
+    return values
+
+
+# parses argv, and again with the --config file's values as defaults when one is given
+def parse_args(parser: argparse.ArgumentParser, argv: Optional[Sequence[str]] = None, section: str = "render") -> argparse.Namespace:
+    args = parser.parse_args(argv)
+    if getattr(args, "config", None):
+        try:
+            parser.set_defaults(**load(args.config, parser, section))
+        except (OSError, ValueError) as e:
+            parser.error(f"{args.config}: {e}")
+        args = parser.parse_args(argv)
+    return args
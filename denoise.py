@@ -0,0 +1,247 @@
+import math
+from array import array
+from typing import List, Optional, Tuple
+import numpy as np
+import samplers
+from camera import Camera
+from hittable import HitRecord, Hittable
+from integrator import PathStats
+from ray import Ray
+from rtweekend import infinity
+from vec3 import Color
+
+# first-hit depth for rays that leave the scene, before the log scaling in AOVImage.depth
+MISS_DEPTH = 1e6
+# B3 spline taps of the a-trous filter
+KERNEL = (1 / 16, 1 / 4, 3 / 8, 1 / 4, 1 / 16)
+
+
+# first-hit albedo, normal and depth sums of one tile, row by row like the tile's colors, and the path stats
+# of the iterative integrator when the AOVs came from the render itself
+class AOVTile:
+    def __init__(self, tile: Tuple[int, int, int, int], albedo: List[float], normal: List[float], depth: List[float], counts: List[int], path_stats: Optional[PathStats] = None):
+        self.tile = tile
+        self.albedo = albedo
+        self.normal = normal
+        self.depth = depth
+        self.counts = counts
+        self.path_stats = path_stats
+
+
+# full-image AOV buffers, filled by scheduler.render_tiles merging every AOVTile as tile stats.
+# rows are bottom-up like the framebuffer
+class AOVImage:
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.albedo_sum = np.zeros((height, width, 3))
+        self.normal_sum = np.zeros((height, width, 3))
+        self.depth_sum = np.zeros((height, width))
+        self.counts = np.zeros((height, width))
+        # where the tiles' path stats go, as scheduler.render_tiles' tile_stats would have
+        self.path_stats: Optional[PathStats] = None
+
+    def merge(self, tile: AOVTile):
+        if self.path_stats is not None and tile.path_stats is not None:
+            self.path_stats.merge(tile.path_stats)
+        x0, y0, x1, y1 = tile.tile
+        shape = (y1 - y0, x1 - x0)
+        self.albedo_sum[y0:y1, x0:x1] += np.reshape(tile.albedo, shape + (3,))
+        self.normal_sum[y0:y1, x0:x1] += np.reshape(tile.normal, shape + (3,))
+        self.depth_sum[y0:y1, x0:x1] += np.reshape(tile.depth, shape)
+        self.counts[y0:y1, x0:x1] += np.reshape(tile.counts, shape)
+
+    def _mean(self, total: np.ndarray) -> np.ndarray:
+        counts = np.maximum(self.counts, 1)
+        return total / (counts[..., None] if total.ndim == 3 else counts)
+
+    @property
+    def albedo(self) -> np.ndarray:
+        return self._mean(self.albedo_sum)
+
+    @property
+    def normal(self) -> np.ndarray:
+        return self._mean(self.normal_sum)
+
+    # log scaled, so one edge-stopping width works from the foreground spheres to the horizon
+    @property
+    def depth(self) -> np.ndarray:
+        return self._mean(self.depth_sum)
+
+    # albedo, normal mapped from [-1, 1] and depth, each as its own gamma-free PPM
+    def write(self, prefix: str):
+        depth = self.depth
+        images = {"albedo": self.albedo, "normal": 0.5 * (self.normal + 1.0),
+                  "depth": np.repeat((depth / max(depth.max(), 1e-9))[..., None], 3, axis=2)}
+        for name, image in images.items():
+            data = (255 * np.clip(image[::-1], 0.0, 1.0)).astype(np.uint8)
+            with open(f"{prefix}_{name}.ppm", "wb") as f:
+                f.write(f"P6\n{self.width} {self.height}\n255\n".encode())
+                f.write(data.tobytes())
+
+
+# keeps what the first hit() after arm() found, so a path tracer handed this in place of the world reports its
+# camera ray's hit without tracing it twice
+class FirstHit(Hittable):
+    __slots__ = ("world", "armed", "record")
+
+    def __init__(self, world: Hittable):
+        self.world = world
+        self.armed = False
+        self.record: Optional[HitRecord] = None
+
+    def arm(self):
+        self.armed = True
+        self.record = None
+
+    def hit(self, r: Ray, t_min: float, t_max: float) -> Optional[HitRecord]:
+        record = self.world.hit(r, t_min, t_max)
+        if self.armed:
+            self.armed = False
+            self.record = record
+        return record
+
+    def bounding_box(self):
+        return self.world.bounding_box()
+
+
+# generate.render_tile, drawing the same samples into the same colors, that also sums the first hit of every
+# camera ray into an AOVTile returned as its tile stats. the buffers then line up with the noisy image sample
+# for sample, edges included, at no extra rays
+def render_tile(width: int, height: int, samples_per_pixel: int, camera: Camera, world: Hittable, x0: int, y0: int, x1: int, y1: int, iterative: bool = False, roulette_depth: Optional[int] = None, stats: Optional[PathStats] = None, sampler: Optional[samplers.Sampler] = None, max_depth: Optional[int] = None) -> tuple:
+    import generate
+    if iterative and stats is None:
+        stats = PathStats()
+    first_hit = FirstHit(world)
+    trace = generate.path_tracer(first_hit, iterative, roulette_depth, stats, max_depth)
+    sampler = samplers.use(sampler)
+    first = samplers.first_sample(samples_per_pixel)
+    tile_pixels = []
+    albedo: List[float] = []
+    normal: List[float] = []
+    depth: List[float] = []
+    for row in range(y0, y1):
+        for x in range(x0, x1):
+            pixel_color = Color(0,0,0)
+            a = Color(0, 0, 0)
+            nx = ny = nz = 0.0
+            d = 0.0
+            sampler.start_pixel()
+            for sample in range(first, first + samples_per_pixel):
+                sampler.start_sample(sample)
+                du, dv = sampler.get_2d()
+                r = camera.get_ray((x + du) / (width - 1), (row + dv) / (height - 1))
+                first_hit.arm()
+                pixel_color += trace(r)
+                hit_record = first_hit.record
+                if hit_record is None:
+                    a += Color(1, 1, 1)
+                    d += math.log1p(MISS_DEPTH)
+                    continue
+                a += hit_record.material.surface_albedo()
+                n = hit_record.normal
+                nx += n.x
+                ny += n.y
+                nz += n.z
+                d += math.log1p(hit_record.t * r.direction.length())
+            tile_pixels.append(pixel_color)
+            albedo.extend((a.x, a.y, a.z))
+            normal.extend((nx, ny, nz))
+            depth.append(d)
+    counts = [samples_per_pixel] * len(tile_pixels)
+    return tile_pixels, counts, AOVTile((x0, y0, x1, y1), albedo, normal, depth, counts, stats)
+
+
+# a tile renderer for scheduler.render_tiles that traces only the camera rays and records what they hit first,
+# for renders whose tiles cannot record them (other engines, --adaptive, cached tiles).
+# the colors it returns are the albedo sums, the AOVTile rides along as tile stats
+def render_aov_tile(width: int, height: int, samples_per_pixel: int, camera: Camera, world: Hittable, x0: int, y0: int, x1: int, y1: int) -> tuple:
+    sampler = samplers.use(None)
+    albedo_colors = []
+    albedo: List[float] = []
+    normal: List[float] = []
+    depth: List[float] = []
+    for row in range(y0, y1):
+        for x in range(x0, x1):
+            a = Color(0, 0, 0)
+            nx = ny = nz = 0.0
+            d = 0.0
+            sampler.start_pixel()
+            for sample in range(samples_per_pixel):
+                sampler.start_sample(sample)
+                du, dv = sampler.get_2d()
+                r = camera.get_ray((x + du) / (width - 1), (row + dv) / (height - 1))
+                hit_record = world.hit(r, 0.001, infinity)
+                if hit_record is None:
+                    a += Color(1, 1, 1)
+                    d += math.log1p(MISS_DEPTH)
+                    continue
+                a += hit_record.material.surface_albedo()
+                n = hit_record.normal
+                nx += n.x
+                ny += n.y
+                nz += n.z
+                d += math.log1p(hit_record.t * r.direction.length())
+            albedo_colors.append(a)
+            albedo.extend((a.x, a.y, a.z))
+            normal.extend((nx, ny, nz))
+            depth.append(d)
+    counts = [samples_per_pixel] * len(albedo_colors)
+    return albedo_colors, counts, AOVTile((x0, y0, x1, y1), albedo, normal, depth, counts)
+
+
+def _shifted(padded: np.ndarray, pad: int, dy: int, dx: int, height: int, width: int) -> np.ndarray:
+    return padded[pad + dy:pad + dy + height, pad + dx:pad + dx + width]
+
+
+# edge-avoiding a-trous wavelet filter (Dammertz et al. 2010) guided by the AOVs. the color is divided by the
+# albedo first so texture survives the blur, and multiplied back at the end. each pass doubles the tap spacing
+# and halves the color tolerance. color is linear (height, width, 3), the result too. the defaults did best on
+# random_scene at 96 and 192px, 8 and 16 spp, with the AOVs from render_tile (python -m bench.denoise)
+def denoise(color: np.ndarray, aovs: AOVImage, iterations: int = 2, sigma_color: float = 0.3, sigma_normal: float = 1.0, sigma_albedo: float = 0.3, sigma_depth: float = 0.05, color_falloff: float = 0.5) -> np.ndarray:
+    height, width = color.shape[:2]
+    albedo = aovs.albedo
+    normal = aovs.normal
+    depth = aovs.depth
+    irradiance = color / np.maximum(albedo, 1e-3)
+    pad = 2 << max(0, iterations - 1)
+    def padded(a: np.ndarray) -> np.ndarray:
+        return np.pad(a, ((pad, pad), (pad, pad)) + ((0, 0),) * (a.ndim - 2), mode="edge")
+    normal_p, albedo_p, depth_p = padded(normal), padded(albedo), padded(depth)
+    for i in range(iterations):
+        step = 1 << i
+        # the color test runs on gamma 2 values, closer to how far apart the pixels look
+        display = np.sqrt(np.maximum(irradiance, 0.0))
+        irradiance_p, display_p = padded(irradiance), padded(display)
+        color_scale = 1.0 / (sigma_color * color_falloff ** i) ** 2
+        total = np.zeros_like(irradiance)
+        weights = np.zeros((height, width))
+        for ky, hy in enumerate(KERNEL):
+            for kx, hx in enumerate(KERNEL):
+                dy, dx = (ky - 2) * step, (kx - 2) * step
+                q_display = _shifted(display_p, pad, dy, dx, height, width)
+                distance = (np.sum((q_display - display) ** 2, axis=2) * color_scale
+                            + np.sum((_shifted(normal_p, pad, dy, dx, height, width) - normal) ** 2, axis=2) / sigma_normal ** 2
+                            + np.sum((_shifted(albedo_p, pad, dy, dx, height, width) - albedo) ** 2, axis=2) / sigma_albedo ** 2
+                            + np.abs(_shifted(depth_p, pad, dy, dx, height, width) - depth) / sigma_depth)
+                w = hx * hy * np.exp(-distance)
+                total += w[..., None] * _shifted(irradiance_p, pad, dy, dx, height, width)
+                weights += w
+        irradiance = total / weights[..., None]
+    return irradiance * albedo
+
+
+# the mean color per pixel of a framebuffer of sums and counts, as (height, width, 3) bottom-up rows
+def framebuffer_colors(pixels, width: int, height: int, channels: int = 4, samples: int = 3) -> np.ndarray:
+    data = np.frombuffer(pixels, dtype=np.float32).reshape(height, width, channels).astype(np.float64)
+    return data[..., :3] / np.maximum(data[..., samples:samples + 1], 1)
+
+
+# back to a framebuffer of sums and counts with one sample per pixel, for image_io
+def to_framebuffer(colors: np.ndarray, channels: int = 4) -> array:
+    height, width = colors.shape[:2]
+    data = np.ones((height, width, channels), dtype=np.float32)
+    data[..., :3] = colors
+    pixels = array("f")
+    pixels.frombytes(data.tobytes())
+    return pixels
@@ -0,0 +1,362 @@
+import argparse
+import hmac
+import json
+import multiprocessing
+import os
+import pickle
+import secrets
+import socket
+import struct
+import sys
+import threading
+import time
+from array import array
+from typing import Callable, Dict, List, Optional, Tuple
+from integrator import PathStats
+from rtweekend import seed_rng
+from scheduler import CHANNELS, SAMPLES, Tile, make_tiles
+
+# coordinator and workers talk over plain TCP in messages of a length-prefixed JSON header and the raw bytes it
+# announces. both sides first prove they hold the shared token (an HMAC of the other's nonce), then the coordinator
+# sends the pickled scene and workers answer with data only: tile coordinates and counts in the header, colors as
+# array("d") bytes. the coordinator never unpickles, workers unpickle only from a coordinator that knew the token
+LENGTH = struct.Struct("<Q")
+# largest header either side reads
+HEADER_LIMIT = 1 << 20
+# seconds a worker waits before asking again when every tile is leased
+WAIT = 0.05
+PATH_STATS_FIELDS = ("escaped", "absorbed", "roulette", "depth_limit")
+
+
+# a peer that failed the token check or sent something the protocol does not allow
+class ProtocolError(ConnectionError):
+    pass
+
+
+def send(sock: socket.socket, header: dict, payload: bytes = b""):
+    data = json.dumps(dict(header, bytes=len(payload))).encode()
+    sock.sendall(LENGTH.pack(len(data)) + data + payload)
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise ConnectionError("connection closed")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+# (header, payload), refusing a payload longer than limit bytes before reading it
+def recv(sock: socket.socket, limit: Optional[int] = None) -> Tuple[dict, bytes]:
+    size, = LENGTH.unpack(_recv_exactly(sock, LENGTH.size))
+    if size > HEADER_LIMIT:
+        raise ProtocolError(f"{size} byte header")
+    try:
+        header = json.loads(_recv_exactly(sock, size))
+    except ValueError as error:
+        raise ProtocolError(f"bad header: {error}") from None
+    if not isinstance(header, dict) or not isinstance(header.get("bytes"), int) or header["bytes"] < 0:
+        raise ProtocolError("bad header")
+    if limit is not None and header["bytes"] > limit:
+        raise ProtocolError(f"{header['bytes']} byte payload, at most {limit} expected")
+    return header, _recv_exactly(sock, header["bytes"])
+
+
+def digest(token: str, nonce: str) -> str:
+    return hmac.new(token.encode(), nonce.encode(), "sha256").hexdigest()
+
+
+def check_digest(header: dict, token: str, nonce: str):
+    if not isinstance(header.get("digest"), str) or not hmac.compare_digest(header["digest"], digest(token, nonce)):
+        raise ProtocolError("peer does not hold the token")
+
+
+def parse_address(address: str) -> Tuple[str, int]:
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+class WorkerStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.tiles = 0
+        self.samples = 0
+        self.busy_seconds = 0.0
+        # results for tiles another worker had already finished, from re-issues and speculative duplicates
+        self.wasted = 0
+        self.connected = True
+        # tiles this worker may send a result for
+        self.leased = set()
+
+    @property
+    def samples_per_second(self) -> float:
+        return self.samples / self.busy_seconds if self.busy_seconds else 0.0
+
+
+# hands tiles out on lease to whichever workers are connected, and merges their results into a float32 framebuffer
+# laid out like scheduler.render_tiles'. a tile whose every lease is older than lease_timeout goes out again, a dead
+# worker's leases are dropped at once, and once nothing is left to hand out idle workers get a speculative copy of
+# the oldest outstanding tile. the first result for a tile wins, and with per-tile seeding every copy is identical.
+# workers must present token, a random one when it is None. tile_stats, when given, is a PathStats
+class Coordinator:
+    def __init__(self, render_tile: Callable, render_args: tuple, width: int, height: int, tile_size: int = 32, order: str = "spiral", render_kwargs: Optional[dict] = None, seed: Optional[int] = None, lease_timeout: float = 60.0, speculate: bool = True, on_tile: Optional[Callable] = None, tile_stats=None, token: Optional[str] = None):
+        self.scene = pickle.dumps((render_tile, render_args, render_kwargs or {}, width, height, seed), protocol=pickle.HIGHEST_PROTOCOL)
+        self.token = token or secrets.token_urlsafe(16)
+        self.width = width
+        self.height = height
+        self.tiles = make_tiles(width, height, tile_size, order)
+        # largest result payload, three doubles a pixel
+        self.result_limit = max((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in self.tiles) * 3 * 8
+        self.lease_timeout = lease_timeout
+        self.speculate = speculate
+        self.on_tile = on_tile
+        self.tile_stats = tile_stats
+        self.pixels = array("f", bytes(width * height * CHANNELS * 4))
+        self.pending: List[Tile] = list(reversed(self.tiles))
+        # tile -> [(worker name, lease start)]
+        self.leases: Dict[Tile, List[Tuple[str, float]]] = {}
+        self.done = set()
+        self.workers: Dict[str, WorkerStats] = {}
+        self.lock = threading.Lock()
+        self.finished = threading.Event()
+        self.server: Optional[socket.socket] = None
+        self.start = time.perf_counter()
+
+    # binds and starts accepting workers in the background, port 0 picks a free one. returns the bound address
+    def serve(self, host: str = "127.0.0.1", port: int = 0) -> Tuple[str, int]:
+        self.server = socket.create_server((host, port))
+        self.start = time.perf_counter()
+        threading.Thread(target=self._accept, daemon=True).start()
+        return self.server.getsockname()[:2]
+
+    def _accept(self):
+        while not self.finished.is_set():
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve_worker, args=(conn,), daemon=True).start()
+
+    def _serve_worker(self, conn: socket.socket):
+        name = None
+        try:
+            with conn:
+                conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                nonce = secrets.token_hex(16)
+                send(conn, {"type": "challenge", "nonce": nonce})
+                hello, _ = recv(conn, 0)
+                check_digest(hello, self.token, nonce)
+                if not isinstance(hello.get("nonce"), str) or not isinstance(hello.get("name"), str):
+                    raise ProtocolError("bad hello")
+                with self.lock:
+                    name = requested = hello["name"]
+                    while name in self.workers:
+                        name = f"{requested}#{len(self.workers)}"
+                    self.workers[name] = WorkerStats(name)
+                send(conn, {"type": "scene", "digest": digest(self.token, hello["nonce"])}, self.scene)
+                while True:
+                    header, payload = recv(conn, self.result_limit)
+                    if header.get("type") == "result":
+                        self._complete(name, header, payload)
+                    elif header.get("type") != "lease":
+                        raise ProtocolError(f"unexpected {header.get('type')!r} message")
+                    tile = self._lease(name)
+                    if tile is not None:
+                        send(conn, {"type": "tile", "tile": tile})
+                    elif self.finished.is_set():
+                        send(conn, {"type": "done"})
+                        return
+                    else:
+                        send(conn, {"type": "wait", "seconds": WAIT})
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            if name is not None:
+                self._drop(name)
+
+    def _lease(self, name: str) -> Optional[Tile]:
+        with self.lock:
+            now = time.perf_counter()
+            if self.pending:
+                tile = self.pending.pop()
+                self.leases[tile] = [(name, now)]
+                self.workers[name].leased.add(tile)
+                return tile
+            candidates = [(holders[0][1], tile) for tile, holders in self.leases.items()
+                          if all(holder != name for holder, _ in holders)]
+            for started, tile in sorted(candidates):
+                holders = self.leases[tile]
+                expired = all(now - leased > self.lease_timeout for _, leased in holders)
+                if expired or (self.speculate and len(holders) < 2):
+                    holders.append((name, now))
+                    self.workers[name].leased.add(tile)
+                    return tile
+            return None
+
+    # checks a result against the worker's leases before anything of it reaches the framebuffer
+    def _complete(self, name: str, header: dict, rgb: bytes):
+        tile, counts, elapsed = header.get("tile"), header.get("counts"), header.get("elapsed")
+        if not isinstance(tile, list) or len(tile) != 4 or not all(type(c) is int for c in tile):
+            raise ProtocolError("bad tile")
+        tile = tuple(tile)
+        with self.lock:
+            worker = self.workers[name]
+            if tile not in worker.leased:
+                raise ProtocolError(f"result for tile {tile}, which was not leased to {name}")
+            x0, y0, x1, y1 = tile
+            size = (x1 - x0) * (y1 - y0)
+            if not isinstance(counts, list) or len(counts) != size or not all(type(n) is int and n >= 0 for n in counts):
+                raise ProtocolError(f"tile {tile} needs {size} sample counts")
+            if len(rgb) != size * 3 * 8:
+                raise ProtocolError(f"tile {tile} needs {size * 3 * 8} bytes of colors, got {len(rgb)}")
+            if not isinstance(elapsed, (int, float)) or not elapsed >= 0:
+                raise ProtocolError("bad elapsed")
+            stats = self._path_stats(header.get("stats")) if self.tile_stats is not None else None
+            worker.leased.discard(tile)
+            worker.busy_seconds += elapsed
+            if tile in self.done:
+                worker.wasted += 1
+                return
+            colors = array("d")
+            colors.frombytes(rgb)
+            x0, y0, x1, y1 = tile
+            pixels = self.pixels
+            i = 0
+            for row in range(y0, y1):
+                offset = (row * self.width + x0) * CHANNELS
+                for _ in range(x1 - x0):
+                    pixels[offset] += colors[3 * i]
+                    pixels[offset + 1] += colors[3 * i + 1]
+                    pixels[offset + 2] += colors[3 * i + 2]
+                    pixels[offset + SAMPLES] += counts[i]
+                    offset += CHANNELS
+                    i += 1
+            self.done.add(tile)
+            self.leases.pop(tile, None)
+            worker.tiles += 1
+            worker.samples += sum(counts)
+            if self.tile_stats is not None and stats is not None:
+                self.tile_stats.merge(stats)
+            if self.on_tile is not None:
+                self.on_tile(tile, pixels)
+            if len(self.done) == len(self.tiles):
+                self.finished.set()
+
+    @staticmethod
+    def _path_stats(data) -> Optional[PathStats]:
+        if data is None:
+            return None
+        stats = PathStats()
+        histogram = data.get("depth_histogram") if isinstance(data, dict) else None
+        if not isinstance(histogram, list) or not all(type(n) is int and n >= 0 for n in histogram):
+            raise ProtocolError("bad path stats")
+        stats.depth_histogram = histogram
+        for field in PATH_STATS_FIELDS:
+            if type(data.get(field)) is not int or data[field] < 0:
+                raise ProtocolError("bad path stats")
+            setattr(stats, field, data[field])
+        return stats
+
+    def _drop(self, name: str):
+        with self.lock:
+            self.workers[name].connected = False
+            for tile, holders in list(self.leases.items()):
+                holders[:] = [(holder, leased) for holder, leased in holders if holder != name]
+                if not holders:
+                    del self.leases[tile]
+                    self.pending.append(tile)
+
+    # blocks until every tile is merged and returns the framebuffer
+    def wait(self, timeout: Optional[float] = None) -> array:
+        if not self.finished.wait(timeout):
+            raise TimeoutError(f"{len(self.tiles) - len(self.done)} of {len(self.tiles)} tiles still outstanding")
+        self.server.close()
+        return self.pixels
+
+    def report(self) -> str:
+        wall = time.perf_counter() - self.start
+        lines = [f"{'worker':<28} {'tiles':>6} {'wasted':>6} {'samples/s':>10}  connected"]
+        for worker in self.workers.values():
+            lines.append(f"{worker.name:<28} {worker.tiles:>6} {worker.wasted:>6} {worker.samples_per_second:>10.0f}  {worker.connected}")
+        lines.append(f"{len(self.tiles)} tiles in {wall:.3f}s")
+        return "\n".join(lines)
+
+
+# proves this side holds token and returns the coordinator's scene message, whose digest is checked before
+# the scene is unpickled
+def join(sock: socket.socket, token: str, name: str) -> Tuple[dict, bytes]:
+    challenge, _ = recv(sock, 0)
+    if not isinstance(challenge.get("nonce"), str):
+        raise ProtocolError("bad challenge")
+    nonce = secrets.token_hex(16)
+    send(sock, {"type": "hello", "name": name, "nonce": nonce, "digest": digest(token, challenge["nonce"])})
+    header, scene = recv(sock)
+    check_digest(header, token, nonce)
+    return header, scene
+
+
+# connects to a coordinator and renders leased tiles until it says done, seeding each tile like scheduler._render_tile
+def run_worker(host: str, port: int, token: str, name: Optional[str] = None):
+    with socket.create_connection((host, port)) as sock:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        _, scene = join(sock, token, name or f"{socket.gethostname()}:{os.getpid()}")
+        render_tile, render_args, render_kwargs, width, height, seed = pickle.loads(scene)
+        send(sock, {"type": "lease"})
+        while True:
+            message, _ = recv(sock, 0)
+            if message["type"] == "done":
+                return
+            if message["type"] == "wait":
+                time.sleep(message["seconds"])
+                send(sock, {"type": "lease"})
+                continue
+            tile = message["tile"]
+            x0, y0, x1, y1 = tile
+            start = time.perf_counter()
+            if seed is not None:
+                seed_rng(seed, 0, x0, y0)
+            result = render_tile(width, height, *render_args, x0, y0, x1, y1, **render_kwargs)
+            rgb = array("d", [c for color in result[0] for c in (color.x, color.y, color.z)])
+            stats = result[2] if len(result) > 2 else None
+            send(sock, {"type": "result", "tile": tile, "counts": [int(n) for n in result[1]], "elapsed": time.perf_counter() - start,
+                        "stats": None if stats is None else vars(stats)}, rgb.tobytes())
+
+
+def start_local_workers(host: str, port: int, count: int, token: str) -> List[multiprocessing.Process]:
+    processes = [multiprocessing.Process(target=run_worker, args=(host, port, token), daemon=True) for _ in range(count)]
+    for process in processes:
+        process.start()
+    return processes
+
+
+# python distributed.py coordinator-host:port --token TOKEN [--processes N], run from a checkout of the same code
+# as the coordinator
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("coordinator", help="host:port the coordinator listens on")
+    parser.add_argument("--token", default=os.environ.get("RAYTRACE_TOKEN"), help="the coordinator's token, $RAYTRACE_TOKEN by default")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1, help="worker connections to open from this host")
+    parser.add_argument("--name", help="defaults to hostname:pid")
+    args = parser.parse_args()
+    if not args.token:
+        parser.error("--token or $RAYTRACE_TOKEN is required")
+    host, port = parse_address(args.coordinator)
+    if args.processes == 1:
+        run_worker(host, port, args.token, args.name)
+        return
+    processes = [multiprocessing.Process(target=run_worker, args=(host, port, args.token, f"{args.name}/{i}" if args.name else None))
+                 for i in range(args.processes)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    if any(process.exitcode for process in processes):
+        print("some workers exited with an error", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,19 +1,28 @@
-from tqdm import tqdm
+from typing import List
 from vec3 import Color
 # image width and height 
 image_width = 256
 image_height = 256
 
-# print P3 followed by the width and height, then 255 for max color
-print(f"P3\n{image_width} {image_height}\n255")
+# red/green gradient, rows from top to bottom
+def gradient(image_width: int = image_width, image_height: int = image_height, progress: bool = False) -> List[Color]:
+    rows = range(image_height - 1, -1, -1)
+    pixels = []
+    # use tqdm
+    if progress:
+        from tqdm import tqdm
+        rows = tqdm(rows)
+    for j in rows:
+        for i in range(image_width):
+            pixels.append(Color(i / (image_width - 1), j / (image_height - 1), 0.25))
+    return pixels
 
-# for loops over the image from top to bottom
-# for j in range(image_height - 1, -1, -1):
-# use tqdm
-for j in tqdm(range(image_height - 1, -1, -1)): 
-    for i in range(image_width):
-        
-        color = Color(i / (image_width - 1), j / (image_height - 1), 0.25)
-        
+def main():
+    # print P3 followed by the width and height, then 255 for max color
+    print(f"P3\n{image_width} {image_height}\n255")
+
+    for color in gradient(progress=True):
         print(color.write_color())
 
+if __name__ == '__main__':
+    main()
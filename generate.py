@@ -1,17 +1,22 @@
 from camera import Camera
-from material import Dielectric, Lambertian, Material, Metal
+from material import Dielectric, Lambertian, Material, Metal, intern
 from vec3 import Color, Point3, Vec3
 from ray import Ray
-from tqdm import tqdm
 from math import sqrt, cos
-from hittable import Sphere, HittableList, Torus
-from rtweekend import infinity, pi, degrees_to_radians
-import random
-from typing import List, Tuple
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from hittable import Hittable, Sphere, HittableList, Torus
+from bvh import BVHNode
+from rtweekend import infinity, pi, degrees_to_radians, random_double, random_uniform, seed_rng
+from typing import Callable, List, Optional, Sequence, Tuple
+import argparse
+import os
+import sys
+import time
+from adaptive import AdaptiveSampling, luminance
+from integrator import PathStats, ray_color_iterative
+import samplers
+# the rest of what main() uses is imported inside it, workers that unpickle render_tile only need the above
 
-
-def ray_color(ray: Ray, world: HittableList, depth: int):
+def ray_color(ray: Ray, world: Hittable, depth: int):
     if depth <= 0:
         return Color(0,0,0)
     
@@ -35,30 +40,40 @@ def ray_color(ray: Ray, world: HittableList, depth: int):
 
 # image
 aspect_ratio = 16.0 / 9.0
-image_width = 1200
-image_height = int(image_width / aspect_ratio)
-samples_per_pixel = 100
 max_depth: int = 50
 
-# camera
-lookfrom = Point3(13,2,3)
-lookat = Point3(0,0,0)
-vup: Vec3 = Vec3(0,1,0)
-dist_to_focus = 10
-aperture = 0.1
-camera = Camera(lookfrom, lookat, vup,aperture, dist_to_focus, vfov=20)
+# the still camera's placement and lens, by Camera's argument names
+def camera_fields() -> dict:
+    return dict(lookfrom=Point3(13,2,3), lookat=Point3(0,0,0), vup=Vec3(0,1,0), aperture=0.1, focus_dist=10, vfov=20)
+
+# the still camera, for another image aspect than 16:9
+def make_camera(aspect_ratio: float = aspect_ratio) -> Camera:
+    return Camera(aspect_ratio=aspect_ratio, **camera_fields())
+
+# generate.camera, the 16:9 still camera, is made on first use instead of on import
+def __getattr__(name: str):
+    if name == "camera":
+        global camera
+        camera = make_camera()
+        return camera
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 
 
-def random_scene()->HittableList:
+# grid sets the half width of the field of small spheres, about 4*grid^2 of them
+def random_scene(seed: Optional[int] = None, grid: int = 11)->HittableList:
+    if seed is not None:
+        seed_rng("scene", seed)
     world = HittableList()
-    ground_material = Lambertian(Color(0.5, 0.5, 0.5))
+    # fixed materials are interned, so the glass spheres all share one Dielectric(1.5). the random colors
+    # practically never repeat, an intern table entry for each would cost more than it saves
+    ground_material = intern(Lambertian(Color(0.5, 0.5, 0.5)))
     world.add(Sphere(Point3(0,-1000,0), 1000, ground_material))
-    for a in range(-11,11):
-        for b in range(-11,11):
-            choose_mat = random.random()
-            center: Point3 = Point3(a+0.9*random.random(),0.2,b+0.9*random.random())
+    for a in range(-grid,grid):
+        for b in range(-grid,grid):
+            choose_mat = random_double()
+            center: Point3 = Point3(a+0.9*random_double(),0.2,b+0.9*random_double())
             if ((center - Point3(4, 0.2, 0)).length() > 0.9):
                 sphere_material: Material
                 if choose_mat < 0.8:
@@ -69,53 +84,402 @@ def random_scene()->HittableList:
                 elif choose_mat < 0.95:
                     # metal
                     albedo = Color.random(0.5, 1)
-                    fuzz = random.uniform(0,0.5)
+                    fuzz = random_uniform(0,0.5)
                     sphere_material = Metal(albedo, fuzz)
                     world.add(Sphere(center, 0.2, sphere_material))
                 else:
                     # glass
-                    sphere_material = Dielectric(1.5)
+                    sphere_material = intern(Dielectric(1.5))
                     world.add(Sphere(center, 0.2, sphere_material))
-    material1: Material = Dielectric(1.5)
+    material1: Material = intern(Dielectric(1.5))
     world.add(Sphere(Point3(0,1,0), 1.0, material1))
 
-    material2: Material = Lambertian(Color(0.4, 0.2, 0.1))
+    material2: Material = intern(Lambertian(Color(0.4, 0.2, 0.1)))
     world.add(Sphere(Point3(-4, 1, 0), 1, material2))
 
-    material3: Material = Metal(Color(0.7, 0.6, 0.5), 0)
+    material3: Material = intern(Metal(Color(0.7, 0.6, 0.5), 0))
     world.add(Sphere(Point3(4,1,0), 1, material3))
     return world
 
+# per-sample radiance function for the render loops, the recursive ray_color unless iterative is set.
+# depth defaults to the module's max_depth
+def path_tracer(world: Hittable, iterative: bool = False, roulette_depth: Optional[int] = None, stats: Optional[PathStats] = None, depth: Optional[int] = None) -> Callable[[Ray], Color]:
+    depth = max_depth if depth is None else depth
+    if iterative:
+        return lambda r: ray_color_iterative(r, world, depth, roulette_depth, stats)
+    return lambda r: ray_color(r, world, depth)
+
 # world
-def render_row(width: int, height: int, samples_per_pixel: int, camera: Camera, world: HittableList, row: int) -> Tuple[int, List[Vec3]]:
+def render_row(width: int, height: int, samples_per_pixel: int, camera: Camera, world: Hittable, row: int, iterative: bool = False, roulette_depth: Optional[int] = None, stats: Optional[PathStats] = None, sampler: Optional[samplers.Sampler] = None, max_depth: Optional[int] = None) -> Tuple[int, List[Vec3]]:
+    trace = path_tracer(world, iterative, roulette_depth, stats, max_depth)
+    sampler = samplers.use(sampler)
     row_pixels = []
     for x in range(width):
         pixel_color = Color(0,0,0)
+        sampler.start_pixel()
         for sample in range(samples_per_pixel):
-            u = (x + random.random()) / (width - 1)
-            v = (row + random.random()) / (height - 1)
+            sampler.start_sample(sample)
+            du, dv = sampler.get_2d()
+            u = (x + du) / (width - 1)
+            v = (row + dv) / (height - 1)
             r = camera.get_ray(u,v)
-            pixel_color += ray_color(r, world, max_depth)
+            pixel_color += trace(r)
         row_pixels.append(pixel_color)
     return row, row_pixels
 
-def main():
-    world: HittableList = random_scene()
-    with ProcessPoolExecutor() as executor:
-        futures = [executor.submit(render_row, image_width, image_height, samples_per_pixel, camera, world, row) for row in range(image_height)]
-        rendered_rows = [None for _ in range(image_height)]
-        progress_bar = tqdm(total=image_height, desc="Rendering", ncols=100)
-        for f in as_completed(futures):
-            row, row_pixels = f.result()
-            rendered_rows[row] = row_pixels # type: ignore
-            progress_bar.update(1)
-        progress_bar.close()
-    # render
-    print(f"P3\n{image_width} {image_height}\n255")
-
-    for row in reversed(rendered_rows):
-        for color in row: # type: ignore
-            print(color.write_color(samples_per_pixel))
+# pixels of [x0, x1) x [y0, y1), row by row, summed over samples like render_row, and the samples taken per pixel.
+# the iterative integrator also returns its PathStats for the scheduler to merge
+def render_tile(width: int, height: int, samples_per_pixel: int, camera: Camera, world: Hittable, x0: int, y0: int, x1: int, y1: int, iterative: bool = False, roulette_depth: Optional[int] = None, stats: Optional[PathStats] = None, sampler: Optional[samplers.Sampler] = None, max_depth: Optional[int] = None) -> tuple:
+    if iterative and stats is None:
+        stats = PathStats()
+    trace = path_tracer(world, iterative, roulette_depth, stats, max_depth)
+    sampler = samplers.use(sampler)
+    first = samplers.first_sample(samples_per_pixel)
+    tile_pixels = []
+    for row in range(y0, y1):
+        for x in range(x0, x1):
+            pixel_color = Color(0,0,0)
+            sampler.start_pixel()
+            for sample in range(first, first + samples_per_pixel):
+                sampler.start_sample(sample)
+                du, dv = sampler.get_2d()
+                u = (x + du) / (width - 1)
+                v = (row + dv) / (height - 1)
+                r = camera.get_ray(u,v)
+                pixel_color += trace(r)
+            tile_pixels.append(pixel_color)
+    counts = [samples_per_pixel] * len(tile_pixels)
+    return (tile_pixels, counts, stats) if iterative else (tile_pixels, counts)
+
+# like render_tile, but each pixel stops once its noise estimate drops below sampling.noise_threshold
+def render_tile_adaptive(width: int, height: int, sampling: AdaptiveSampling, camera: Camera, world: Hittable, x0: int, y0: int, x1: int, y1: int, iterative: bool = False, roulette_depth: Optional[int] = None, stats: Optional[PathStats] = None, sampler: Optional[samplers.Sampler] = None, max_depth: Optional[int] = None) -> tuple:
+    if iterative and stats is None:
+        stats = PathStats()
+    trace = path_tracer(world, iterative, roulette_depth, stats, max_depth)
+    sampler = samplers.use(sampler)
+    tile_pixels = []
+    tile_counts = []
+    for row in range(y0, y1):
+        for x in range(x0, x1):
+            pixel_color = Color(0,0,0)
+            n = 0
+            mean = 0.0
+            m2 = 0.0
+            sampler.start_pixel()
+            while not sampling.converged(n, mean, m2):
+                sampler.start_sample(n)
+                du, dv = sampler.get_2d()
+                u = (x + du) / (width - 1)
+                v = (row + dv) / (height - 1)
+                r = camera.get_ray(u,v)
+                sample_color = trace(r)
+                pixel_color += sample_color
+                n += 1
+                sample_luminance = luminance(sample_color)
+                delta = sample_luminance - mean
+                mean += delta / n
+                m2 += delta * (sample_luminance - mean)
+            tile_pixels.append(pixel_color)
+            tile_counts.append(n)
+    return (tile_pixels, tile_counts, stats) if iterative else (tile_pixels, tile_counts)
+
+def render_animation(args: argparse.Namespace, world: HittableList, scene: Optional["scene_file.SceneFile"], render_kwargs: dict):
+    import animation
+    import scheduler
+    from image_io import format_for_path, write_image
+    from tqdm import tqdm
+    if scene is None:
+        camera_defaults = camera_fields()
+        frame_aspect = aspect_ratio
+    else:
+        p = scene.camera_params
+        camera_defaults = dict(lookfrom=Point3(*p[0:3]), lookat=Point3(*p[3:6]), vup=Vec3(*p[6:9]), aperture=p[9], focus_dist=p[10], vfov=p[12])
+        frame_aspect = p[11]
+    spec = animation.Animation.load(args.animation)
+    animated = animation.AnimatedScene(world, spec, camera_defaults, frame_aspect)
+    pattern = args.output or "frame_%04d.ppm"
+    image_format = args.format or format_for_path(pattern % 0)
+    path_stats = PathStats() if args.path_stats else None
+    progress_bar = tqdm(total=spec.frames, desc="Frames", ncols=100)
+    frame_times = []
+
+    def on_frame(frame, pixels, wall_seconds, tile_seconds):
+        with open(animation.frame_path(pattern, frame), "wb") as f:
+            write_image(f, pixels, args.width, args.height, image_format)
+        frame_times.append((frame, wall_seconds, tile_seconds))
+        progress_bar.update(1)
+
+    start = time.perf_counter()
+    scheduler.render_frames(animation.render_tile, (args.spp, animated), args.width, args.height, spec.frames, on_frame,
+                            args.tile_size, args.tile_order, args.workers, args.frame_window, render_kwargs, path_stats, args.seed)
+    progress_bar.close()
+    for frame, wall_seconds, tile_seconds in sorted(frame_times):
+        print(f"frame {frame}: {wall_seconds:.3f}s wall, {tile_seconds:.3f}s in tiles", file=sys.stderr)
+    print(f"{spec.frames} frames in {time.perf_counter() - start:.3f}s", file=sys.stderr)
+    if path_stats is not None:
+        print(path_stats.report(), file=sys.stderr)
+
+def build_parser(prog: Optional[str] = None) -> argparse.ArgumentParser:
+    import backends
+    import scheduler
+    from image_io import FORMATS
+    parser = argparse.ArgumentParser(prog=prog)
+    parser.add_argument("--config", help="TOML file of defaults for any of these flags, see config.py. flags given here win")
+    parser.add_argument("--width", type=int, default=1200)
+    parser.add_argument("--height", type=int, default=None, help="defaults to --width at 16:9, other aspects widen or narrow the view")
+    parser.add_argument("--spp", type=int, default=100, help="samples per pixel")
+    parser.add_argument("--max-depth", type=int, default=max_depth, help="bounces before a path is cut off")
+    parser.add_argument("--engine", choices=list(backends.BACKENDS), default="scalar", help="falls back to scalar when the backend's dependencies are missing")
+    parser.add_argument("--tile-size", type=int, default=32)
+    parser.add_argument("--tile-order", choices=scheduler.TILE_ORDERS, default="spiral")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--executor", choices=scheduler.EXECUTORS, default=None,
+                        help="worker processes, threads sharing one scene, or serial on this thread. threads by default when the GIL is disabled, processes otherwise")
+    parser.add_argument("--stats", action="store_true", help="report IPC bytes and startup latency on stderr")
+    parser.add_argument("--adaptive", action="store_true", help="stop sampling each pixel once it has converged")
+    parser.add_argument("--min-spp", type=int, default=16)
+    parser.add_argument("--max-spp", type=int, default=100)
+    parser.add_argument("--noise-threshold", type=float, default=0.01, help="95%% confidence half width in display units")
+    parser.add_argument("--heatmap", help="write the per-pixel sample counts to this PPM file")
+    parser.add_argument("--pass-spp", type=int, default=None, help="render progressively in passes of this many samples, rounded up to whole passes")
+    parser.add_argument("--checkpoint", help="save the accumulated framebuffer here after every pass")
+    parser.add_argument("--resume", action="store_true", help="continue from --checkpoint if it exists")
+    parser.add_argument("--output", "-o", help="image file, binary PPM on stdout by default")
+    parser.add_argument("--format", choices=FORMATS, help="defaults to the --output extension")
+    parser.add_argument("--seed", type=int, default=None, help="make the scene and every sample reproducible")
+    parser.add_argument("--sampler", choices=list(samplers.SAMPLERS), default="random", help="sample sequence for every random decision (scalar engine)")
+    parser.add_argument("--integrator", choices=["recursive", "iterative"], default="recursive")
+    parser.add_argument("--roulette-depth", type=int, default=None, help="start russian roulette after this many bounces (iterative only)")
+    parser.add_argument("--path-stats", action="store_true", help="report path termination counts and bounce histogram on stderr (iterative only)")
+    parser.add_argument("--scene", help="render this scene file, camera included, instead of random_scene()")
+    parser.add_argument("--export-scene", help="write random_scene() and the camera to this scene file and exit")
+    parser.add_argument("--animation", help="render the frames of this keyframe spec (JSON) to a numbered sequence, see animation.Animation.load")
+    parser.add_argument("--frame-window", type=int, default=2, help="animation frames rendered at once")
+    parser.add_argument("--listen", help="coordinate a distributed render on host:port, workers join with python distributed.py host:port --token TOKEN")
+    parser.add_argument("--token", default=os.environ.get("RAYTRACE_TOKEN"), help="shared secret workers must hold with --listen, $RAYTRACE_TOKEN or a random one printed at start by default")
+    parser.add_argument("--local-workers", type=int, default=0, help="worker processes to start on this machine with --listen")
+    parser.add_argument("--lease-timeout", type=float, default=60.0, help="seconds before a leased tile is handed to another worker")
+    parser.add_argument("--denoise", action="store_true", help="record first-hit albedo, normal and depth buffers and denoise with them before writing (needs numpy)")
+    parser.add_argument("--aov-spp", type=int, default=4, help="camera rays per pixel of the separate buffer pass, when the render cannot record them itself (other engines, --adaptive, --cache, --listen)")
+    parser.add_argument("--aovs", help="also write the buffers as PREFIX_albedo.ppm, PREFIX_normal.ppm and PREFIX_depth.ppm")
+    parser.add_argument("--cache", help="keep every tile of every pass in this directory and reuse them in later renders of the same seeded scene (scalar engine). "
+                        "passes default to blocks of 4 samples, --spp rounded up to whole blocks")
+    parser.add_argument("--framebuffer", help="keep the accumulation buffer in this float32 file, mapped a tile at a time, for images too large for memory (needs numpy)")
+    parser.add_argument("--cache-size", type=float, default=1024, help="megabytes the --cache directory may hold before least recently used tiles go")
+    parser.add_argument("--instrument", action="store_true", help="count rays, intersections and scatters per class and time every tile, reported on stderr")
+    parser.add_argument("--instrument-report", help="also write the instrumentation counters to this JSON file")
+    parser.add_argument("--profile-tile", help="profile the middle tile of the first pass into this file, a cProfile dump or pyinstrument .html/.txt")
+    return parser
+
+# argv defaults to sys.argv[1:], prog to the script name, so raytrace render can hand over its arguments
+def main(argv: Optional[Sequence[str]] = None, prog: Optional[str] = None):
+    import backends
+    import checkpoint
+    import config
+    import distributed
+    import instrument
+    import scene_file
+    import scheduler
+    from adaptive import write_heatmap
+    from image_io import ImageWriter, RowStreamer, format_for_path
+    from tqdm import tqdm
+    parser = build_parser(prog)
+    args = config.parse_args(parser, argv)
+    if args.height is None:
+        args.height = int(args.width / aspect_ratio)
+    view = make_camera() if args.height == int(args.width / aspect_ratio) else make_camera(args.width / args.height)
+    if args.adaptive and args.engine != "scalar":
+        parser.error("--adaptive is only available with --engine=scalar")
+    if args.adaptive and args.pass_spp:
+        parser.error("--pass-spp cannot be combined with --adaptive")
+    if args.adaptive and not 1 <= args.min_spp <= args.max_spp:
+        parser.error(f"--adaptive needs 1 <= --min-spp <= --max-spp, got {args.min_spp} and {args.max_spp}")
+    iterative = args.integrator == "iterative"
+    if (args.roulette_depth is not None or args.path_stats) and not iterative:
+        parser.error("--roulette-depth and --path-stats need --integrator=iterative")
+    if args.animation:
+        still_only = [flag for flag, value in (("--adaptive", args.adaptive), ("--pass-spp", args.pass_spp), ("--checkpoint", args.checkpoint),
+                                               ("--heatmap", args.heatmap), ("--instrument", args.instrument or args.instrument_report),
+                                               ("--profile-tile", args.profile_tile), ("--cache", args.cache),
+                                               ("--executor", args.executor not in (None, "process"))) if value]
+        if args.denoise or args.aovs:
+            still_only.append("--denoise/--aovs")
+        if still_only:
+            parser.error(f"{', '.join(still_only)} cannot be combined with --animation")
+        if args.engine != "scalar":
+            parser.error("--animation is only available with --engine=scalar")
+        if args.output is not None and "%" not in args.output:
+            parser.error("--output needs a frame number pattern like frames/frame_%%04d.png with --animation")
+    if args.listen:
+        local_only = [flag for flag, value in (("--pass-spp", args.pass_spp), ("--checkpoint", args.checkpoint), ("--animation", args.animation),
+                                               ("--stats", args.stats), ("--instrument", args.instrument or args.instrument_report),
+                                               ("--profile-tile", args.profile_tile), ("--cache", args.cache), ("--executor", args.executor)) if value]
+        if local_only:
+            parser.error(f"{', '.join(local_only)} cannot be combined with --listen")
+    if args.framebuffer:
+        in_memory = [flag for flag, value in (("--checkpoint", args.checkpoint), ("--heatmap", args.heatmap), ("--cache", args.cache),
+                                              ("--listen", args.listen), ("--animation", args.animation)) if value]
+        if args.denoise or args.aovs:
+            in_memory.append("--denoise/--aovs")
+        if in_memory:
+            parser.error(f"{', '.join(in_memory)} cannot be combined with --framebuffer")
+    if args.executor is None:
+        # instrument counters patch classes process wide, threads would count into each other's tiles
+        args.executor = "process" if args.instrument or args.instrument_report else scheduler.default_executor()
+    if args.executor == "thread" and (args.instrument or args.instrument_report):
+        parser.error("--instrument needs --executor=process or serial")
+    if args.cache and args.seed is None:
+        parser.error("--cache needs --seed, unseeded tiles never repeat")
+    if args.pass_spp:
+        pass_spp = args.pass_spp
+    elif args.cache and not args.adaptive:
+        # an adaptive tile is one pass whatever its size, min and max spp bound it
+        import tilecache
+        pass_spp = tilecache.BLOCK_SPP
+    else:
+        pass_spp = args.spp
+    passes = -(-args.spp // pass_spp)
+
+    if args.export_scene:
+        scene_file.save(args.export_scene, random_scene(args.seed), view)
+        return
+    scene = scene_file.SceneFile(args.scene) if args.scene else None
+    world: Optional[HittableList] = random_scene(args.seed) if scene is None else None
+    render_kwargs = {"max_depth": args.max_depth}
+    if iterative:
+        render_kwargs.update(iterative=True, roulette_depth=args.roulette_depth)
+    if args.sampler != "random":
+        render_kwargs["sampler"] = samplers.get_sampler(args.sampler)
+    if args.animation:
+        render_animation(args, world if scene is None else scene.world(), scene, render_kwargs)
+        return
+    if args.adaptive:
+        tile_renderer = render_tile_adaptive
+        render_args = (AdaptiveSampling(args.min_spp, args.max_spp, args.noise_threshold),
+                       *((view, BVHNode(world)) if scene is None else (scene.camera(), scene_file.SceneBVH(scene))))
+    else:
+        backend = backends.get_backend(args.engine)
+        if iterative and backend.name != "scalar":
+            parser.error("--integrator applies to the scalar engine")
+        if args.sampler != "random" and backend.name != "scalar":
+            parser.error("--sampler applies to the scalar engine")
+        tile_renderer = backend.tile_renderer()
+        if scene is None:
+            render_args = backend.render_args(pass_spp, view, world)
+        else:
+            render_args = backend.scene_file_render_args(pass_spp, scene)
+        if args.cache and backend.name != "scalar":
+            parser.error("--cache applies to the scalar engine")
+        # the numba kernel already spreads each tile over every core
+        if backend.name == "numba" and args.workers is None:
+            args.workers = 1
+    cache = None
+    if args.cache:
+        import tilecache
+        scene_digest = tilecache.scene_digest(world, view) if scene is None else tilecache.file_digest(args.scene)
+        # samples per pass for fixed passes, the stopping rule for adaptive ones
+        sampling = vars(render_args[0]) if args.adaptive else pass_spp
+        settings = {key: getattr(value, "name", value) for key, value in sorted(render_kwargs.items())}
+        render = tilecache.render_digest(scene_digest, args.width, args.height, args.seed, tile_renderer.__qualname__, sampling, settings)
+        cache = tilecache.TileCache(args.cache, int(args.cache_size * 1024 * 1024), render)
+
+    framebuffer = None
+    passes_done = 0
+    if args.checkpoint and args.resume:
+        restored = checkpoint.load(args.checkpoint, args.width, args.height, scheduler.CHANNELS)
+        if restored is not None:
+            framebuffer, passes_done = restored
+            print(f"resuming from {args.checkpoint} after {passes_done} of {passes} passes", file=sys.stderr)
+
+    output = open(args.output, "wb") if args.output else sys.stdout.buffer
+    image_format = args.format or (format_for_path(args.output) if args.output else "ppm")
+    # a framebuffer file is encoded strip by strip once rendering is done, see outofcore
+    writer = ImageWriter(output, args.width, args.height, image_format) if not args.framebuffer else None
+    streamer = RowStreamer(writer) if writer is not None else None
+    remaining_passes = max(0, passes - passes_done)
+    tile_count = len(scheduler.make_tiles(args.width, args.height, args.tile_size))
+    progress_bar = tqdm(total=tile_count * remaining_passes, desc="Rendering", ncols=100)
+
+    denoising = args.denoise or args.aovs
+
+    def on_tile(pass_index, tile, pixels):
+        progress_bar.update(1)
+        # only the last pass holds final values, stream its rows as they complete. the denoiser needs the whole image
+        if pass_index == passes - 1 and streamer is not None and not args.denoise:
+            streamer.tile_done(tile, pixels)
+
+    def on_pass(pass_index, pixels):
+        if args.checkpoint:
+            checkpoint.save(args.checkpoint, pixels, args.width, args.height, scheduler.CHANNELS, pass_index + 1)
+
+    stats = scheduler.RenderStats() if args.stats else None
+    path_stats = PathStats() if args.path_stats else None
+    counters = instrument.Counters() if args.instrument or args.instrument_report else None
+    tile_stats = path_stats
+    aovs = None
+    # the scalar renderer records the buffers from its own camera rays, which then match the image sample for sample
+    if denoising and not args.adaptive and backend.name == "scalar" and not (args.cache or args.listen):
+        import denoise
+        tile_renderer = denoise.render_tile
+        tile_stats = aovs = denoise.AOVImage(args.width, args.height)
+        aovs.path_stats = path_stats
+    if args.listen:
+        coordinator = distributed.Coordinator(tile_renderer, render_args, args.width, args.height, args.tile_size, args.tile_order, render_kwargs,
+                                              args.seed, args.lease_timeout, on_tile=lambda tile, pixels: on_tile(0, tile, pixels), tile_stats=path_stats,
+                                              token=args.token)
+        host, port = coordinator.serve(*distributed.parse_address(args.listen))
+        print(f"coordinating on {host}:{port}" + ("" if args.token else f", token {coordinator.token}"), file=sys.stderr)
+        distributed.start_local_workers("127.0.0.1" if host == "0.0.0.0" else host, port, args.local_workers, coordinator.token)
+        pixels = coordinator.wait()
+        print(coordinator.report(), file=sys.stderr)
+    elif remaining_passes > 0:
+        pixels = scheduler.render_tiles(tile_renderer, render_args, args.width, args.height, args.tile_size, args.tile_order, args.workers, stats, remaining_passes, framebuffer, on_tile, on_pass, render_kwargs, tile_stats, args.seed, passes_done, counters, args.profile_tile, cache, args.framebuffer, args.executor)
+    else:
+        pixels = framebuffer
+        if not args.denoise:
+            for tile in scheduler.make_tiles(args.width, args.height, args.height):
+                streamer.tile_done(tile, pixels)
+    progress_bar.close()
+    if denoising:
+        import denoise
+        # resumed passes recorded no buffers either
+        if aovs is None or not aovs.counts.all():
+            start = time.perf_counter()
+            aovs = denoise.AOVImage(args.width, args.height)
+            aov_camera, aov_world = (view, BVHNode(world)) if scene is None else (scene.camera(), scene_file.SceneBVH(scene))
+            scheduler.render_tiles(denoise.render_aov_tile, (args.aov_spp, aov_camera, aov_world), args.width, args.height, args.tile_size,
+                                   args.tile_order, args.workers, tile_stats=aovs, seed=args.seed, executor=args.executor)
+            print(f"aov pass: {time.perf_counter() - start:.3f}s", file=sys.stderr)
+        if args.aovs:
+            aovs.write(args.aovs)
+        if args.denoise:
+            start = time.perf_counter()
+            denoised = denoise.denoise(denoise.framebuffer_colors(pixels, args.width, args.height), aovs)
+            print(f"denoise: {time.perf_counter() - start:.3f}s", file=sys.stderr)
+            denoised_pixels = denoise.to_framebuffer(denoised)
+            for tile in scheduler.make_tiles(args.width, args.height, args.height):
+                streamer.tile_done(tile, denoised_pixels)
+    if args.framebuffer:
+        import outofcore
+        outofcore.write_image(output, args.framebuffer, args.width, args.height, image_format)
+    else:
+        writer.close()
+    if args.output:
+        output.close()
+    if stats is not None:
+        print(stats.report(), file=sys.stderr)
+    if path_stats is not None:
+        print(path_stats.report(), file=sys.stderr)
+    if cache is not None:
+        print(cache.stats.report(), file=sys.stderr)
+    if counters is not None:
+        print(counters.report(), file=sys.stderr)
+        if args.instrument_report:
+            with open(args.instrument_report, "w") as f:
+                f.write(counters.to_json() + "\n")
+    if args.heatmap:
+        counts = pixels[scheduler.SAMPLES::scheduler.CHANNELS]
+        write_heatmap(args.heatmap, counts, args.width, args.height, min(counts), max(counts))
 
 if __name__ == '__main__':
     main()
@@ -1,13 +1,16 @@
-from math import sqrt
-from typing import Optional, List, TYPE_CHECKING
+from math import cos, radians, sin, sqrt
+from typing import Optional, List, Sequence, Tuple, TYPE_CHECKING
 if TYPE_CHECKING:
     from material import Material
 from vec3 import Point3, Vec3
 from ray import Ray
+from aabb import AABB
+from quartic import solve_quartic
 
 
 
 class HitRecord:
+    __slots__ = ('point', 'normal', 'material', 't', 'front_face')
     def __init__(self, point: Point3, normal: Vec3, material: 'Material', t: float, front_face: bool):
         self.point = point
         self.normal = normal
@@ -18,11 +21,22 @@ class HitRecord:
         self.front_face = r.direction.dot(outward_normal) < 0
         self.normal = outward_normal if self.front_face else -outward_normal
 class Hittable:
+    # no __dict__ for subclasses that declare their own slots, scenes hold millions of them
+    __slots__ = ()
     def hit(self, r: Ray, t_min: float, t_max: float) -> Optional[HitRecord]:
         raise NotImplementedError
+    def bounding_box(self) -> Optional[AABB]:
+        raise NotImplementedError
     
 class Torus(Hittable):
-    def __init__(self, center: Point3, major_radius: float, minor_radius: float, material: 'Material', max_steps: int = 200, epsilon: float = 1e-3, t_max: float = 1e3):
+    # "analytic" solves the ray/torus quartic, "sdf" sphere traces the distance function. sdf is faster but stops
+    # epsilon off the surface, so rays that pass within epsilon of the torus hit it when they should miss, and
+    # grazing ones can stop on the wrong side of a gap (python -m bench.torus). analytic is the default for that
+    MODES = ("analytic", "sdf")
+
+    def __init__(self, center: Point3, major_radius: float, minor_radius: float, material: 'Material', max_steps: int = 200, epsilon: float = 1e-3, t_max: float = 1e3, mode: str = "analytic"):
+        if mode not in self.MODES:
+            raise ValueError(f"unknown torus mode {mode!r}, expected one of {self.MODES}")
         self.center = center
         self.major_radius = major_radius
         self.minor_radius = minor_radius
@@ -30,55 +44,133 @@ class Torus(Hittable):
         self.epsilon = epsilon
         self.t_max = t_max
         self.material = material
+        self.mode = mode
+        self.box = self.bounding_box()
     
     def hit(self, r: Ray, t_min: float, t_max: float) -> Optional[HitRecord]:
-        t = self.hit_torus(r)
-        if t > 0 and t_min <= t <= t_max:
+        t = self.hit_torus(r, t_min, t_max)
+        if t >= 0:
             p = r.at(t)
             outward_normal = self.torus_normal(p)
             hit_record = HitRecord(point=p, normal=outward_normal, material=self.material, t=t, front_face=True)
             hit_record.set_face_normal(r, outward_normal)
             return hit_record
         return None
+
+    # ring lies in the xy plane around center
+    def bounding_box(self) -> AABB:
+        extent = self.major_radius + self.minor_radius
+        half = Vec3(extent, extent, self.minor_radius)
+        return AABB(self.center - half, self.center + half)
     
     def torus_distance_function(self, point: Point3) -> float:
-        x, y, z = point.e[0] - self.center.e[0], point.e[1] - self.center.e[1], point.e[2] - self.center.e[2]
+        return self._distance(point.x - self.center.x, point.y - self.center.y, point.z - self.center.z)
+
+    # distance in coordinates relative to center
+    def _distance(self, x: float, y: float, z: float) -> float:
         temp = sqrt(x*x + y*y) - self.major_radius
         return sqrt(temp*temp + z*z) - self.minor_radius
 
-    def hit_torus(self, ray: Ray) -> float:
-        t=0.0
-        for _ in range(self.max_steps):
-            point = ray.at(t)
-            d = self.torus_distance_function(point)
+    # closest t in [t_min, t_max], -1 on a miss
+    def hit_torus(self, ray: Ray, t_min: float = 0.0, t_max: float = float('inf')) -> float:
+        if self.mode == "sdf":
+            return self.hit_torus_sdf(ray, t_min, t_max)
+        return self.hit_torus_analytic(ray, t_min, t_max)
+
+    def hit_torus_sdf(self, ray: Ray, t_min: float, t_max: float) -> float:
+        return self.march(ray, t_min, t_max)[0]
+
+    # sphere traces the distance function, returns (t or -1 on a miss, steps taken)
+    def march(self, ray: Ray, t_min: float, t_max: float) -> Tuple[float, int]:
+        # only march the part of the ray inside the bounding box
+        interval = self.box.interval(ray, t_min, min(t_max, self.t_max))
+        if interval is None:
+            return -1.0, 0
+        t, t_exit = interval
+        ox, oy, oz = ray.origin.x - self.center.x, ray.origin.y - self.center.y, ray.origin.z - self.center.z
+        d = ray.direction
+        dx, dy, dz = d.x, d.y, d.z
+        # distances are in world units, step in units of the ray parameter
+        inv_length = 1.0 / sqrt(dx*dx + dy*dy + dz*dz)
+        for step in range(self.max_steps):
+            d = self._distance(ox + t*dx, oy + t*dy, oz + t*dz)
             if d < self.epsilon:
+                return t, step + 1
+            t += d * inv_length
+            if t > t_exit:
+                return -1.0, step + 1
+        return -1.0, self.max_steps
+
+    def hit_torus_analytic(self, ray: Ray, t_min: float, t_max: float) -> float:
+        interval = self.box.interval(ray, t_min, t_max)
+        if interval is None:
+            return -1.0
+        # solve from the box entry point to keep the quartic coefficients small
+        t0 = interval[0]
+        d = ray.direction
+        dx, dy, dz = d.x, d.y, d.z
+        ox = ray.origin.x + t0*dx - self.center.x
+        oy = ray.origin.y + t0*dy - self.center.y
+        oz = ray.origin.z + t0*dz - self.center.z
+        # solve in distance along the unit direction, so the leading coefficient is 1 however short the direction
+        # is, as instance rays scaled into object space can be. s comes back in ray units divided by the length
+        length = sqrt(dx*dx + dy*dy + dz*dz)
+        dx, dy, dz = dx / length, dy / length, dz / length
+
+        # (|o + s d|^2 + R^2 - r^2)^2 = 4 R^2 ((ox + s dx)^2 + (oy + s dy)^2)
+        four_r2 = 4.0 * self.major_radius * self.major_radius
+        f = ox*dx + oy*dy + oz*dz
+        e = ox*ox + oy*oy + oz*oz + self.major_radius*self.major_radius - self.minor_radius*self.minor_radius
+        roots = solve_quartic(
+            1.0,
+            4.0*f,
+            4.0*f*f + 2.0*e - four_r2*(dx*dx + dy*dy),
+            4.0*f*e - 2.0*four_r2*(ox*dx + oy*dy),
+            e*e - four_r2*(ox*ox + oy*oy),
+        )
+        for s in roots:
+            t = t0 + s / length
+            if t_min <= t <= t_max:
                 return t
-            t += d
-            if t > self.t_max:
-                break
         return -1.0
-    
+
     def torus_normal(self, point: Point3, delta: float = 1e-5) -> Vec3:
-        dx = Vec3(delta, 0, 0)
-        dy = Vec3(0, delta, 0)
-        dz = Vec3(0, 0, delta)
-        
-        nx = self.torus_distance_function(point + dx) - self.torus_distance_function(point - dx)
-        ny = self.torus_distance_function(point + dy) - self.torus_distance_function(point - dy)
-        nz = self.torus_distance_function(point + dz) - self.torus_distance_function(point - dz)
+        if self.mode == "sdf":
+            return self.sdf_normal(point, delta)
+        return self.analytic_normal(point)
+
+    # points from the nearest point on the ring through the hit point
+    def analytic_normal(self, point: Point3) -> Vec3:
+        x, y, z = point.x - self.center.x, point.y - self.center.y, point.z - self.center.z
+        ring_distance = sqrt(x*x + y*y)
+        if ring_distance == 0:
+            return Vec3(0, 0, 1 if z >= 0 else -1)
+        scale = 1.0 - self.major_radius / ring_distance
+        return Vec3(x * scale, y * scale, z).unit_vector()
+
+    def sdf_normal(self, point: Point3, delta: float = 1e-5) -> Vec3:
+        x, y, z = point.x - self.center.x, point.y - self.center.y, point.z - self.center.z
+        nx = self._distance(x + delta, y, z) - self._distance(x - delta, y, z)
+        ny = self._distance(x, y + delta, z) - self._distance(x, y - delta, z)
+        nz = self._distance(x, y, z + delta) - self._distance(x, y, z - delta)
 
         return Vec3(nx, ny, nz).unit_vector()
 
 class Sphere(Hittable):
+    __slots__ = ('center', 'radius', 'material')
     def __init__(self, center: Point3, radius: float, material: 'Material'):
         self.center = center
         self.radius = radius
         self.material = material
     def hit(self, r: Ray, t_min: float, t_max: float) -> Optional[HitRecord]:
-        oc = r.origin - self.center
-        a = r.direction.length_squared()
-        half_b = oc.dot(r.direction)
-        c = oc.length_squared() - self.radius * self.radius
+        # plain floats instead of Vec3 temporaries, this is the innermost loop
+        o = r.origin
+        d = r.direction
+        center = self.center
+        ocx, ocy, ocz = o.x - center.x, o.y - center.y, o.z - center.z
+        a = d.x * d.x + d.y * d.y + d.z * d.z
+        half_b = ocx * d.x + ocy * d.y + ocz * d.z
+        c = ocx * ocx + ocy * ocy + ocz * ocz - self.radius * self.radius
 
         discriminant = half_b * half_b - a * c
         if(discriminant < 0):
@@ -92,11 +184,19 @@ class Sphere(Hittable):
             if(root < t_min or t_max < root):
                 return None
         t = root
-        p = r.at(t)
-        outward_normal = (p - self.center) / self.radius
+        p = Vec3(o.x + t * d.x, o.y + t * d.y, o.z + t * d.z)
+        inv_radius = 1.0 / self.radius
+        outward_normal = Vec3((p.x - center.x) * inv_radius, (p.y - center.y) * inv_radius, (p.z - center.z) * inv_radius)
         rec = HitRecord(point=p, normal=outward_normal, material=self.material, t=t, front_face = True)
         rec.set_face_normal(r, outward_normal)
         return rec
+    def bounding_box(self) -> AABB:
+        half = Vec3(self.radius, self.radius, self.radius)
+        return AABB(self.center - half, self.center + half)
+    def __getstate__(self):
+        return (self.center, self.radius, self.material)
+    def __setstate__(self, state):
+        self.center, self.radius, self.material = state
 
 class HittableList(Hittable):
     def __init__(self, objects: Optional[List[Hittable]] = None):
@@ -118,4 +218,120 @@ class HittableList(Hittable):
                 hit_anything = True
                 closest_so_far = temp_record.t
                 closest_record = temp_record
-        return closest_record if hit_anything else None
\ No newline at end of file
+        return closest_record if hit_anything else None
+
+    def bounding_box(self) -> Optional[AABB]:
+        output_box = None
+        for obj in self.objects:
+            box = obj.bounding_box()
+            if box is None:
+                return None
+            output_box = box if output_box is None else AABB.surrounding_box(output_box, box)
+        return output_box
+
+
+# 3x4 affine matrices, row-major (a, b, c, tx, d, e, f, ty, g, h, i, tz), applied as m @ (x, y, z, 1)
+def _compose(m: Sequence[float], n: Sequence[float]) -> Tuple[float, ...]:
+    out = []
+    for row in range(0, 12, 4):
+        a, b, c, t = m[row:row + 4]
+        out.extend((a*n[0] + b*n[4] + c*n[8], a*n[1] + b*n[5] + c*n[9], a*n[2] + b*n[6] + c*n[10], a*n[3] + b*n[7] + c*n[11] + t))
+    return tuple(out)
+
+
+def _invert(m: Sequence[float]) -> Tuple[float, ...]:
+    a, b, c, tx, d, e, f, ty, g, h, i, tz = m
+    # cofactors of the linear part
+    A, B, C = e*i - f*h, f*g - d*i, d*h - e*g
+    det = a*A + b*B + c*C
+    if det == 0:
+        raise ValueError("transform is not invertible")
+    inv = 1.0 / det
+    ia, ib, ic = A*inv, (c*h - b*i)*inv, (b*f - c*e)*inv
+    id_, ie, if_ = B*inv, (a*i - c*g)*inv, (c*d - a*f)*inv
+    ig, ih, ii = C*inv, (b*g - a*h)*inv, (a*e - b*d)*inv
+    return (ia, ib, ic, -(ia*tx + ib*ty + ic*tz),
+            id_, ie, if_, -(id_*tx + ie*ty + if_*tz),
+            ig, ih, ii, -(ig*tx + ih*ty + ii*tz))
+
+
+# an affine map from an instance's object space to world space. a @ b applies b first.
+# the inverse is always recomputed from the matrix, also after unpickling, so every process gets the same one
+class Transform:
+    __slots__ = ('matrix', 'inverse')
+
+    def __init__(self, matrix: Sequence[float] = (1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0)):
+        if len(matrix) != 12:
+            raise ValueError(f"a transform takes 12 values, got {len(matrix)}")
+        self.matrix = tuple(float(v) for v in matrix)
+        self.inverse = _invert(self.matrix)
+
+    @staticmethod
+    def translate(offset: Vec3) -> 'Transform':
+        return Transform((1.0, 0.0, 0.0, offset.x, 0.0, 1.0, 0.0, offset.y, 0.0, 0.0, 1.0, offset.z))
+
+    # uniform when only x is given
+    @staticmethod
+    def scale(x: float, y: Optional[float] = None, z: Optional[float] = None) -> 'Transform':
+        y = x if y is None else y
+        z = x if z is None else z
+        return Transform((x, 0.0, 0.0, 0.0, 0.0, y, 0.0, 0.0, 0.0, 0.0, z, 0.0))
+
+    # counterclockwise looking down the axis towards the origin
+    @staticmethod
+    def rotate(axis: Vec3, degrees: float) -> 'Transform':
+        x, y, z = axis.unit_vector().e
+        s, c = sin(radians(degrees)), cos(radians(degrees))
+        k = 1.0 - c
+        return Transform((c + x*x*k, x*y*k - z*s, x*z*k + y*s, 0.0,
+                          y*x*k + z*s, c + y*y*k, y*z*k - x*s, 0.0,
+                          z*x*k - y*s, z*y*k + x*s, c + z*z*k, 0.0))
+
+    def __matmul__(self, other: 'Transform') -> 'Transform':
+        return Transform(_compose(self.matrix, other.matrix))
+
+    def point(self, p: Point3) -> Point3:
+        a, b, c, tx, d, e, f, ty, g, h, i, tz = self.matrix
+        return Point3(a*p.x + b*p.y + c*p.z + tx, d*p.x + e*p.y + f*p.z + ty, g*p.x + h*p.y + i*p.z + tz)
+
+    def __getstate__(self):
+        return self.matrix
+
+    def __setstate__(self, state):
+        self.matrix = state
+        self.inverse = _invert(state)
+
+
+# shared geometry, any Hittable including a BVHNode of many objects, placed by a transform. rays go into object
+# space unnormalized, so hit distances are the same in both spaces. an instance costs its transform, whatever it shows
+class Instance(Hittable):
+    __slots__ = ('object', 'transform')
+
+    def __init__(self, obj: Hittable, transform: Transform):
+        self.object = obj
+        self.transform = transform
+
+    def hit(self, r: Ray, t_min: float, t_max: float) -> Optional[HitRecord]:
+        a, b, c, tx, d, e, f, ty, g, h, i, tz = self.transform.inverse
+        o = r.origin
+        v = r.direction
+        local = Ray(Vec3(a*o.x + b*o.y + c*o.z + tx, d*o.x + e*o.y + f*o.z + ty, g*o.x + h*o.y + i*o.z + tz),
+                    Vec3(a*v.x + b*v.y + c*v.z, d*v.x + e*v.y + f*v.z, g*v.x + h*v.y + i*v.z))
+        rec = self.object.hit(local, t_min, t_max)
+        if rec is None:
+            return None
+        rec.point = r.at(rec.t)
+        # normals take the inverse transpose, which keeps them facing the same side of the ray
+        n = rec.normal
+        rec.normal = Vec3(a*n.x + d*n.y + g*n.z, b*n.x + e*n.y + h*n.z, c*n.x + f*n.y + i*n.z).unit_vector()
+        return rec
+
+    # around the transformed corners of the object's box
+    def bounding_box(self) -> Optional[AABB]:
+        box = self.object.bounding_box()
+        if box is None:
+            return None
+        lo, hi = box.minimum, box.maximum
+        corners = [self.transform.point(Point3(x, y, z)) for x in (lo.x, hi.x) for y in (lo.y, hi.y) for z in (lo.z, hi.z)]
+        return AABB(Point3(min(p.x for p in corners), min(p.y for p in corners), min(p.z for p in corners)),
+                    Point3(max(p.x for p in corners), max(p.y for p in corners), max(p.z for p in corners)))
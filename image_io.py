@@ -0,0 +1,92 @@
+import struct
+import zlib
+from math import sqrt
+from typing import BinaryIO, Sequence
+
+FORMATS = ("ppm", "png")
+
+
+def format_for_path(path: str) -> str:
+    return "png" if path.lower().endswith(".png") else "ppm"
+
+
+# one output row of 8-bit rgb from a framebuffer of r, g, b sums and sample counts,
+# same gamma 2 and clamping as Vec3.write_color
+def encode_row(pixels: Sequence[float], row: int, width: int, channels: int = 4, samples: int = 3) -> bytes:
+    out = bytearray(3 * width)
+    i = row * width * channels
+    for x in range(width):
+        count = pixels[i + samples]
+        scale = 1.0 / count if count > 0 else 0.0
+        for c in range(3):
+            value = sqrt(max(0.0, scale * pixels[i + c]))
+            out[3 * x + c] = int(256 * min(value, 0.999))
+        i += channels
+    return bytes(out)
+
+
+class ImageWriter:
+    def __init__(self, stream: BinaryIO, width: int, height: int, format: str = "ppm"):
+        if format not in FORMATS:
+            raise ValueError(f"unknown image format {format!r}, expected one of {FORMATS}")
+        self.stream = stream
+        self.width = width
+        self.height = height
+        self.format = format
+        self.rows_written = 0
+        if format == "ppm":
+            stream.write(f"P6\n{width} {height}\n255\n".encode())
+        else:
+            stream.write(b"\x89PNG\r\n\x1a\n")
+            # 8 bit truecolor, no interlace
+            self._chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            self._compressor = zlib.compressobj()
+
+    def _chunk(self, kind: bytes, data: bytes):
+        self.stream.write(struct.pack(">I", len(data)))
+        self.stream.write(kind)
+        self.stream.write(data)
+        self.stream.write(struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff))
+
+    # rows go out top to bottom
+    def write_row(self, rgb: bytes):
+        if self.format == "ppm":
+            self.stream.write(rgb)
+        else:
+            # filter type 0 per scanline, each compressed piece becomes its own IDAT chunk
+            data = self._compressor.compress(b"\x00" + rgb)
+            if data:
+                self._chunk(b"IDAT", data)
+        self.rows_written += 1
+
+    def close(self):
+        if self.format == "png":
+            self._chunk(b"IDAT", self._compressor.flush())
+            self._chunk(b"IEND", b"")
+        self.stream.flush()
+
+
+# the whole framebuffer, rows bottom-up as rendered
+def write_image(stream: BinaryIO, pixels: Sequence[float], width: int, height: int, format: str = "ppm"):
+    writer = ImageWriter(stream, width, height, format)
+    for row in reversed(range(height)):
+        writer.write_row(encode_row(pixels, row, width))
+    writer.close()
+
+
+# feeds finished tiles to an ImageWriter and writes each output row as soon as every tile covering it is done
+class RowStreamer:
+    def __init__(self, writer: ImageWriter):
+        self.writer = writer
+        self.remaining = [writer.width] * writer.height
+
+    def tile_done(self, tile, pixels: Sequence[float]):
+        x0, y0, x1, y1 = tile
+        for row in range(y0, y1):
+            self.remaining[row] -= x1 - x0
+        height = self.writer.height
+        while self.writer.rows_written < height:
+            row = height - 1 - self.writer.rows_written
+            if self.remaining[row] > 0:
+                break
+            self.writer.write_row(encode_row(pixels, row, self.writer.width))
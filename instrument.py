@@ -0,0 +1,152 @@
+import json
+from typing import Callable, Dict, List, Optional, Tuple
+from camera import Camera
+from hittable import Hittable, Torus
+from material import Material
+
+# counters are only collected while enable() has swapped counting wrappers into the classes,
+# so a render that never enables them runs the original methods untouched
+
+
+class Counters:
+    def __init__(self):
+        self.counts: Dict[str, int] = {}
+        self.tile_seconds: List[float] = []
+
+    def add(self, key: str, n: int = 1):
+        self.counts[key] = self.counts.get(key, 0) + n
+
+    def merge(self, other: 'Counters'):
+        for key, n in other.counts.items():
+            self.add(key, n)
+        self.tile_seconds.extend(other.tile_seconds)
+
+    def to_dict(self) -> Dict:
+        tiles = self.tile_seconds
+        return dict(
+            counts=dict(sorted(self.counts.items())),
+            tiles=dict(
+                count=len(tiles),
+                total_seconds=sum(tiles),
+                min_seconds=min(tiles, default=0.0),
+                max_seconds=max(tiles, default=0.0),
+                mean_seconds=sum(tiles) / len(tiles) if tiles else 0.0,
+            ),
+        )
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=2)
+
+    def report(self) -> str:
+        data = self.to_dict()
+        width = max((len(key) for key in data["counts"]), default=0)
+        lines = [f"{key:<{width}}  {n}" for key, n in data["counts"].items()]
+        tiles = data["tiles"]
+        lines.append(f"tiles: {tiles['count']}, {tiles['total_seconds']:.3f}s total, "
+                     f"{tiles['min_seconds']:.3f}s min, {tiles['mean_seconds']:.3f}s mean, {tiles['max_seconds']:.3f}s max")
+        return "\n".join(lines)
+
+
+_counters: Optional[Counters] = None
+_originals: List[Tuple[type, str, Callable]] = []
+
+
+def _subclasses(cls: type) -> List[type]:
+    found = []
+    for sub in cls.__subclasses__():
+        found.append(sub)
+        found.extend(_subclasses(sub))
+    return found
+
+
+def _patch(cls: type, name: str, make_wrapper: Callable[[Callable], Callable]):
+    original = cls.__dict__[name]
+    _originals.append((cls, name, original))
+    setattr(cls, name, make_wrapper(original))
+
+
+def _hit_wrapper(cls: type) -> Callable[[Callable], Callable]:
+    calls = f"hit.{cls.__name__}.calls"
+    hits = f"hit.{cls.__name__}.hits"
+    def make(original):
+        def hit(self, r, t_min, t_max):
+            counts = _counters.counts
+            counts[calls] = counts.get(calls, 0) + 1
+            record = original(self, r, t_min, t_max)
+            if record is not None:
+                counts[hits] = counts.get(hits, 0) + 1
+            return record
+        return hit
+    return make
+
+
+def _scatter_wrapper(cls: type) -> Callable[[Callable], Callable]:
+    calls = f"scatter.{cls.__name__}.calls"
+    absorbed = f"scatter.{cls.__name__}.absorbed"
+    def make(original):
+        def scatter(self, ray_in, hit_record):
+            counts = _counters.counts
+            counts[calls] = counts.get(calls, 0) + 1
+            result = original(self, ray_in, hit_record)
+            if result is None:
+                counts[absorbed] = counts.get(absorbed, 0) + 1
+            else:
+                counts["rays.secondary"] = counts.get("rays.secondary", 0) + 1
+            return result
+        return scatter
+    return make
+
+
+def _get_ray_wrapper(original):
+    def get_ray(self, s, t):
+        counts = _counters.counts
+        counts["rays.primary"] = counts.get("rays.primary", 0) + 1
+        return original(self, s, t)
+    return get_ray
+
+
+def _march_wrapper(original):
+    def march(self, ray, t_min, t_max):
+        result = original(self, ray, t_min, t_max)
+        _counters.add("torus.march_steps", result[1])
+        return result
+    return march
+
+
+# swaps counting wrappers into every loaded Hittable and Material subclass, Camera.get_ray and Torus.march
+def enable() -> Counters:
+    global _counters
+    if _counters is not None:
+        return _counters
+    _counters = Counters()
+    for cls in _subclasses(Hittable):
+        if "hit" in cls.__dict__:
+            _patch(cls, "hit", _hit_wrapper(cls))
+    for cls in _subclasses(Material):
+        if "scatter" in cls.__dict__:
+            _patch(cls, "scatter", _scatter_wrapper(cls))
+    _patch(Camera, "get_ray", _get_ray_wrapper)
+    _patch(Torus, "march", _march_wrapper)
+    return _counters
+
+
+def disable():
+    global _counters
+    while _originals:
+        cls, name, original = _originals.pop()
+        setattr(cls, name, original)
+    _counters = None
+
+
+def current() -> Optional[Counters]:
+    return _counters
+
+
+# hands back what was counted so far and starts a fresh set, used per tile by the scheduler
+def take() -> Optional[Counters]:
+    global _counters
+    if _counters is None:
+        return None
+    taken = _counters
+    _counters = Counters()
+    return taken
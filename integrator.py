@@ -0,0 +1,87 @@
+from typing import List, Optional
+from hittable import Hittable
+from ray import Ray
+from rtweekend import infinity
+import samplers
+from vec3 import Color
+
+
+# how paths ended, and after how many bounces
+class PathStats:
+    def __init__(self):
+        # depth_histogram[n] counts paths that ended after n scatters
+        self.depth_histogram: List[int] = []
+        self.escaped = 0
+        self.absorbed = 0
+        self.roulette = 0
+        self.depth_limit = 0
+
+    def record(self, bounces: int):
+        if bounces >= len(self.depth_histogram):
+            self.depth_histogram.extend([0] * (bounces + 1 - len(self.depth_histogram)))
+        self.depth_histogram[bounces] += 1
+
+    def merge(self, other: 'PathStats'):
+        missing = len(other.depth_histogram) - len(self.depth_histogram)
+        if missing > 0:
+            self.depth_histogram.extend([0] * missing)
+        for bounces, count in enumerate(other.depth_histogram):
+            self.depth_histogram[bounces] += count
+        self.escaped += other.escaped
+        self.absorbed += other.absorbed
+        self.roulette += other.roulette
+        self.depth_limit += other.depth_limit
+
+    @property
+    def paths(self) -> int:
+        return self.escaped + self.absorbed + self.roulette + self.depth_limit
+
+    def report(self) -> str:
+        lines = [
+            f"paths:        {self.paths}",
+            f"escaped:      {self.escaped}",
+            f"absorbed:     {self.absorbed}",
+            f"roulette:     {self.roulette}",
+            f"depth limit:  {self.depth_limit}",
+            "bounces  paths",
+        ]
+        lines.extend(f"{bounces:>7}  {count}" for bounces, count in enumerate(self.depth_histogram))
+        return "\n".join(lines)
+
+
+# generate.ray_color as a loop: attenuation goes into a running throughput instead of the call stack.
+# after roulette_depth bounces a path survives with probability equal to its largest throughput
+# component and is reweighted by 1/p, which ends dim paths early without biasing the estimate.
+def ray_color_iterative(ray: Ray, world: Hittable, depth: int, roulette_depth: Optional[int] = None, stats: Optional[PathStats] = None) -> Color:
+    throughput = Color(1.0, 1.0, 1.0)
+    bounces = 0
+    while bounces < depth:
+        hit_record = world.hit(ray, 0.001, infinity)
+        if hit_record is None:
+            unit_direction = ray.direction.unit_vector()
+            t = 0.5*(unit_direction.y + 1.0)
+            if stats is not None:
+                stats.escaped += 1
+                stats.record(bounces)
+            return Color(throughput.x * (1.0 - 0.5*t), throughput.y * (1.0 - 0.3*t), throughput.z)
+        result = hit_record.material.scatter(ray, hit_record)
+        if result is None:
+            if stats is not None:
+                stats.absorbed += 1
+                stats.record(bounces)
+            return Color(0,0,0)
+        ray, attenuation = result
+        throughput = throughput * attenuation
+        bounces += 1
+        if roulette_depth is not None and bounces >= roulette_depth:
+            survival = min(max(throughput.x, throughput.y, throughput.z), 1.0)
+            if samplers.active.sampler.get_1d() >= survival:
+                if stats is not None:
+                    stats.roulette += 1
+                    stats.record(bounces)
+                return Color(0,0,0)
+            throughput /= survival
+    if stats is not None:
+        stats.depth_limit += 1
+        stats.record(bounces)
+    return Color(0,0,0)
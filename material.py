@@ -1,7 +1,8 @@
+import weakref
 from math import sqrt
 from typing import Optional, Tuple, TYPE_CHECKING
 from hittable import HitRecord
-from random import random
+import samplers
 if TYPE_CHECKING:
     from hittable import HitRecord
 
@@ -10,18 +11,32 @@ from vec3 import Color, Vec3
 
 def reflect(v: Vec3, n: Vec3) -> Vec3:
     dot_product = v.dot(n)
-    return v - 2*dot_product*n
+    return Vec3.axpy(v, -2*dot_product, n)
 
 class Material:
     def scatter(self, ray_in: Ray, hit_record: 'HitRecord')->Optional[Tuple[Ray, Color]]:
         raise NotImplementedError
+
+    # the surface color at a first hit, for the denoiser's albedo buffer
+    def surface_albedo(self) -> Color:
+        return Color(1, 1, 1)
+
+    # equal keys render the same, see intern. a material without parameters of its own is only equal to itself
+    def key(self) -> tuple:
+        return (type(self), id(self))
     
 class Lambertian(Material):
     def __init__(self, albedo: Color):
         self.albedo = albedo
 
+    def surface_albedo(self) -> Color:
+        return self.albedo
+
+    def key(self) -> tuple:
+        return (Lambertian, self.albedo.e)
+
     def scatter(self, ray_in: Ray, hit_record: 'HitRecord') ->Tuple[Ray, Color]:
-        scattered_direction: Vec3 = hit_record.normal + Vec3.random_unit_vector()
+        scattered_direction: Vec3 = hit_record.normal + samplers.unit_vector(*samplers.active.sampler.get_2d())
         
         if scattered_direction.near_zero():
             scattered_direction = hit_record.normal
@@ -34,16 +49,26 @@ class Metal(Material):
     def __init__(self, albedo: Color, fuzz: float):
         self.albedo = albedo
         self.fuzz = min(fuzz, 1)
+
+    def surface_albedo(self) -> Color:
+        return self.albedo
+
+    def key(self) -> tuple:
+        return (Metal, self.albedo.e, self.fuzz)
     
     def scatter(self, ray_in: Ray, hit_record: 'HitRecord') -> Optional[Tuple[Ray, Color]]:
         reflected: Vec3 = reflect(ray_in.direction.unit_vector(), hit_record.normal)
-        scattered_ray: Ray = Ray(hit_record.point, reflected + self.fuzz*Vec3.random_in_unit_sphere())
+        fuzz_direction = samplers.in_unit_sphere(*samplers.active.sampler.get_2d(), samplers.active.sampler.get_1d())
+        scattered_ray: Ray = Ray(hit_record.point, Vec3.axpy(reflected, self.fuzz, fuzz_direction))
         return ((scattered_ray, self.albedo) if (scattered_ray.direction.dot(hit_record.normal) > 0) else None) 
     
 class Dielectric(Material):
     def __init__(self, index_of_refraction:float):
         self.index_of_refraction = index_of_refraction
         self.attenuation = Color(1,1,1)
+
+    def key(self) -> tuple:
+        return (Dielectric, self.index_of_refraction)
     
     def reflectance(self, cosine: float, ref_idx: float):
         # schlicks approximation
@@ -63,7 +88,7 @@ class Dielectric(Material):
 
         direction: Vec3
 
-        if cannot_refract or (self.reflectance(cos_theta, refraction_ratio) > random()):
+        if cannot_refract or (self.reflectance(cos_theta, refraction_ratio) > samplers.active.sampler.get_1d()):
             direction = reflect(unit_direction, hit_record.normal)
         else:
             direction = unit_direction.refract(hit_record.normal, refraction_ratio)
@@ -74,3 +99,12 @@ class Dielectric(Material):
 
         return (scattered, self.attenuation)
 
+
+# one live object per material key. weak, so a material goes once no scene uses it
+_interned: 'weakref.WeakValueDictionary[tuple, Material]' = weakref.WeakValueDictionary()
+
+
+# the interned material equal to this one, scenes built through it share one object per distinct material,
+# which also pickles once
+def intern(material: Material) -> Material:
+    return _interned.setdefault(material.key(), material)
@@ -0,0 +1,323 @@
+import math
+from typing import List, Tuple
+import numpy as np
+from numba import njit, prange
+from backends import DIELECTRIC, LAMBERTIAN, METAL, SceneBuffers
+from vec3 import Color, Vec3
+import rtweekend
+
+# same bounce limit as generate.max_depth
+MAX_DEPTH = 50
+T_MIN = 0.001
+EPSILON = 1e-12
+
+
+@njit(cache=True)
+def _random_in_unit_sphere():
+    while True:
+        x = np.random.uniform(-1.0, 1.0)
+        y = np.random.uniform(-1.0, 1.0)
+        z = np.random.uniform(-1.0, 1.0)
+        if x * x + y * y + z * z < 1.0:
+            return x, y, z
+
+
+@njit(cache=True)
+def _random_in_unit_disk():
+    while True:
+        x = np.random.uniform(-1.0, 1.0)
+        y = np.random.uniform(-1.0, 1.0)
+        if x * x + y * y < 1.0:
+            return x, y
+
+
+@njit(cache=True)
+def _quadratic_roots(a, b, c, out, count):
+    # appends the real roots of a x^2 + b x + c to out, returns the new count
+    if abs(a) < EPSILON:
+        if abs(b) >= EPSILON:
+            out[count] = -c / b
+            count += 1
+        return count
+    discriminant = b * b - 4.0 * a * c
+    if discriminant < 0.0:
+        return count
+    q = -0.5 * (b + math.copysign(math.sqrt(discriminant), b))
+    if q == 0.0:
+        out[count] = 0.0
+        return count + 1
+    out[count] = q / a
+    out[count + 1] = c / q
+    return count + 2
+
+
+@njit(cache=True)
+def _largest_cubic_root(a, b, c):
+    # largest real root of x^3 + a x^2 + b x + c, as quartic.solve_monic_cubic
+    q = (a * a - 3.0 * b) / 9.0
+    r = (2.0 * a * a * a - 9.0 * a * b + 27.0 * c) / 54.0
+    shift = a / 3.0
+    if r * r < q * q * q:
+        theta = math.acos(max(-1.0, min(1.0, r / math.sqrt(q * q * q))))
+        scale = -2.0 * math.sqrt(q)
+        x0 = scale * math.cos(theta / 3.0) - shift
+        x1 = scale * math.cos((theta + 2.0 * math.pi) / 3.0) - shift
+        x2 = scale * math.cos((theta - 2.0 * math.pi) / 3.0) - shift
+        return max(x0, max(x1, x2))
+    big_a = -math.copysign((abs(r) + math.sqrt(r * r - q * q * q)) ** (1.0 / 3.0), r)
+    big_b = q / big_a if big_a != 0.0 else 0.0
+    return big_a + big_b - shift
+
+
+@njit(cache=True)
+def _polish(c4, c3, c2, c1, c0, x):
+    for _ in range(2):
+        value = (((c4 * x + c3) * x + c2) * x + c1) * x + c0
+        derivative = ((4.0 * c4 * x + 3.0 * c3) * x + 2.0 * c2) * x + c1
+        if derivative == 0.0:
+            break
+        x -= value / derivative
+    return x
+
+
+@njit(cache=True)
+def _quartic_roots(c4, c3, c2, c1, c0, out):
+    # Ferrari's method as in quartic.solve_quartic, roots are written unsorted, returns the count. callers pass
+    # unit directions so c4 is 1, a vanishing one has no quartic roots to find
+    if abs(c4) < EPSILON:
+        return 0
+    a, b, c, d = c3 / c4, c2 / c4, c1 / c4, c0 / c4
+    a2 = a * a
+    p = b - 3.0 * a2 / 8.0
+    q = c - a * b / 2.0 + a2 * a / 8.0
+    r = d - a * c / 4.0 + a2 * b / 16.0 - 3.0 * a2 * a2 / 256.0
+    count = 0
+    if abs(q) < EPSILON:
+        zs = np.empty(2)
+        n = _quadratic_roots(1.0, p, r, zs, 0)
+        for i in range(n):
+            if zs[i] >= 0.0:
+                out[count] = math.sqrt(zs[i])
+                out[count + 1] = -out[count]
+                count += 2
+    else:
+        e = p * p / 4.0 - r
+        f = -q * q / 8.0
+        m = _largest_cubic_root(p, e, f)
+        m = _polish(0.0, 1.0, p, e, f, m)
+        if m <= 0.0:
+            return 0
+        s = math.sqrt(2.0 * m)
+        count = _quadratic_roots(1.0, s, p / 2.0 + m - q / (2.0 * s), out, count)
+        count = _quadratic_roots(1.0, -s, p / 2.0 + m + q / (2.0 * s), out, count)
+    for i in range(count):
+        out[i] = _polish(c4, c3, c2, c1, c0, out[i] - a / 4.0)
+    return count
+
+
+@njit(cache=True)
+def _box_interval(ox, oy, oz, dx, dy, dz, lo, hi, t_min, t_max):
+    o = (ox, oy, oz)
+    d = (dx, dy, dz)
+    for axis in range(3):
+        if d[axis] == 0.0:
+            if o[axis] < lo[axis] or o[axis] > hi[axis]:
+                return -1.0, -1.0
+            continue
+        inv_d = 1.0 / d[axis]
+        t0 = (lo[axis] - o[axis]) * inv_d
+        t1 = (hi[axis] - o[axis]) * inv_d
+        if inv_d < 0.0:
+            t0, t1 = t1, t0
+        t_min = max(t_min, t0)
+        t_max = min(t_max, t1)
+        if t_max < t_min:
+            return -1.0, -1.0
+    return t_min, t_max
+
+
+@njit(cache=True)
+def _hit_torus(center, major, minor, ox, oy, oz, dx, dy, dz, t_min, t_max, roots):
+    # analytic Torus.hit_torus_analytic, -1 on a miss
+    extent = major + minor
+    lo = (center[0] - extent, center[1] - extent, center[2] - minor)
+    hi = (center[0] + extent, center[1] + extent, center[2] + minor)
+    t0, t1 = _box_interval(ox, oy, oz, dx, dy, dz, lo, hi, t_min, t_max)
+    if t1 < 0.0:
+        return -1.0
+    px = ox + t0 * dx - center[0]
+    py = oy + t0 * dy - center[1]
+    pz = oz + t0 * dz - center[2]
+    # in distance along the unit direction, like Torus.hit_torus_analytic
+    length = math.sqrt(dx * dx + dy * dy + dz * dz)
+    dx, dy, dz = dx / length, dy / length, dz / length
+    four_r2 = 4.0 * major * major
+    f = px * dx + py * dy + pz * dz
+    e = px * px + py * py + pz * pz + major * major - minor * minor
+    n = _quartic_roots(
+        1.0,
+        4.0 * f,
+        4.0 * f * f + 2.0 * e - four_r2 * (dx * dx + dy * dy),
+        4.0 * f * e - 2.0 * four_r2 * (px * dx + py * dy),
+        e * e - four_r2 * (px * px + py * py),
+        roots,
+    )
+    best = -1.0
+    for i in range(n):
+        t = t0 + roots[i] / length
+        if t_min <= t <= t_max and (best < 0.0 or t < best):
+            best = t
+    return best
+
+
+@njit(cache=True)
+def _trace(ox, oy, oz, dx, dy, dz,
+           sphere_centers, sphere_radii, sphere_material,
+           torus_centers, torus_radii, torus_material,
+           material_kind, material_albedo, material_fuzz, material_ior, max_depth):
+    # iterative generate.ray_color: multiply attenuation into a throughput instead of recursing
+    tr, tg, tb = 1.0, 1.0, 1.0
+    roots = np.empty(4)
+    for _ in range(max_depth):
+        closest = np.inf
+        hit_material = -1
+        nx, ny, nz = 0.0, 0.0, 0.0
+        a = dx * dx + dy * dy + dz * dz
+        for i in range(sphere_radii.shape[0]):
+            cx = ox - sphere_centers[i, 0]
+            cy = oy - sphere_centers[i, 1]
+            cz = oz - sphere_centers[i, 2]
+            half_b = cx * dx + cy * dy + cz * dz
+            c = cx * cx + cy * cy + cz * cz - sphere_radii[i] * sphere_radii[i]
+            discriminant = half_b * half_b - a * c
+            if discriminant < 0.0:
+                continue
+            sqrtd = math.sqrt(discriminant)
+            root = (-half_b - sqrtd) / a
+            if root < T_MIN or closest < root:
+                root = (-half_b + sqrtd) / a
+                if root < T_MIN or closest < root:
+                    continue
+            closest = root
+            hit_material = sphere_material[i]
+            inv_radius = 1.0 / sphere_radii[i]
+            nx = (ox + root * dx - sphere_centers[i, 0]) * inv_radius
+            ny = (oy + root * dy - sphere_centers[i, 1]) * inv_radius
+            nz = (oz + root * dz - sphere_centers[i, 2]) * inv_radius
+        for i in range(torus_radii.shape[0]):
+            t = _hit_torus(torus_centers[i], torus_radii[i, 0], torus_radii[i, 1], ox, oy, oz, dx, dy, dz, T_MIN, closest, roots)
+            if t < 0.0:
+                continue
+            closest = t
+            hit_material = torus_material[i]
+            x = ox + t * dx - torus_centers[i, 0]
+            y = oy + t * dy - torus_centers[i, 1]
+            z = oz + t * dz - torus_centers[i, 2]
+            ring_distance = math.sqrt(x * x + y * y)
+            scale = 1.0 - torus_radii[i, 0] / ring_distance if ring_distance > 0.0 else 0.0
+            nx, ny, nz = x * scale, y * scale, z
+            length = math.sqrt(nx * nx + ny * ny + nz * nz)
+            nx, ny, nz = nx / length, ny / length, nz / length
+
+        if hit_material < 0:
+            length = math.sqrt(a)
+            t = 0.5 * (dy / length + 1.0)
+            return tr * (1.0 - t + 0.5 * t), tg * (1.0 - t + 0.7 * t), tb * (1.0 - t + t)
+
+        ox, oy, oz = ox + closest * dx, oy + closest * dy, oz + closest * dz
+        front_face = dx * nx + dy * ny + dz * nz < 0.0
+        if not front_face:
+            nx, ny, nz = -nx, -ny, -nz
+        kind = material_kind[hit_material]
+        if kind == LAMBERTIAN:
+            rx, ry, rz = _random_in_unit_sphere()
+            length = math.sqrt(rx * rx + ry * ry + rz * rz)
+            dx, dy, dz = nx + rx / length, ny + ry / length, nz + rz / length
+            if abs(dx) <= 1e-8 and abs(dy) <= 1e-8 and abs(dz) <= 1e-8:
+                dx, dy, dz = nx, ny, nz
+        elif kind == METAL:
+            length = math.sqrt(a)
+            ux, uy, uz = dx / length, dy / length, dz / length
+            dot = ux * nx + uy * ny + uz * nz
+            rx, ry, rz = _random_in_unit_sphere()
+            fuzz = material_fuzz[hit_material]
+            dx = ux - 2.0 * dot * nx + fuzz * rx
+            dy = uy - 2.0 * dot * ny + fuzz * ry
+            dz = uz - 2.0 * dot * nz + fuzz * rz
+            if dx * nx + dy * ny + dz * nz <= 0.0:
+                return 0.0, 0.0, 0.0
+        else:
+            ior = material_ior[hit_material]
+            ratio = 1.0 / ior if front_face else ior
+            length = math.sqrt(a)
+            ux, uy, uz = dx / length, dy / length, dz / length
+            cos_theta = min(-(ux * nx + uy * ny + uz * nz), 1.0)
+            sin_theta = math.sqrt(1.0 - cos_theta * cos_theta)
+            r0 = (1.0 - ratio) / (1.0 + ratio)
+            r0 = r0 * r0
+            reflectance = r0 + (1.0 - r0) * (1.0 - cos_theta) ** 5
+            if ratio * sin_theta > 1.0 or reflectance > np.random.random():
+                dot = ux * nx + uy * ny + uz * nz
+                dx, dy, dz = ux - 2.0 * dot * nx, uy - 2.0 * dot * ny, uz - 2.0 * dot * nz
+            else:
+                px = ratio * (ux + cos_theta * nx)
+                py = ratio * (uy + cos_theta * ny)
+                pz = ratio * (uz + cos_theta * nz)
+                parallel = -math.sqrt(abs(1.0 - (px * px + py * py + pz * pz)))
+                dx, dy, dz = px + parallel * nx, py + parallel * ny, pz + parallel * nz
+        tr *= material_albedo[hit_material, 0]
+        tg *= material_albedo[hit_material, 1]
+        tb *= material_albedo[hit_material, 2]
+    return 0.0, 0.0, 0.0
+
+
+@njit(parallel=True, cache=True)
+def _render_tile_kernel(width, height, samples_per_pixel, x0, y0, x1, y1, camera,
+                        sphere_centers, sphere_radii, sphere_material,
+                        torus_centers, torus_radii, torus_material,
+                        material_kind, material_albedo, material_fuzz, material_ior, max_depth, seed):
+    tile_width = x1 - x0
+    n_pixels = tile_width * (y1 - y0)
+    out = np.zeros((n_pixels, 3))
+    for p in prange(n_pixels):
+        # np.random is per thread in here, a pixel's samples all run on one thread, so seeding it per pixel
+        # gives each pixel its own stream whichever thread takes it
+        np.random.seed((seed + p) % 4294967296)
+        x = x0 + p % tile_width
+        row = y0 + p // tile_width
+        r, g, b = 0.0, 0.0, 0.0
+        for _ in range(samples_per_pixel):
+            s = (x + np.random.random()) / (width - 1)
+            t = (row + np.random.random()) / (height - 1)
+            # Camera.get_ray
+            lx, ly = _random_in_unit_disk()
+            lx *= camera[18]
+            ly *= camera[18]
+            ox = camera[0] + camera[12] * lx + camera[15] * ly
+            oy = camera[1] + camera[13] * lx + camera[16] * ly
+            oz = camera[2] + camera[14] * lx + camera[17] * ly
+            dx = camera[3] + s * camera[6] + t * camera[9] - ox
+            dy = camera[4] + s * camera[7] + t * camera[10] - oy
+            dz = camera[5] + s * camera[8] + t * camera[11] - oz
+            cr, cg, cb = _trace(ox, oy, oz, dx, dy, dz,
+                                sphere_centers, sphere_radii, sphere_material,
+                                torus_centers, torus_radii, torus_material,
+                                material_kind, material_albedo, material_fuzz, material_ior, max_depth)
+            r += cr
+            g += cg
+            b += cb
+        out[p, 0] = r
+        out[p, 1] = g
+        out[p, 2] = b
+    return out
+
+
+# scheduler tile renderer, same contract as generate.render_tile
+def render_tile(width: int, height: int, samples_per_pixel: int, scene: SceneBuffers, x0: int, y0: int, x1: int, y1: int, max_depth: int = MAX_DEPTH) -> Tuple[List[Vec3], List[int]]:
+    # drawn from the shared generator so scheduler seeding covers this engine too
+    seed = rtweekend.thread_rng().getrandbits(32)
+    out = _render_tile_kernel(width, height, samples_per_pixel, x0, y0, x1, y1, scene.camera,
+                              scene.sphere_centers, scene.sphere_radii, scene.sphere_material,
+                              scene.torus_centers, scene.torus_radii, scene.torus_material,
+                              scene.material_kind, scene.material_albedo, scene.material_fuzz, scene.material_ior, max_depth, seed)
+    return [Color(*c) for c in out.tolist()], [samples_per_pixel] * len(out)
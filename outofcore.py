@@ -0,0 +1,54 @@
+from typing import BinaryIO, Sequence
+import numpy as np
+from image_io import ImageWriter
+from scheduler import CHANNELS, FLOAT_SIZE, Tile
+
+# a framebuffer too big for memory lives in a file laid out like scheduler's shared one: float32 r, g, b sums and
+# the sample count per pixel, rows bottom-up. workers map only the rows of the tile they add, and the image is
+# encoded a strip of rows at a time, so memory stays at a few tiles per worker and one strip whatever the resolution
+
+# rows per encoded strip
+STRIP_ROWS = 64
+
+
+# a zero filled framebuffer file, sparse where the filesystem allows
+def create(path: str, width: int, height: int):
+    with open(path, "wb") as f:
+        f.truncate(width * height * CHANNELS * FLOAT_SIZE)
+
+
+# adds a tile's float64 sums (scheduler._tile_sums) into the file. each row of the tile is mapped on its own and
+# unmapped straight after, float32 plus float64 rounded back to float32 like the shared memory path
+def add_tile(f: BinaryIO, width: int, tile: Tile, sums: Sequence[float]):
+    x0, y0, x1, y1 = tile
+    row_floats = (x1 - x0) * CHANNELS
+    data = np.asarray(sums, dtype=np.float64).reshape(y1 - y0, row_floats)
+    for row in range(y0, y1):
+        view = np.memmap(f, np.float32, "r+", offset=(row * width + x0) * CHANNELS * FLOAT_SIZE, shape=(row_floats,))
+        view += data[row - y0]
+        del view
+
+
+# 8-bit rgb rows of a strip of (rows, width, channels) sums, top row first, with encode_row's gamma 2 and clamping
+def encode_strip(strip: np.ndarray, samples: int = 3) -> bytes:
+    data = strip[::-1].astype(np.float64)
+    counts = data[..., samples:samples + 1]
+    scale = np.divide(1.0, counts, out=np.zeros_like(counts), where=counts > 0)
+    values = np.sqrt(np.maximum(0.0, scale * data[..., :3]))
+    return (256 * np.minimum(values, 0.999)).astype(np.uint8).tobytes()
+
+
+# streams the framebuffer file into an image strip by strip, reading each with plain file reads
+def write_image(stream: BinaryIO, path: str, width: int, height: int, format: str = "ppm", strip_rows: int = STRIP_ROWS):
+    writer = ImageWriter(stream, width, height, format)
+    row_bytes = width * CHANNELS * FLOAT_SIZE
+    with open(path, "rb") as f:
+        for top in range(height, 0, -strip_rows):
+            bottom = max(0, top - strip_rows)
+            f.seek(bottom * row_bytes)
+            strip = np.fromfile(f, np.float32, (top - bottom) * width * CHANNELS).reshape(top - bottom, width, CHANNELS)
+            rgb = encode_strip(strip)
+            for i in range(top - bottom):
+                writer.write_row(rgb[i * width * 3:(i + 1) * width * 3])
+    writer.close()
+
@@ -0,0 +1,80 @@
+import math
+from typing import List
+
+# coefficients below this are treated as zero when classifying roots
+EPSILON = 1e-12
+
+
+def solve_quadratic(a: float, b: float, c: float) -> List[float]:
+    if abs(a) < EPSILON:
+        return [] if abs(b) < EPSILON else [-c / b]
+    discriminant = b * b - 4 * a * c
+    if discriminant < 0:
+        return []
+    sqrtd = math.sqrt(discriminant)
+    # avoid cancellation between -b and sqrtd
+    q = -0.5 * (b + math.copysign(sqrtd, b))
+    if q == 0:
+        return [0.0]
+    return sorted((q / a, c / q))
+
+
+# real roots of x^3 + a x^2 + b x + c
+def solve_monic_cubic(a: float, b: float, c: float) -> List[float]:
+    q = (a * a - 3 * b) / 9
+    r = (2 * a * a * a - 9 * a * b + 27 * c) / 54
+    shift = a / 3
+    if r * r < q * q * q:
+        theta = math.acos(max(-1.0, min(1.0, r / math.sqrt(q * q * q))))
+        scale = -2 * math.sqrt(q)
+        return sorted((scale * math.cos(theta / 3) - shift,
+                       scale * math.cos((theta + 2 * math.pi) / 3) - shift,
+                       scale * math.cos((theta - 2 * math.pi) / 3) - shift))
+    big_a = -math.copysign((abs(r) + math.sqrt(r * r - q * q * q)) ** (1 / 3), r)
+    big_b = q / big_a if big_a != 0 else 0.0
+    return [big_a + big_b - shift]
+
+
+def _polish(coefficients: List[float], x: float, iterations: int = 2) -> float:
+    for _ in range(iterations):
+        value = 0.0
+        derivative = 0.0
+        for coefficient in coefficients:
+            derivative = derivative * x + value
+            value = value * x + coefficient
+        if derivative == 0:
+            break
+        x -= value / derivative
+    return x
+
+
+# real roots of c4 x^4 + c3 x^3 + c2 x^2 + c1 x + c0 via Ferrari's method, sorted ascending
+def solve_quartic(c4: float, c3: float, c2: float, c1: float, c0: float) -> List[float]:
+    if abs(c4) < EPSILON:
+        return solve_monic_cubic(c2 / c3, c1 / c3, c0 / c3) if abs(c3) >= EPSILON else solve_quadratic(c2, c1, c0)
+    a, b, c, d = c3 / c4, c2 / c4, c1 / c4, c0 / c4
+
+    # depressed quartic y^4 + p y^2 + q y + r with x = y - a/4
+    a2 = a * a
+    p = b - 3 * a2 / 8
+    q = c - a * b / 2 + a2 * a / 8
+    r = d - a * c / 4 + a2 * b / 16 - 3 * a2 * a2 / 256
+
+    ys: List[float] = []
+    if abs(q) < EPSILON:
+        for z in solve_quadratic(1.0, p, r):
+            if z >= 0:
+                root = math.sqrt(z)
+                ys.extend((root, -root))
+    else:
+        # resolvent cubic always has a positive root when q != 0
+        m = max(solve_monic_cubic(p, p * p / 4 - r, -q * q / 8))
+        m = _polish([1.0, p, p * p / 4 - r, -q * q / 8], m)
+        if m <= 0:
+            return []
+        s = math.sqrt(2 * m)
+        ys.extend(solve_quadratic(1.0, s, p / 2 + m - q / (2 * s)))
+        ys.extend(solve_quadratic(1.0, -s, p / 2 + m + q / (2 * s)))
+
+    coefficients = [c4, c3, c2, c1, c0]
+    return sorted(_polish(coefficients, y - a / 4) for y in ys)
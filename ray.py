@@ -1,8 +1,14 @@
 from vec3 import Vec3, Point3
 class Ray:
+    __slots__ = ('origin', 'direction')
     def __init__(self, origin: Point3, direction: Vec3):
         self.origin = origin
         self.direction = direction
     def at(self, t):
-        return self.origin +  t * self.direction
-    
\ No newline at end of file
+        o = self.origin
+        d = self.direction
+        return Vec3(o.x + t * d.x, o.y + t * d.y, o.z + t * d.z)
+    def __getstate__(self):
+        return (self.origin, self.direction)
+    def __setstate__(self, state):
+        self.origin, self.direction = state
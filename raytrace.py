@@ -0,0 +1,50 @@
+import argparse
+import sys
+from typing import Optional, Sequence
+
+# the command line entry point: python raytrace.py <command> ..., or python -m raytrace.
+# each command imports what it needs only once it runs, so --help and the command list stay instant
+
+DESCRIPTION = """commands:
+  render         render random_scene() or a --scene file, every flag of generate.py, --config FILE for TOML defaults
+  bench          the benchmark suite, see bench/suite.py
+  scene export   write random_scene() and the still camera to a scene file"""
+
+
+def render(argv: Sequence[str]):
+    import generate
+    generate.main(argv, prog="raytrace render")
+
+
+def bench(argv: Sequence[str]):
+    from bench import suite
+    suite.main(argv, prog="raytrace bench")
+
+
+def scene(argv: Sequence[str]):
+    parser = argparse.ArgumentParser(prog="raytrace scene")
+    actions = parser.add_subparsers(dest="action", required=True)
+    export = actions.add_parser("export", help="write random_scene() and the still camera to a scene file")
+    export.add_argument("path")
+    export.add_argument("--seed", type=int, default=None)
+    export.add_argument("--grid", type=int, default=11, help="half width of the field of small spheres")
+    args = parser.parse_args(argv)
+    import generate
+    import scene_file
+    scene_file.save(args.path, generate.random_scene(args.seed, args.grid), generate.camera)
+
+
+COMMANDS = {"render": render, "bench": bench, "scene": scene}
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] not in COMMANDS:
+        parser = argparse.ArgumentParser(prog="raytrace", description=DESCRIPTION, formatter_class=argparse.RawDescriptionHelpFormatter)
+        parser.add_argument("command", choices=list(COMMANDS), help="one of the above, each has its own --help")
+        parser.parse_args(argv[:1])
+    COMMANDS[argv[0]](argv[1:])
+
+
+if __name__ == '__main__':
+    main()
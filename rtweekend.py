@@ -1,7 +1,34 @@
 import math
+import random
+import threading
 
 infinity = float('inf')
 pi = math.pi
 
 def degrees_to_radians(degrees: float) -> float:
     return degrees * pi / 180
+
+# every sample, scene and material decision draws from the calling thread's generator instead of the global
+# random module, so a render can be reproduced by seeding it. each worker process and each thread has its own,
+# threads rendering tiles of one scene never share generator state
+_local = threading.local()
+
+
+def thread_rng() -> random.Random:
+    rng = getattr(_local, "rng", None)
+    if rng is None:
+        rng = _local.rng = random.Random()
+    return rng
+
+
+def random_double() -> float:
+    return thread_rng().random()
+
+
+def random_uniform(a: float, b: float) -> float:
+    return thread_rng().uniform(a, b)
+
+
+# seeds the calling thread's generator from any mix of ints and strings, e.g. seed_rng(seed, pass_index, x0, y0)
+def seed_rng(*parts) -> None:
+    thread_rng().seed(":".join(str(part) for part in parts))
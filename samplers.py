@@ -0,0 +1,246 @@
+import copy
+import math
+import threading
+from typing import Dict, List, Optional, Tuple
+from rtweekend import pi, thread_rng
+from vec3 import Vec3
+
+MASK = 0xffffffff
+# 2**-32, turns a 32 bit sample into [0, 1)
+UNIT = 1.0 / 4294967296.0
+
+
+# every random decision of a sample asks the active sampler for its next dimension: the pixel jitter and lens
+# sample, then per bounce whatever the material needs. the render loops call start_pixel once per pixel and
+# start_sample before each sample, which resets the dimension count. rng is the generator of the thread that
+# made it active, see use
+class Sampler:
+    name = ""
+    rng = None
+
+    def start_pixel(self):
+        pass
+
+    def start_sample(self, index: int):
+        pass
+
+    def get_1d(self) -> float:
+        raise NotImplementedError
+
+    def get_2d(self) -> Tuple[float, float]:
+        raise NotImplementedError
+
+
+# independent uniform draws from the thread's rtweekend generator, what every decision used before samplers
+class RandomSampler(Sampler):
+    name = "random"
+
+    def get_1d(self) -> float:
+        return self.rng.random()
+
+    def get_2d(self) -> Tuple[float, float]:
+        rng = self.rng
+        return rng.random(), rng.random()
+
+
+def _mix(x: int) -> int:
+    x ^= x >> 16
+    x = (x * 0x7feb352d) & MASK
+    x ^= x >> 15
+    x = (x * 0x846ca68b) & MASK
+    x ^= x >> 16
+    return x
+
+
+_REVERSED_BYTES = [int(f"{i:08b}"[::-1], 2) for i in range(256)]
+
+
+def _reverse_bits(x: int) -> int:
+    table = _REVERSED_BYTES
+    return (table[x & 255] << 24) | (table[(x >> 8) & 255] << 16) | (table[(x >> 16) & 255] << 8) | table[x >> 24]
+
+
+# Laine-Karras style hash, with the constants from Burley's "Practical Hash-based Owen Scrambling"
+def _laine_karras(x: int, seed: int) -> int:
+    x = (x + seed) & MASK
+    x ^= (x * 0x6c50b47c) & MASK
+    x ^= (x * 0xb82f1e52) & MASK
+    x ^= (x * 0xc7afe638) & MASK
+    x ^= (x * 0x8d22f6e6) & MASK
+    return x
+
+
+def _owen_scramble(x: int, seed: int) -> int:
+    return _reverse_bits(_laine_karras(_reverse_bits(x), seed))
+
+
+# second Sobol dimension, the first is plain bit reversal
+def _sobol_1(index: int) -> int:
+    result = 0
+    v = 1 << 31
+    while index:
+        if index & 1:
+            result ^= v
+        index >>= 1
+        v ^= v >> 1
+    return result
+
+
+_DIMENSION_HASHES = [_mix(dimension + 1) for dimension in range(256)]
+
+
+# Owen scrambled 2D Sobol points, a fresh scramble and index shuffle for every dimension pair (Burley 2020),
+# so any number of dimensions stays decorrelated without higher dimensional direction numbers.
+# each pixel takes its scramble seed from the thread's rtweekend generator, which scheduler seeds per tile and pass
+class SobolSampler(Sampler):
+    name = "sobol"
+
+    def __init__(self):
+        self.seed = 0
+        self.index = 0
+        self.dimension = 0
+
+    def start_pixel(self):
+        self.seed = self.rng.getrandbits(32)
+
+    def start_sample(self, index: int):
+        self.index = index
+        self.dimension = 0
+
+    def _shuffled(self) -> Tuple[int, int]:
+        dimension = self.dimension
+        self.dimension += 1
+        dimension_hash = _DIMENSION_HASHES[dimension] if dimension < len(_DIMENSION_HASHES) else _mix(dimension + 1)
+        seed = _mix(self.seed ^ dimension_hash)
+        return _owen_scramble(self.index, seed), seed
+
+    # the first Sobol dimension is the bit reversed index, so scrambling it is a single reversal
+    def get_1d(self) -> float:
+        index, seed = self._shuffled()
+        return _reverse_bits(_laine_karras(index, seed ^ 0xa511e9b3)) * UNIT
+
+    def get_2d(self) -> Tuple[float, float]:
+        index, seed = self._shuffled()
+        return (_reverse_bits(_laine_karras(index, seed ^ 0xa511e9b3)) * UNIT,
+                _owen_scramble(_sobol_1(index), seed ^ 0x63d83595) * UNIT)
+
+
+def _primes(count: int) -> List[int]:
+    primes: List[int] = []
+    candidate = 2
+    while len(primes) < count:
+        if all(candidate % p for p in primes if p * p <= candidate):
+            primes.append(candidate)
+        candidate += 1
+    return primes
+
+
+# Halton only stays well distributed in the first few dozen dimensions, later ones fall back to the generator
+HALTON_PRIMES = _primes(64)
+
+
+def _radical_inverse(base: int, index: int) -> float:
+    inverse = 1.0 / base
+    scale = inverse
+    result = 0.0
+    while index:
+        index, digit = divmod(index, base)
+        result += digit * scale
+        scale *= inverse
+    return result
+
+
+# Halton points with a per pixel, per dimension Cranley-Patterson rotation drawn from the thread's generator
+class HaltonSampler(Sampler):
+    name = "halton"
+
+    def __init__(self):
+        self.offsets: List[float] = []
+        self.index = 0
+        self.dimension = 0
+
+    def start_pixel(self):
+        rng = self.rng
+        self.offsets = [rng.random() for _ in HALTON_PRIMES]
+
+    def start_sample(self, index: int):
+        self.index = index
+        self.dimension = 0
+
+    def get_1d(self) -> float:
+        dimension = self.dimension
+        self.dimension += 1
+        if dimension >= len(HALTON_PRIMES):
+            return self.rng.random()
+        value = _radical_inverse(HALTON_PRIMES[dimension], self.index) + self.offsets[dimension]
+        return value - 1.0 if value >= 1.0 else value
+
+    def get_2d(self) -> Tuple[float, float]:
+        return self.get_1d(), self.get_1d()
+
+
+SAMPLERS: Dict[str, type] = {sampler.name: sampler for sampler in (RandomSampler, SobolSampler, HaltonSampler)}
+
+# the sampler every decision draws from as active.sampler, per thread, switched by use() at the start of each tile
+class _Active(threading.local):
+    def __init__(self):
+        self.sampler: Sampler = RandomSampler()
+        self.sampler.rng = thread_rng()
+        # the pass of the tile this thread renders, see start_pass
+        self.pass_index = 0
+
+
+active = _Active()
+
+
+# set by the scheduler before each tile. the render loops number a pixel's samples on from first_sample, so the
+# passes of a progressive render take consecutive runs of each pixel's sequence instead of its start every time
+def start_pass(pass_index: int):
+    active.pass_index = pass_index
+
+
+def first_sample(samples_per_pass: int) -> int:
+    return active.pass_index * samples_per_pass
+
+
+# makes a copy of sampler, or a RandomSampler, the calling thread's active one. a copy, so threads handed the
+# same sampler through render_kwargs keep their own dimension counts
+def use(sampler: Optional[Sampler]) -> Sampler:
+    sampler = copy.copy(sampler) if sampler is not None else RandomSampler()
+    sampler.rng = thread_rng()
+    active.sampler = sampler
+    return sampler
+
+
+def get_sampler(name: str) -> Sampler:
+    if name not in SAMPLERS:
+        raise ValueError(f"unknown sampler {name!r}, expected one of {tuple(SAMPLERS)}")
+    return SAMPLERS[name]()
+
+
+# direct maps from uniform samples, no rejection loops, so each decision costs a fixed number of dimensions
+
+# Shirley-Chiu concentric map onto the unit disk
+def disk(u: float, v: float) -> Tuple[float, float]:
+    a = 2.0 * u - 1.0
+    b = 2.0 * v - 1.0
+    if a == 0.0 and b == 0.0:
+        return 0.0, 0.0
+    if abs(a) > abs(b):
+        r, phi = a, (pi / 4) * (b / a)
+    else:
+        r, phi = b, pi / 2 - (pi / 4) * (a / b)
+    return r * math.cos(phi), r * math.sin(phi)
+
+
+# uniform on the unit sphere. normal + unit_vector(u, v) is the cosine weighted hemisphere Lambertian needs
+def unit_vector(u: float, v: float) -> Vec3:
+    z = 1.0 - 2.0 * u
+    r = math.sqrt(max(0.0, 1.0 - z * z))
+    phi = 2.0 * pi * v
+    return Vec3(r * math.cos(phi), r * math.sin(phi), z)
+
+
+# uniform inside the unit ball
+def in_unit_sphere(u: float, v: float, w: float) -> Vec3:
+    return unit_vector(u, v) * w ** (1.0 / 3.0)
@@ -0,0 +1,181 @@
+import mmap
+import os
+import struct
+from typing import BinaryIO, Dict, List, Tuple
+from backends import DIELECTRIC, LAMBERTIAN, METAL
+from bvh import BVHNode
+from camera import Camera
+from hittable import HittableList, Sphere, Torus
+from material import Dielectric, Lambertian, Material, Metal, intern
+from vec3 import Color, Point3, Vec3
+
+# magic, format version, material, sphere and torus counts, then the camera as
+# lookfrom, lookat, vup, aperture, focus distance, aspect ratio and vfov in float64.
+# every section after it is a little-endian array of 8 byte values, in this order:
+#   material kind       int64   [materials]
+#   material params     float64 [materials, 4]  albedo r, g, b and fuzz, or index of refraction in slot 3
+#   sphere geometry     float64 [spheres, 4]    center x, y, z, radius
+#   sphere material     int64   [spheres]
+#   torus geometry      float64 [tori, 5]       center x, y, z, major radius, minor radius
+#   torus material      int64   [tori]
+#   torus mode          int64   [tori]          index into Torus.MODES
+MAGIC = b"RTSC"
+VERSION = 1
+HEADER = struct.Struct("<4sIQQQ")
+CAMERA = struct.Struct("<13d")
+MATERIAL_PARAMS = 4
+SPHERE_FIELDS = 4
+TORUS_FIELDS = 5
+
+
+def _material_entry(material: Material) -> Tuple[int, Tuple[float, float, float, float]]:
+    if isinstance(material, Lambertian):
+        return LAMBERTIAN, material.albedo.e + (0.0,)
+    if isinstance(material, Metal):
+        return METAL, material.albedo.e + (material.fuzz,)
+    if isinstance(material, Dielectric):
+        return DIELECTRIC, (1.0, 1.0, 1.0, material.index_of_refraction)
+    raise TypeError(f"scene files do not support {type(material).__name__}")
+
+
+# lookat and vup are recovered from the camera basis, which rebuilds the same camera
+def _camera_params(camera: Camera) -> Tuple[float, ...]:
+    origin = camera.origin
+    w = (origin - camera.lower_left_corner - camera.horizontal/2 - camera.vertical/2) / camera.focus_dist
+    return origin.e + (origin - w).e + camera.v.e + (camera.aperture, camera.focus_dist, camera.aspect_ratio, camera.vfov)
+
+
+# the scene file's bytes, the same world and camera always give the same bytes
+def write(f: BinaryIO, world: HittableList, camera: Camera):
+    spheres = [obj for obj in world.objects if isinstance(obj, Sphere)]
+    tori = [obj for obj in world.objects if isinstance(obj, Torus)]
+    if len(spheres) + len(tori) != len(world.objects):
+        unsupported = {type(obj).__name__ for obj in world.objects if not isinstance(obj, (Sphere, Torus))}
+        raise TypeError(f"scene files only support Sphere and Torus, got {', '.join(sorted(unsupported))}")
+
+    # materials equal by value share one table entry, whether or not they were interned
+    entries: Dict[Tuple, int] = {}
+    def material_index(material: Material) -> int:
+        return entries.setdefault(_material_entry(material), len(entries))
+    sphere_materials = [material_index(s.material) for s in spheres]
+    torus_materials = [material_index(t.material) for t in tori]
+
+    f.write(HEADER.pack(MAGIC, VERSION, len(entries), len(spheres), len(tori)))
+    f.write(CAMERA.pack(*_camera_params(camera)))
+    f.write(struct.pack(f"<{len(entries)}q", *(kind for kind, _ in entries)))
+    f.write(struct.pack(f"<{len(entries) * MATERIAL_PARAMS}d", *(p for _, params in entries for p in params)))
+    f.write(struct.pack(f"<{len(spheres) * SPHERE_FIELDS}d", *(v for s in spheres for v in s.center.e + (s.radius,))))
+    f.write(struct.pack(f"<{len(spheres)}q", *sphere_materials))
+    f.write(struct.pack(f"<{len(tori) * TORUS_FIELDS}d", *(v for t in tori for v in t.center.e + (t.major_radius, t.minor_radius))))
+    f.write(struct.pack(f"<{len(tori)}q", *torus_materials))
+    f.write(struct.pack(f"<{len(tori)}q", *(Torus.MODES.index(t.mode) for t in tori)))
+
+
+def save(path: str, world: HittableList, camera: Camera):
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        write(f, world, camera)
+    os.replace(temp_path, path)
+
+
+# a read-only memory map of a scene file. the sections are memoryviews straight into the map, and
+# pickling sends only the path, so a worker that receives one maps the same pages instead of a copy
+class SceneFile:
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buffer = memoryview(self._map)
+        self._views = [buffer]
+        if len(buffer) < HEADER.size + CAMERA.size:
+            raise ValueError(f"{path} is truncated")
+        magic, version, materials, spheres, tori = HEADER.unpack_from(buffer)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a scene file")
+        self.camera_params = CAMERA.unpack_from(buffer, HEADER.size)
+        offset = HEADER.size + CAMERA.size
+
+        def section(count: int, fmt: str) -> memoryview:
+            nonlocal offset
+            view = buffer[offset:offset + count * 8].cast(fmt)
+            self._views.append(view)
+            offset += count * 8
+            return view
+
+        self.material_kind = section(materials, "q")
+        self.material_params = section(materials * MATERIAL_PARAMS, "d")
+        self.sphere_geometry = section(spheres * SPHERE_FIELDS, "d")
+        self.sphere_material = section(spheres, "q")
+        self.torus_geometry = section(tori * TORUS_FIELDS, "d")
+        self.torus_material = section(tori, "q")
+        self.torus_mode = section(tori, "q")
+        if offset > len(buffer):
+            raise ValueError(f"{path} is truncated")
+
+    def __reduce__(self):
+        return SceneFile, (self.path,)
+
+    @property
+    def sphere_count(self) -> int:
+        return len(self.sphere_material)
+
+    @property
+    def torus_count(self) -> int:
+        return len(self.torus_material)
+
+    def camera(self) -> Camera:
+        p = self.camera_params
+        return Camera(Point3(*p[0:3]), Point3(*p[3:6]), Vec3(*p[6:9]), p[9], p[10], p[11], p[12])
+
+    # one interned instance per table entry, shared by every object that uses it
+    def materials(self) -> List[Material]:
+        materials: List[Material] = []
+        params = self.material_params
+        for i, kind in enumerate(self.material_kind):
+            r, g, b, extra = params[i * MATERIAL_PARAMS:(i + 1) * MATERIAL_PARAMS]
+            if kind == LAMBERTIAN:
+                materials.append(intern(Lambertian(Color(r, g, b))))
+            elif kind == METAL:
+                materials.append(intern(Metal(Color(r, g, b), extra)))
+            elif kind == DIELECTRIC:
+                materials.append(intern(Dielectric(extra)))
+            else:
+                raise ValueError(f"{self.path} has unknown material kind {kind}")
+        return materials
+
+    def world(self) -> HittableList:
+        materials = self.materials()
+        world = HittableList()
+        geometry = self.sphere_geometry
+        for i, material in enumerate(self.sphere_material):
+            x, y, z, radius = geometry[i * SPHERE_FIELDS:(i + 1) * SPHERE_FIELDS]
+            world.add(Sphere(Point3(x, y, z), radius, materials[material]))
+        geometry = self.torus_geometry
+        for i, material in enumerate(self.torus_material):
+            x, y, z, major, minor = geometry[i * TORUS_FIELDS:(i + 1) * TORUS_FIELDS]
+            world.add(Torus(Point3(x, y, z), major, minor, materials[material], mode=Torus.MODES[self.torus_mode[i]]))
+        return world
+
+    def close(self):
+        # the map can only close once nothing points into it
+        for view in reversed(self._views):
+            view.release()
+        self._map.close()
+
+
+# a BVH over a scene file's world that pickles as the file's path, each worker rebuilds it from its own map
+class SceneBVH(BVHNode):
+    def __init__(self, scene: SceneFile):
+        super().__init__(scene.world())
+        self.path = scene.path
+
+    def __reduce__(self):
+        return _load_bvh, (self.path,)
+
+
+def _load_bvh(path: str) -> SceneBVH:
+    scene = SceneFile(path)
+    try:
+        return SceneBVH(scene)
+    finally:
+        scene.close()
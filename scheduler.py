@@ -0,0 +1,396 @@
+import cProfile
+import importlib.util
+import math
+import os
+import pickle
+import sys
+import time
+from array import array
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from multiprocessing import shared_memory
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from rtweekend import seed_rng
+from samplers import start_pass
+from vec3 import Color
+
+# x0, y0, x1, y1 in pixels, half open
+Tile = Tuple[int, int, int, int]
+TILE_ORDERS = ("spiral", "scanline")
+# where tiles render: worker processes that each get a pickled copy of the scene, threads of this process sharing
+# the one scene, or one after another on the calling thread
+EXECUTORS = ("process", "thread", "serial")
+
+# float32 r, g, b sums and the sample count per pixel
+FLOAT_SIZE = 4
+CHANNELS = 4
+SAMPLES = 3
+
+
+def make_tiles(width: int, height: int, tile_size: int, order: str = "spiral") -> List[Tile]:
+    if order not in TILE_ORDERS:
+        raise ValueError(f"unknown tile order {order!r}, expected one of {TILE_ORDERS}")
+    # scanline runs top row first, the order images are written in
+    tiles = [(x0, y0, min(x0 + tile_size, width), min(y0 + tile_size, height))
+             for y0 in reversed(range(0, height, tile_size))
+             for x0 in range(0, width, tile_size)]
+    if order == "spiral":
+        # ring by ring outwards from the image center, walking each ring by angle
+        cx, cy = width / 2, height / 2
+        def ring_and_angle(tile: Tile):
+            tx = (tile[0] + tile[2]) / 2 - cx
+            ty = (tile[1] + tile[3]) / 2 - cy
+            ring = max(abs(tx), abs(ty)) // tile_size
+            return ring, math.atan2(ty, tx)
+        tiles.sort(key=ring_and_angle)
+    return tiles
+
+
+# free-threaded builds (3.13t) say whether the GIL is really off, importing an extension that needs it turns it back on
+def gil_disabled() -> bool:
+    is_enabled = getattr(sys, "_is_gil_enabled", None)
+    return is_enabled is not None and not is_enabled()
+
+
+# threads only pay off for the pure Python renderers once they can run in parallel
+def default_executor() -> str:
+    return "thread" if gil_disabled() else "process"
+
+
+# runs each task on the calling thread as it is submitted, for debugging and profiling without a pool
+class SerialExecutor(Executor):
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        future: Future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+# per worker state, filled once by the pool initializer instead of shipped with every task.
+# thread and serial executors fill it once in this process and every thread reads the same
+_worker: Dict = {}
+
+
+def _make_executor(kind: str, workers: Optional[int], initargs: tuple) -> Executor:
+    if kind == "process":
+        return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs)
+    _init_worker(*initargs)
+    if kind == "thread":
+        return ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1)
+    return SerialExecutor()
+
+
+# framebuffer_name names the shared memory block, or with on_disk the framebuffer file (see outofcore)
+def _init_worker(render_tile: Callable, render_args: tuple, render_kwargs: dict, width: int, height: int, framebuffer_name: str, seed: Optional[int], instrumented: bool = False, on_disk: bool = False):
+    if instrumented:
+        import instrument
+        instrument.enable()
+    if on_disk:
+        _worker["file"] = open(framebuffer_name, "r+b")
+    else:
+        framebuffer = shared_memory.SharedMemory(name=framebuffer_name)
+        _worker["framebuffer"] = framebuffer
+        _worker["pixels"] = framebuffer.buf.cast("f")
+        _worker["file"] = None
+    _worker["render_tile"] = render_tile
+    _worker["render_args"] = render_args
+    _worker["render_kwargs"] = render_kwargs
+    _worker["width"] = width
+    _worker["height"] = height
+    _worker["seed"] = seed
+    _worker["instrumented"] = instrumented
+
+
+# undoes _init_worker in this process after a thread or serial render
+def _release_worker():
+    if "pixels" in _worker:
+        _worker["pixels"].release()
+        _worker["framebuffer"].close()
+    if _worker.get("file") is not None:
+        _worker["file"].close()
+    if _worker.get("instrumented"):
+        import instrument
+        instrument.disable()
+    _worker.clear()
+
+
+# adds a tile's colors and sample counts into the shared framebuffer, starting base floats in
+def _accumulate(tile: Tile, colors: Sequence[Color], counts: Sequence[int], base: int = 0):
+    x0, y0, x1, y1 = tile
+    width = _worker["width"]
+    if _worker["file"] is not None:
+        import outofcore
+        outofcore.add_tile(_worker["file"], width, tile, _tile_sums(colors, counts))
+        return
+    pixels = _worker["pixels"]
+    i = 0
+    for row in range(y0, y1):
+        offset = base + (row * width + x0) * CHANNELS
+        for _ in range(x1 - x0):
+            color = colors[i]
+            pixels[offset] += color.x
+            pixels[offset + 1] += color.y
+            pixels[offset + 2] += color.z
+            pixels[offset + SAMPLES] += counts[i]
+            offset += CHANNELS
+            i += 1
+
+
+# pyinstrument writes a readable call tree for .html/.txt paths when it is installed, anything else is a cProfile dump
+def _profile(path: str, call: Callable):
+    if path.endswith((".html", ".txt")) and importlib.util.find_spec("pyinstrument") is not None:
+        from pyinstrument import Profiler
+        profiler = Profiler()
+        profiler.start()
+        try:
+            return call()
+        finally:
+            profiler.stop()
+            with open(path, "w") as f:
+                f.write(profiler.output_html() if path.endswith(".html") else profiler.output_text())
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(call)
+    finally:
+        profiler.dump_stats(path)
+
+
+# r, g, b sums and the sample count per pixel of a tile, row by row, the values _accumulate adds
+def _tile_sums(colors: Sequence[Color], counts: Sequence[int]) -> array:
+    return array("d", [v for color, n in zip(colors, counts) for v in (color.x, color.y, color.z, n)])
+
+
+# adds _tile_sums output into a framebuffer, in the parent for tiles that come from a cache
+def _add_sums(pixels, width: int, tile: Tile, sums: Sequence[float]):
+    x0, y0, x1, y1 = tile
+    i = 0
+    for row in range(y0, y1):
+        offset = (row * width + x0) * CHANNELS
+        for _ in range((x1 - x0) * CHANNELS):
+            pixels[offset] += sums[i]
+            offset += 1
+            i += 1
+
+
+# tile renderers return (colors, counts) and optionally a third stats object with merge().
+# the fourth item is the tile's instrument.Counters when the worker was started instrumented,
+# the last its _tile_sums when keep is set, for a tile cache
+def _render_tile(tile: Tile, pass_index: int = 0, profile: Optional[str] = None, keep: bool = False) -> Tuple[Tile, float, object, object, Optional[array]]:
+    start = time.perf_counter()
+    x0, y0, x1, y1 = tile
+    # seeding per tile and pass keeps the image independent of which worker renders what
+    if _worker["seed"] is not None:
+        seed_rng(_worker["seed"], pass_index, x0, y0)
+    start_pass(pass_index)
+    width = _worker["width"]
+    render = lambda: _worker["render_tile"](width, _worker["height"], *_worker["render_args"], x0, y0, x1, y1, **_worker["render_kwargs"])
+    result = render() if profile is None else _profile(profile, render)
+    _accumulate(tile, result[0], result[1])
+    elapsed = time.perf_counter() - start
+    counters = None
+    if "instrument" in sys.modules:
+        counters = sys.modules["instrument"].take()
+        if counters is not None:
+            counters.tile_seconds.append(elapsed)
+    return tile, elapsed, result[2] if len(result) > 2 else None, counters, _tile_sums(result[0], result[1]) if keep else None
+
+
+# one tile of one animation frame, rendered into the framebuffer slot that frame was given
+def _render_frame_tile(frame: int, slot: int, tile: Tile) -> Tuple[float, object]:
+    start = time.perf_counter()
+    x0, y0, x1, y1 = tile
+    if _worker["seed"] is not None:
+        seed_rng(_worker["seed"], frame, x0, y0)
+    start_pass(0)
+    width, height = _worker["width"], _worker["height"]
+    result = _worker["render_tile"](width, height, *_worker["render_args"], x0, y0, x1, y1, frame=frame, **_worker["render_kwargs"])
+    _accumulate(tile, result[0], result[1], slot * width * height * CHANNELS)
+    return time.perf_counter() - start, result[2] if len(result) > 2 else None
+
+
+class RenderStats:
+    def __init__(self):
+        self.tiles = 0
+        self.workers = 0
+        self.executor = ""
+        self.scene_bytes = 0
+        self.task_bytes = 0
+        self.result_bytes = 0
+        self.per_row_bytes = 0
+        self.startup_seconds = 0.0
+        self.wall_seconds = 0.0
+
+    def report(self) -> str:
+        shipped = self.scene_bytes * self.workers + self.task_bytes + self.result_bytes
+        return "\n".join((
+            f"tiles:                {self.tiles}",
+            f"workers:              {self.workers} ({self.executor})",
+            f"scene bytes/worker:   {self.scene_bytes}",
+            f"task bytes:           {self.task_bytes}",
+            f"result bytes:         {self.result_bytes}",
+            f"ipc bytes total:      {shipped}",
+            f"per-row futures ipc:  {self.per_row_bytes} (previous scheduler, estimated)",
+            f"first tile latency:   {self.startup_seconds:.3f}s",
+            f"wall time:            {self.wall_seconds:.3f}s",
+        ))
+
+
+# renders every tile `passes` times, numbered from first_pass, accumulating into a shared float32 framebuffer of r, g, b sums
+# and sample counts, rows bottom-up like render_row, and returns a private copy of it.
+# on_tile(pass_index, tile, pixels) and on_pass(pass_index, pixels) see the live shared buffer.
+# per-tile stats returned by the renderer are merged into tile_stats. a seed makes the render reproducible.
+# passing an instrument.Counters turns on hot-path counting in the workers and merges every tile's counts into it,
+# profile_path captures the middle tile of the first pass under a profiler.
+# with a tilecache.TileCache, tiles it holds for a pass are added straight from it and the rest are rendered and stored,
+# tile stats and counters then only cover the rendered ones.
+# framebuffer_path keeps the framebuffer in that file instead (see outofcore, needs numpy): the callbacks and the
+# return value get a read-only numpy memmap of it, which nothing here reads.
+# executor is one of EXECUTORS, default_executor() when None. threads share render_args as they are, so the
+# renderer must only read the scene, and they cannot take counters, which patch classes process wide
+def render_tiles(render_tile: Callable, render_args: tuple, width: int, height: int, tile_size: int = 32, order: str = "spiral", workers: Optional[int] = None, stats: Optional[RenderStats] = None, passes: int = 1, framebuffer: Optional[Sequence[float]] = None, on_tile: Optional[Callable] = None, on_pass: Optional[Callable] = None, render_kwargs: Optional[dict] = None, tile_stats=None, seed: Optional[int] = None, first_pass: int = 0, counters=None, profile_path: Optional[str] = None, cache=None, framebuffer_path: Optional[str] = None, executor: Optional[str] = None) -> array:
+    executor = executor or default_executor()
+    if executor not in EXECUTORS:
+        raise ValueError(f"unknown executor {executor!r}, expected one of {EXECUTORS}")
+    if executor == "thread" and counters is not None:
+        raise ValueError("instrument counters need the process or serial executor")
+    tiles = make_tiles(width, height, tile_size, order)
+    size = width * height * CHANNELS * FLOAT_SIZE
+    on_disk = framebuffer_path is not None
+    if on_disk:
+        if framebuffer is not None or cache is not None:
+            raise ValueError("a framebuffer file cannot start from a framebuffer or use a tile cache")
+        import numpy as np
+        import outofcore
+        outofcore.create(framebuffer_path, width, height)
+        live = np.memmap(framebuffer_path, np.float32, "r")
+    else:
+        shared = shared_memory.SharedMemory(create=True, size=size)
+        live = shared.buf.cast("f")
+    # tasks submitted ahead of the results, enough to keep every worker busy without a future per tile in memory
+    window = 4 * (workers or os.cpu_count() or 1)
+    start = time.perf_counter()
+    try:
+        if framebuffer is not None:
+            live[:] = framebuffer if isinstance(framebuffer, array) else array("f", framebuffer)
+        elif not on_disk:
+            shared.buf[:size] = bytes(size)
+        initargs = (render_tile, render_args, render_kwargs or {}, width, height, framebuffer_path if on_disk else shared.name, seed, counters is not None, on_disk)
+        profiled = tiles[len(tiles) // 2] if profile_path is not None else None
+        with _make_executor(executor, workers, initargs) as pool:
+            for pass_index in range(first_pass, first_pass + passes):
+                queue = iter(tiles)
+                running = set()
+                received = 0
+                while True:
+                    for tile in queue:
+                        sums = cache.get(tile, pass_index) if cache is not None else None
+                        if sums is None:
+                            running.add(pool.submit(_render_tile, tile, pass_index, profile_path if pass_index == first_pass and tile == profiled else None,
+                                                        cache is not None))
+                            if len(running) >= window:
+                                break
+                            continue
+                        _add_sums(live, width, tile, sums)
+                        if on_tile is not None:
+                            on_tile(pass_index, tile, live)
+                    if not running:
+                        break
+                    done, running = wait(running, return_when=FIRST_COMPLETED)
+                    for f in done:
+                        tile, _, result_stats, tile_counters, sums = f.result()
+                        if sums is not None:
+                            cache.put(tile, pass_index, sums)
+                        if tile_stats is not None and result_stats is not None:
+                            tile_stats.merge(result_stats)
+                        if counters is not None and tile_counters is not None:
+                            counters.merge(tile_counters)
+                        if pass_index == first_pass and received == 0 and stats is not None:
+                            stats.startup_seconds = time.perf_counter() - start
+                        received += 1
+                        if on_tile is not None:
+                            on_tile(pass_index, tile, live)
+                if on_pass is not None:
+                    on_pass(pass_index, live)
+        if on_disk:
+            pixels = live
+        else:
+            pixels = array("f")
+            pixels.frombytes(shared.buf[:size])
+    finally:
+        if executor != "process":
+            _release_worker()
+        if not on_disk:
+            live.release()
+            shared.close()
+            shared.unlink()
+
+    if stats is not None:
+        stats.wall_seconds = time.perf_counter() - start
+        stats.tiles = len(tiles) * passes
+        stats.workers = 1 if executor == "serial" else workers or os.cpu_count() or 1
+        stats.executor = executor
+        # threads and the serial executor hand everything over in memory
+        if executor == "process":
+            stats.scene_bytes = len(pickle.dumps(initargs))
+            stats.task_bytes = passes * sum(len(pickle.dumps((_render_tile, tile, 0, None, False))) for tile in tiles)
+            stats.result_bytes = passes * sum(len(pickle.dumps((tile, 0.0, None, None, None))) for tile in tiles)
+        # one pickled (camera, world) per row plus a pickled row of Vec3 coming back
+        row_result = pickle.dumps((0, [Color(0.5, 0.5, 0.5) for _ in range(width)]))
+        stats.per_row_bytes = height * (len(pickle.dumps(render_args)) + len(row_result))
+    return pixels
+
+
+# renders frames 0..frames-1 as frames x tiles tasks on one pool, so render_args reach each worker once for the
+# whole sequence. render_tile also gets frame= and is expected to pose the scene itself. up to `window` frames are
+# in flight, each accumulating into its own slot of the shared framebuffer. on_frame(frame, pixels, wall_seconds,
+# tile_seconds) gets a private copy of every finished frame, in completion order.
+def render_frames(render_tile: Callable, render_args: tuple, width: int, height: int, frames: int, on_frame: Callable, tile_size: int = 32, order: str = "spiral", workers: Optional[int] = None, window: int = 2, render_kwargs: Optional[dict] = None, tile_stats=None, seed: Optional[int] = None):
+    tiles = make_tiles(width, height, tile_size, order)
+    window = max(1, min(window, frames))
+    frame_floats = width * height * CHANNELS
+    frame_bytes = frame_floats * FLOAT_SIZE
+    size = window * frame_bytes
+    shared = shared_memory.SharedMemory(create=True, size=size)
+    try:
+        shared.buf[:size] = bytes(size)
+        initargs = (render_tile, render_args, render_kwargs or {}, width, height, shared.name, seed)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as executor:
+            pending: Dict = {}
+            remaining: Dict[int, int] = {}
+            started: Dict[int, float] = {}
+            tile_seconds: Dict[int, float] = {}
+
+            def submit(frame: int, slot: int):
+                remaining[frame] = len(tiles)
+                started[frame] = time.perf_counter()
+                tile_seconds[frame] = 0.0
+                for tile in tiles:
+                    pending[executor.submit(_render_frame_tile, frame, slot, tile)] = frame, slot
+
+            for slot in range(window):
+                submit(slot, slot)
+            next_frame = window
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for f in done:
+                    frame, slot = pending.pop(f)
+                    elapsed, result_stats = f.result()
+                    if tile_stats is not None and result_stats is not None:
+                        tile_stats.merge(result_stats)
+                    tile_seconds[frame] += elapsed
+                    remaining[frame] -= 1
+                    if remaining[frame] > 0:
+                        continue
+                    offset = slot * frame_bytes
+                    pixels = array("f")
+                    pixels.frombytes(shared.buf[offset:offset + frame_bytes])
+                    shared.buf[offset:offset + frame_bytes] = bytes(frame_bytes)
+                    on_frame(frame, pixels, time.perf_counter() - started.pop(frame), tile_seconds.pop(frame))
+                    del remaining[frame]
+                    if next_frame < frames:
+                        submit(next_frame, slot)
+                        next_frame += 1
+    finally:
+        shared.close()
+        shared.unlink()
@@ -0,0 +1,419 @@
+import argparse
+import asyncio
+import base64
+import io
+import json
+import os
+import signal
+import sys
+import time
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+from camera import Camera
+from hittable import Hittable
+from image_io import write_image
+from rtweekend import seed_rng
+from scheduler import CHANNELS, SAMPLES, Tile, make_tiles
+from vec3 import Point3, Vec3
+
+# a long running render service over HTTP/1.1, stdlib only, one request per connection:
+#   POST   /jobs               submit a job (JSON, see Job.from_spec), answers {"id": n}
+#   GET    /jobs/<id>          job state and progress
+#   GET    /jobs/<id>/tiles    finished tiles as newline delimited JSON, streamed until the job ends
+#   GET    /jobs/<id>/image    the finished image as PPM
+#   PATCH  /jobs/<id>          {"priority": n}, takes effect from the next free tile slot
+#   DELETE /jobs/<id>          cancel
+#   GET    /metrics            queue depth, latencies and scene cache loads
+# jobs share one warm process pool. tiles go out one slot at a time to the highest priority job that still has
+# some, so a higher priority job preempts the running ones at tile granularity and they pick up where they left off
+
+# latency samples kept for the percentiles in /metrics
+LATENCY_WINDOW = 256
+# parsed scenes each worker keeps between jobs
+SCENE_CACHE = 4
+CAMERA_FIELDS = ("lookfrom", "lookat", "vup", "vfov", "aperture", "focus_dist")
+
+# per worker process, scene key -> BVH, oldest first
+_scenes: Dict[tuple, Hittable] = {}
+
+
+# ("random", seed, grid) is generate.random_scene, ("file", path) a scene file
+def _load_scene(key: tuple) -> Hittable:
+    from bvh import BVHNode
+    if key[0] == "random":
+        from generate import random_scene
+        return BVHNode(random_scene(key[1], key[2]))
+    import scene_file
+    return scene_file._load_bvh(key[1])
+
+
+# one tile of a job in a pool worker: generate.render_tile on the worker's cached scene, seeded like
+# scheduler._render_tile so a seeded job matches a local render with the same tile size
+def _render_job_tile(scene_key: tuple, camera: Camera, width: int, height: int, samples_per_pixel: int, tile: Tile, seed: Optional[int], render_kwargs: dict) -> Tuple[bytes, List[int], float, bool]:
+    from generate import render_tile
+    start = time.perf_counter()
+    loaded = scene_key not in _scenes
+    if loaded:
+        if len(_scenes) >= SCENE_CACHE:
+            del _scenes[next(iter(_scenes))]
+        _scenes[scene_key] = _load_scene(scene_key)
+    world = _scenes[scene_key]
+    x0, y0, x1, y1 = tile
+    if seed is not None:
+        seed_rng(seed, 0, x0, y0)
+    if "sampler" in render_kwargs:
+        import samplers
+        render_kwargs = dict(render_kwargs, sampler=samplers.get_sampler(render_kwargs["sampler"]))
+    result = render_tile(width, height, samples_per_pixel, camera, world, x0, y0, x1, y1, **render_kwargs)
+    rgb = array("d", [c for color in result[0] for c in (color.x, color.y, color.z)])
+    return rgb.tobytes(), list(result[1]), time.perf_counter() - start, loaded
+
+
+def _percentiles(values: Deque[float]) -> dict:
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+    pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 4)
+    return {"count": len(ordered), "mean": round(sum(ordered) / len(ordered), 4), "p50": pick(0.5), "p95": pick(0.95)}
+
+
+class Job:
+    def __init__(self, id: int, priority: int, scene_key: tuple, camera: Camera, width: int, height: int, samples_per_pixel: int, tile_size: int, seed: Optional[int], render_kwargs: dict):
+        self.id = id
+        self.priority = priority
+        self.scene_key = scene_key
+        self.camera = camera
+        self.width = width
+        self.height = height
+        self.samples_per_pixel = samples_per_pixel
+        self.seed = seed
+        self.render_kwargs = render_kwargs
+        self.tiles = make_tiles(width, height, tile_size)
+        self.pending: List[Tile] = list(reversed(self.tiles))
+        self.in_flight = 0
+        self.state = "queued"
+        self.error: Optional[str] = None
+        self.pixels = array("f", bytes(width * height * CHANNELS * 4))
+        # finished tile events in completion order, replayed to every subscriber
+        self.events: List[bytes] = []
+        # set and replaced on every change, subscribers wait on the one they saw
+        self.changed = asyncio.Event()
+        self.submitted = time.perf_counter()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+
+    # {"scene": {"seed": 0, "grid": 11} or {"path": "scene.rtsc"}, "camera": {"lookfrom": [13, 2, 3], "vfov": 20, ...},
+    #  "width": 400, "spp": 16, "tile_size": 16, "priority": 0, "seed": null,
+    #  "sampler": "random", "integrator": "recursive", "roulette_depth": null}
+    # missing camera fields come from the scene file or generate's still camera, the aspect ratio from the same place
+    @staticmethod
+    def from_spec(id: int, spec: dict, scene_files: dict) -> 'Job':
+        import generate
+        scene = spec.get("scene", {})
+        if "path" in scene:
+            if scene["path"] not in scene_files:
+                import scene_file
+                scene_files[scene["path"]] = scene_file.SceneFile(scene["path"])
+            p = scene_files[scene["path"]].camera_params
+            scene_key = ("file", scene["path"])
+            defaults = dict(lookfrom=Point3(*p[0:3]), lookat=Point3(*p[3:6]), vup=Vec3(*p[6:9]), aperture=p[9], focus_dist=p[10], vfov=p[12])
+            aspect_ratio = p[11]
+        else:
+            # an unseeded random_scene would differ from worker to worker
+            scene_key = ("random", int(scene.get("seed", 0)), int(scene.get("grid", 11)))
+            defaults = generate.camera_fields()
+            aspect_ratio = generate.aspect_ratio
+        fields = dict(defaults)
+        for field, value in spec.get("camera", {}).items():
+            if field not in CAMERA_FIELDS:
+                raise ValueError(f"unknown camera field {field!r}, expected one of {CAMERA_FIELDS}")
+            fields[field] = Vec3(*value) if isinstance(value, list) else float(value)
+        camera = Camera(fields["lookfrom"], fields["lookat"], fields["vup"], fields["aperture"], fields["focus_dist"], aspect_ratio, fields["vfov"])
+        width = int(spec.get("width", 400))
+        height = int(spec.get("height", width / aspect_ratio))
+        if width < 2 or height < 2:
+            raise ValueError("width and height must be at least 2")
+        render_kwargs = {}
+        if spec.get("integrator", "recursive") == "iterative":
+            render_kwargs = {"iterative": True, "roulette_depth": spec.get("roulette_depth")}
+        if spec.get("sampler", "random") != "random":
+            import samplers
+            samplers.get_sampler(spec["sampler"])
+            render_kwargs["sampler"] = spec["sampler"]
+        seed = spec.get("seed")
+        return Job(id, int(spec.get("priority", 0)), scene_key, camera, width, height, int(spec.get("spp", 16)),
+                   int(spec.get("tile_size", 16)), None if seed is None else int(seed), render_kwargs)
+
+    @property
+    def ended(self) -> bool:
+        return self.state in ("done", "cancelled", "failed")
+
+    def notify(self):
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    def status(self) -> dict:
+        return {"id": self.id, "state": self.state, "priority": self.priority, "width": self.width, "height": self.height,
+                "tiles": len(self.tiles), "tiles_done": len(self.events), "error": self.error}
+
+    # adds a tile into the framebuffer and records its event: the tile and its mean linear rgb as base64 float32,
+    # row by row with rows bottom-up like the framebuffer
+    def merge(self, tile: Tile, rgb: bytes, counts: List[int]):
+        colors = array("d")
+        colors.frombytes(rgb)
+        x0, y0, x1, y1 = tile
+        pixels = self.pixels
+        means = array("f")
+        i = 0
+        for row in range(y0, y1):
+            offset = (row * self.width + x0) * CHANNELS
+            for _ in range(x1 - x0):
+                pixels[offset] += colors[3 * i]
+                pixels[offset + 1] += colors[3 * i + 1]
+                pixels[offset + 2] += colors[3 * i + 2]
+                pixels[offset + SAMPLES] += counts[i]
+                scale = 1.0 / counts[i] if counts[i] else 0.0
+                means.extend((colors[3 * i] * scale, colors[3 * i + 1] * scale, colors[3 * i + 2] * scale))
+                offset += CHANNELS
+                i += 1
+        event = {"tile": list(tile), "rgb": base64.b64encode(means.tobytes()).decode()}
+        self.events.append(json.dumps(event).encode() + b"\n")
+
+
+class RenderService:
+    def __init__(self, workers: Optional[int] = None, retain: int = 64):
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        # a little over one tile per worker keeps them busy between results, and few enough that
+        # a new high priority job takes over within about a tile
+        self.slots = 2 * self.workers
+        self.in_flight = 0
+        self.retain = retain
+        self.jobs: Dict[int, Job] = {}
+        self.next_id = 1
+        self.scene_files: dict = {}
+        self.counts = {state: 0 for state in ("done", "cancelled", "failed")}
+        self.tiles_rendered = 0
+        self.scene_loads = 0
+        self.queue_wait: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.first_tile: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.job_seconds: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.tile_seconds: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    def submit(self, spec: dict) -> Job:
+        job = Job.from_spec(self.next_id, spec, self.scene_files)
+        self.next_id += 1
+        self.jobs[job.id] = job
+        self._fill()
+        return job
+
+    def cancel(self, job: Job):
+        if not job.ended:
+            job.pending.clear()
+            self._end(job, "cancelled")
+
+    def reprioritize(self, job: Job, priority: int):
+        job.priority = priority
+        self._fill()
+
+    def _end(self, job: Job, state: str, error: Optional[str] = None):
+        job.state = state
+        job.error = error
+        job.finished = time.perf_counter()
+        self.counts[state] += 1
+        if state == "done":
+            self.job_seconds.append(job.finished - job.submitted)
+        job.notify()
+        ended = [other for other in self.jobs.values() if other.ended]
+        for other in ended[:max(0, len(ended) - self.retain)]:
+            del self.jobs[other.id]
+
+    # hands free slots to the highest priority job with tiles left, the earliest submitted among equals
+    def _fill(self):
+        loop = asyncio.get_running_loop()
+        while self.in_flight < self.slots:
+            waiting = [job for job in self.jobs.values() if job.pending]
+            if not waiting:
+                return
+            job = min(waiting, key=lambda job: (-job.priority, job.id))
+            tile = job.pending.pop()
+            if job.started is None:
+                job.started = time.perf_counter()
+                job.state = "running"
+                self.queue_wait.append(job.started - job.submitted)
+            job.in_flight += 1
+            self.in_flight += 1
+            future = loop.run_in_executor(self.pool, _render_job_tile, job.scene_key, job.camera, job.width, job.height,
+                                          job.samples_per_pixel, tile, job.seed, job.render_kwargs)
+            future.add_done_callback(lambda f, job=job, tile=tile: self._tile_done(job, tile, f))
+
+    def _tile_done(self, job: Job, tile: Tile, future: asyncio.Future):
+        self.in_flight -= 1
+        job.in_flight -= 1
+        if future.cancelled():
+            return
+        try:
+            rgb, counts, elapsed, loaded = future.result()
+        except Exception as e:
+            if not job.ended:
+                job.pending.clear()
+                self._end(job, "failed", f"{type(e).__name__}: {e}")
+            self._fill()
+            return
+        self.tiles_rendered += 1
+        self.scene_loads += loaded
+        self.tile_seconds.append(elapsed)
+        # a cancelled job's tiles still finish, their results are dropped
+        if not job.ended:
+            if not job.events:
+                self.first_tile.append(time.perf_counter() - job.submitted)
+            job.merge(tile, rgb, counts)
+            if len(job.events) == len(job.tiles):
+                self._end(job, "done")
+            else:
+                job.notify()
+        self._fill()
+
+    def metrics(self) -> dict:
+        active = [job for job in self.jobs.values() if not job.ended]
+        return {
+            "workers": self.workers,
+            "queued_jobs": sum(job.state == "queued" for job in active),
+            "running_jobs": sum(job.state == "running" for job in active),
+            "queue_depth_tiles": sum(len(job.pending) for job in active),
+            "in_flight_tiles": self.in_flight,
+            "jobs": dict(self.counts),
+            "tiles_rendered": self.tiles_rendered,
+            "scene_loads": self.scene_loads,
+            "queue_wait_seconds": _percentiles(self.queue_wait),
+            "first_tile_seconds": _percentiles(self.first_tile),
+            "job_seconds": _percentiles(self.job_seconds),
+            "tile_seconds": _percentiles(self.tile_seconds),
+        }
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 0) -> Tuple[str, int]:
+        self.server = await asyncio.start_server(self._handle, host, port)
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def close(self):
+        for job in list(self.jobs.values()):
+            self.cancel(job)
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            method, target, _ = (await reader.readline()).decode("latin-1").split()
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get("content-length", 0)))
+            await self._route(method, urlsplit(target).path.strip("/").split("/"), body, writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except (ValueError, KeyError, TypeError, OSError) as e:
+            try:
+                await _respond(writer, 400, {"error": f"{type(e).__name__}: {e}"})
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+    async def _route(self, method: str, path: List[str], body: bytes, writer: asyncio.StreamWriter):
+        if path == ["metrics"] and method == "GET":
+            return await _respond(writer, 200, self.metrics())
+        if path == ["jobs"] and method == "POST":
+            job = self.submit(json.loads(body or b"{}"))
+            return await _respond(writer, 202, {"id": job.id})
+        if len(path) < 2 or path[0] != "jobs" or not path[1].isdigit():
+            return await _respond(writer, 404, {"error": "not found"})
+        job = self.jobs.get(int(path[1]))
+        if job is None:
+            return await _respond(writer, 404, {"error": f"no job {path[1]}"})
+        action = (method, path[2] if len(path) > 2 else "")
+        if action == ("GET", ""):
+            return await _respond(writer, 200, job.status())
+        if action == ("DELETE", ""):
+            self.cancel(job)
+            return await _respond(writer, 200, job.status())
+        if action == ("PATCH", ""):
+            self.reprioritize(job, int(json.loads(body)["priority"]))
+            return await _respond(writer, 200, job.status())
+        if action == ("GET", "tiles"):
+            return await self._stream_tiles(job, writer)
+        if action == ("GET", "image"):
+            if job.state != "done":
+                return await _respond(writer, 409, job.status())
+            image = io.BytesIO()
+            write_image(image, job.pixels, job.width, job.height)
+            writer.write(f"HTTP/1.1 200 OK\r\nContent-Type: image/x-portable-pixmap\r\nContent-Length: {image.tell()}\r\n"
+                         f"Connection: close\r\n\r\n".encode() + image.getvalue())
+            return await writer.drain()
+        await _respond(writer, 405, {"error": f"{method} not allowed here"})
+
+    # every tile finished so far, then each new one as it lands, and a last line with the job's status
+    async def _stream_tiles(self, job: Job, writer: asyncio.StreamWriter):
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\nConnection: close\r\n\r\n")
+        sent = 0
+        while True:
+            changed = job.changed
+            while sent < len(job.events):
+                writer.write(job.events[sent])
+                sent += 1
+            await writer.drain()
+            if job.ended:
+                break
+            await changed.wait()
+        writer.write(json.dumps(job.status()).encode() + b"\n")
+        await writer.drain()
+
+
+async def _respond(writer: asyncio.StreamWriter, status: int, payload: dict):
+    body = json.dumps(payload).encode()
+    reason = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 409: "Conflict"}[status]
+    writer.write(f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+                 f"Connection: close\r\n\r\n".encode() + body)
+    await writer.drain()
+
+
+async def run(host: str, port: int, workers: Optional[int], retain: int):
+    service = RenderService(workers, retain)
+    host, port = await service.serve(host, port)
+    print(f"serving on {host}:{port} with {service.workers} workers", file=sys.stderr, flush=True)
+    # SIGTERM shuts down like Ctrl-C, the default handler would leave the pool's workers behind
+    stop = asyncio.Event()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+    try:
+        await stop.wait()
+    finally:
+        await service.close()
+
+
+# python service.py [--listen 127.0.0.1:8765] [--workers N]
+# there is no authentication, keep it on localhost or behind something that has some
+def main():
+    from distributed import parse_address
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--listen", default="127.0.0.1:8765", help="host:port, port 0 picks a free one")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--retain", type=int, default=64, help="finished jobs kept for their images and tiles")
+    args = parser.parse_args()
+    host, port = parse_address(args.listen)
+    try:
+        asyncio.run(run(host, port, args.workers, args.retain))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,11 @@
+import os
+import sys
+
+# the modules live flat at the repo root, like running python generate.py from there
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# the test process runs numba kernels itself and later forks render workers. once numba's default TBB pool has
+# started, a process that forks can no longer exit, so the tests keep to the workqueue layer
+os.environ.setdefault("NUMBA_THREADING_LAYER", "workqueue")
@@ -0,0 +1,30 @@
+import pytest
+import generate
+from adaptive import AdaptiveSampling
+from bvh import BVHNode
+
+
+def test_one_sample_is_never_tested_for_noise():
+    sampling = AdaptiveSampling(min_spp=1, max_spp=8, noise_threshold=0.01, batch=1)
+    assert not sampling.converged(1, 0.5, 0.0)
+    assert sampling.converged(2, 0.5, 0.0)
+    assert AdaptiveSampling(min_spp=1, max_spp=1, batch=1).converged(1, 0.5, 0.0)
+
+
+def test_single_sample_batches_render():
+    sampling = AdaptiveSampling(min_spp=1, max_spp=8, noise_threshold=0.05, batch=1)
+    _, counts = generate.render_tile_adaptive(8, 4, sampling, generate.camera, BVHNode(generate.random_scene(0, 3)), 0, 0, 8, 4)
+    assert all(2 <= n <= 8 for n in counts)
+
+
+@pytest.mark.parametrize("min_spp, max_spp, batch", [(0, 8, 4), (9, 8, 4), (1, 8, 0)])
+def test_invalid_sampling_is_rejected(min_spp, max_spp, batch):
+    with pytest.raises(ValueError):
+        AdaptiveSampling(min_spp, max_spp, batch=batch)
+
+
+@pytest.mark.parametrize("min_spp, max_spp", [("0", "8"), ("16", "8")])
+def test_generate_rejects_bad_spp_bounds(tmp_path, capsys, min_spp, max_spp):
+    with pytest.raises(SystemExit):
+        generate.main(["--adaptive", "--min-spp", min_spp, "--max-spp", max_spp, "--output", str(tmp_path / "out.ppm")])
+    assert "--adaptive needs 1 <= --min-spp <= --max-spp" in capsys.readouterr().err
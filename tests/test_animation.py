@@ -0,0 +1,36 @@
+import pickle
+import pytest
+import generate
+from animation import Animation, AnimatedScene
+from hittable import HittableList, Instance, Sphere, Transform
+from material import Lambertian
+from ray import Ray
+from vec3 import Color, Point3, Vec3
+
+
+def scene(*objects) -> AnimatedScene:
+    animation = Animation(3, {}, {1: [(0, Point3(0, 0, 0)), (2, Point3(4, 2, 0))]})
+    return AnimatedScene(HittableList(list(objects)), animation, generate.camera_fields(), generate.aspect_ratio)
+
+
+def test_instances_move_through_their_transform():
+    material = Lambertian(Color(0.5, 0.5, 0.5))
+    # a unit sphere off its own origin, turned and stretched, so its center is not the transform's translation
+    transform = Transform.translate(Vec3(-3, 0, 0)) @ Transform.rotate(Vec3(0, 1, 0), 90) @ Transform.scale(2, 1, 1)
+    animated = scene(Sphere(Point3(0, 0, -10), 1, material), Instance(Sphere(Point3(1, 0, 0), 1, material), transform))
+    # posed in a worker's copy, like render_tile
+    animated = pickle.loads(pickle.dumps(animated))
+    for frame, center in [(0, Point3(0, 0, 0)), (1, Point3(2, 1, 0)), (2, Point3(4, 2, 0))]:
+        _, world = animated.pose(frame)
+        box = animated.world.objects[1].bounding_box()
+        assert ((box.minimum + box.maximum) * 0.5 - center).length() < 1e-9
+        # still turned: 2 wide along z, 1 along x
+        assert abs(box.maximum.z - box.minimum.z - 4) < 1e-9 and abs(box.maximum.x - box.minimum.x - 2) < 1e-9
+        rec = world.hit(Ray(center + Vec3(0, 5, 0), Vec3(0, -1, 0)), 0.001, float("inf"))
+        assert rec is not None and abs(rec.t - 4) < 1e-9
+
+
+def test_objects_without_a_center_are_rejected():
+    material = Lambertian(Color(0.5, 0.5, 0.5))
+    with pytest.raises(ValueError, match="HittableList has no center"):
+        scene(Sphere(Point3(0, 0, -10), 1, material), HittableList([Sphere(Point3(0, 0, 0), 1, material)]))
@@ -0,0 +1,53 @@
+# the compiled backends draw their own random numbers, so their images only match the scalar one up to
+# sampling noise: per-pixel error shrinks as 1/sqrt(spp) and the image mean should barely move
+import pytest
+import backends
+import generate
+import rtweekend
+from bench.backends import render
+from hittable import Torus
+from material import Metal
+from vec3 import Color, Point3
+
+WIDTH = 32
+HEIGHT = int(WIDTH / generate.aspect_ratio)
+
+
+def world(torus: bool):
+    world = generate.random_scene(0, 5)
+    if torus:
+        world.add(Torus(Point3(0, 1, 2), 1.2, 0.3, Metal(Color(0.8, 0.8, 0.9), 0.1)))
+    return world
+
+
+# wavefront only intersects spheres
+@pytest.mark.parametrize("spp", [8, 32])
+@pytest.mark.parametrize("name, torus", [("numba", False), ("numba", True), ("wavefront", False)],
+                         ids=["numba", "numba-torus", "wavefront"])
+def test_matches_scalar(name, spp, torus):
+    backend = backends.BACKENDS[name]
+    if not backend.available():
+        pytest.skip(f"{name} dependencies are not installed")
+    scene = world(torus)
+    reference, _ = render(backends.ReferenceBackend(), scene, WIDTH, HEIGHT, spp)
+    pixels, _ = render(backend(), scene, WIDTH, HEIGHT, spp)
+    samples = 3 * len(reference)
+    pixel_error = sum(abs(a - b) for p, q in zip(pixels, reference) for a, b in zip(p, q)) / samples
+    mean_error = abs(sum(map(sum, pixels)) - sum(map(sum, reference))) / samples
+    assert pixel_error < 0.2 / spp ** 0.5
+    assert mean_error < 0.01
+
+
+# --seed covers the compiled backends too: a seeded tile draws the same numbers whatever thread renders each pixel
+@pytest.mark.parametrize("name", ["numba", "wavefront"])
+def test_seeded_renders_repeat(name):
+    backend = backends.BACKENDS[name]
+    if not backend.available():
+        pytest.skip(f"{name} dependencies are not installed")
+    scene = world(False)
+    images = []
+    for seed in (1, 1, 2):
+        rtweekend.seed_rng(seed)
+        images.append(render(backend(), scene, WIDTH, HEIGHT, 4)[0])
+    assert images[0] == images[1]
+    assert images[0] != images[2]
@@ -0,0 +1,58 @@
+import random
+import generate
+from bvh import BVHNode
+from hittable import HittableList, Instance, Sphere, Torus, Transform
+from material import Lambertian, Metal
+from ray import Ray
+from vec3 import Color, Point3, Vec3
+
+
+def world() -> HittableList:
+    world = generate.random_scene(0, 3)
+    metal = Metal(Color(0.8, 0.8, 0.9), 0.1)
+    world.add(Torus(Point3(0, 1, 2), 1.2, 0.3, metal))
+    world.add(Torus(Point3(-2, 0.5, -1), 0.6, 0.2, metal, mode="sdf"))
+    shared = BVHNode([Sphere(Point3(x, 0, 0), 0.3, Lambertian(Color(0.2, 0.4, 0.6))) for x in (-1, 0, 1)])
+    world.add(Instance(shared, Transform.translate(Vec3(1, 1, -2)) @ Transform.rotate(Vec3(0, 1, 0), 45)))
+    world.add(Instance(Torus(Point3(0, 0, 0), 1.0, 0.25, metal), Transform.translate(Vec3(2, 0.5, 1)) @ Transform.scale(0.5)))
+    return world
+
+
+# from all around the scene towards points among its objects
+def rays(rng: random.Random, count: int):
+    for _ in range(count):
+        origin = Point3(rng.uniform(-12, 12), rng.uniform(0.5, 8), rng.uniform(-12, 12))
+        target = Point3(rng.uniform(-5, 5), rng.uniform(0, 2), rng.uniform(-5, 5))
+        yield Ray(origin, target - origin)
+
+
+def assert_same_hits(bvh: BVHNode, objects: HittableList, rng: random.Random):
+    hits = 0
+    for r in rays(rng, 2000):
+        expected = objects.hit(r, 0.001, float("inf"))
+        found = bvh.hit(r, 0.001, float("inf"))
+        assert (found is None) == (expected is None)
+        if expected is not None:
+            hits += 1
+            assert abs(found.t - expected.t) < 1e-9
+            assert found.material is expected.material
+    assert hits > 1000
+
+
+def test_hits_match_the_object_list():
+    objects = world()
+    assert_same_hits(BVHNode(objects), objects, random.Random(1))
+
+
+def test_refit_after_objects_move():
+    objects = world()
+    bvh = BVHNode(objects)
+    rng = random.Random(2)
+    moved = rng.sample(range(1, len(objects.objects) - 4), 6) + [len(objects.objects) - 4]
+    for index in moved:
+        obj = objects.objects[index]
+        obj.center = obj.center + Vec3(rng.uniform(-4, 4), rng.uniform(0, 1), rng.uniform(-4, 4))
+        if isinstance(obj, Torus):
+            obj.box = obj.bounding_box()
+        BVHNode.refit(bvh.path_to(obj))
+    assert_same_hits(bvh, objects, rng)
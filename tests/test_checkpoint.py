@@ -0,0 +1,56 @@
+import os
+import signal
+import subprocess
+import sys
+import time
+from array import array
+import pytest
+import checkpoint
+import generate
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RENDER = ["--width", "48", "--spp", "12", "--pass-spp", "1", "--seed", "3", "--executor", "serial"]
+
+
+def saved_passes(path) -> int:
+    with open(path, "rb") as f:
+        return checkpoint.HEADER.unpack(f.read(checkpoint.HEADER.size))[-1]
+
+
+def test_resumed_render_matches_an_uninterrupted_one(tmp_path, capsys):
+    state = tmp_path / "render.ckpt"
+    killed = subprocess.Popen([sys.executable, "generate.py", *RENDER, "--output", str(tmp_path / "killed.ppm"), "--checkpoint", str(state)],
+                              cwd=ROOT, stderr=subprocess.DEVNULL)
+    try:
+        while not (state.exists() and saved_passes(state) >= 2):
+            assert killed.poll() is None, "the render finished before it could be killed"
+            time.sleep(0.01)
+        killed.send_signal(signal.SIGKILL)
+    finally:
+        killed.wait()
+    interrupted_at = saved_passes(state)
+    assert 2 <= interrupted_at < 12
+
+    resumed = tmp_path / "resumed.ppm"
+    generate.main([*RENDER, "--output", str(resumed), "--checkpoint", str(state), "--resume"])
+    assert f"resuming from {state} after {interrupted_at} of 12 passes" in capsys.readouterr().err
+    uninterrupted = tmp_path / "uninterrupted.ppm"
+    generate.main([*RENDER, "--output", str(uninterrupted)])
+    assert resumed.read_bytes() == uninterrupted.read_bytes()
+
+
+def test_load_rejects_a_truncated_file(tmp_path):
+    path = str(tmp_path / "render.ckpt")
+    checkpoint.save(path, array("f", range(4 * 3 * 2)), 3, 2, 4, 1)
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 4)
+    with pytest.raises(ValueError, match="truncated"):
+        checkpoint.load(path, 3, 2, 4)
+
+
+def test_load_rejects_another_image_size(tmp_path):
+    path = str(tmp_path / "render.ckpt")
+    checkpoint.save(path, array("f", range(4 * 3 * 2)), 3, 2, 4, 1)
+    assert checkpoint.load(path, 3, 2, 4) == (array("f", range(4 * 3 * 2)), 1)
+    with pytest.raises(ValueError, match="holds a 3x2 render, expected 2x3"):
+        checkpoint.load(path, 2, 3, 4)
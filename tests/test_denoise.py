@@ -0,0 +1,23 @@
+import pytest
+pytest.importorskip("numpy")
+import denoise
+import generate
+import samplers
+import scheduler
+from bvh import BVHNode
+
+WIDTH = 32
+HEIGHT = int(WIDTH / generate.aspect_ratio)
+
+
+@pytest.mark.parametrize("render_kwargs", [{}, {"iterative": True}, {"sampler": samplers.get_sampler("sobol")}], ids=["recursive", "iterative", "sobol"])
+def test_render_tile_records_aovs_without_changing_the_image(render_kwargs):
+    render_args = (2, generate.camera, BVHNode(generate.random_scene(0, 5)))
+    expected = scheduler.render_tiles(generate.render_tile, render_args, WIDTH, HEIGHT, 8, seed=1, executor="serial", render_kwargs=render_kwargs)
+    aovs = denoise.AOVImage(WIDTH, HEIGHT)
+    pixels = scheduler.render_tiles(denoise.render_tile, render_args, WIDTH, HEIGHT, 8, seed=1, executor="serial", render_kwargs=render_kwargs,
+                                    tile_stats=aovs)
+    assert pixels.tobytes() == expected.tobytes()
+    assert (aovs.counts == 2).all()
+    assert ((aovs.albedo >= 0) & (aovs.albedo <= 1)).all()
+    assert denoise.denoise(denoise.framebuffer_colors(pixels, WIDTH, HEIGHT), aovs).shape == (HEIGHT, WIDTH, 3)
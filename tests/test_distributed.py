@@ -0,0 +1,103 @@
+import socket
+import pytest
+import distributed
+import generate
+import scheduler
+from bvh import BVHNode
+
+WIDTH = 48
+HEIGHT = int(WIDTH / generate.aspect_ratio)
+TILE_SIZE = 8
+SEED = 3
+
+
+@pytest.fixture(scope="module")
+def render_args():
+    return 2, generate.camera, BVHNode(generate.random_scene(SEED, 5))
+
+
+# serve(**coordinator kwargs) -> (serving coordinator, address), every server closed after the test
+@pytest.fixture
+def serve(render_args):
+    coordinators = []
+
+    def serve(**kwargs):
+        coordinators.append(distributed.Coordinator(generate.render_tile, render_args, WIDTH, HEIGHT, TILE_SIZE, seed=SEED, lease_timeout=1.0, **kwargs))
+        return coordinators[-1], coordinators[-1].serve()
+    yield serve
+    for coordinator in coordinators:
+        coordinator.server.close()
+
+
+# a peer that has passed the handshake and holds one lease, (socket, tile)
+def leased(address, token: str):
+    sock = socket.create_connection(address)
+    distributed.join(sock, token, "test")
+    distributed.send(sock, {"type": "lease"})
+    header, _ = distributed.recv(sock)
+    return sock, tuple(header["tile"])
+
+
+def closed(sock: socket.socket) -> bool:
+    sock.settimeout(5)
+    try:
+        distributed.recv(sock)
+    except ConnectionError:
+        return True
+    return False
+
+
+def test_worker_killed_mid_render(render_args, serve):
+    expected = scheduler.render_tiles(generate.render_tile, render_args, WIDTH, HEIGHT, TILE_SIZE, workers=1, seed=SEED)
+    workers = []
+
+    # the first merged tile kills one worker, most likely while it renders its next lease
+    def on_tile(tile, pixels):
+        if workers and workers[0].is_alive():
+            workers[0].kill()
+
+    render, (host, port) = serve(on_tile=on_tile, speculate=False)
+    assert host == "127.0.0.1"
+    workers.extend(distributed.start_local_workers(host, port, 2, render.token))
+    pixels = render.wait(120)
+    for worker in workers:
+        worker.join(10)
+    assert workers[0].exitcode == -9
+    assert sum(not worker.connected for worker in render.workers.values()) >= 1
+    assert pixels.tobytes() == expected.tobytes()
+
+
+def test_wrong_token_is_refused(serve):
+    render, address = serve(token="right")
+    with socket.create_connection(address) as sock, pytest.raises(ConnectionError):
+        distributed.join(sock, "wrong", "intruder")
+    assert not render.workers
+
+
+def test_coordinator_without_token_is_refused():
+    with socket.create_server(("127.0.0.1", 0)) as server, socket.create_connection(server.getsockname()[:2]) as sock:
+        conn, _ = server.accept()
+        with conn:
+            distributed.send(conn, {"type": "challenge", "nonce": "0"})
+            distributed.send(conn, {"type": "scene", "digest": "guess"}, b"not a pickle")
+            with pytest.raises(distributed.ProtocolError):
+                distributed.join(sock, "token", "worker")
+
+
+@pytest.mark.parametrize("change", ["unleased tile", "short counts", "short colors"])
+def test_bad_result_drops_the_worker(serve, change):
+    render, address = serve()
+    sock, tile = leased(address, render.token)
+    x0, y0, x1, y1 = tile
+    size = (x1 - x0) * (y1 - y0)
+    counts, colors = [1] * size, bytes(size * 3 * 8)
+    if change == "unleased tile":
+        tile = next(t for t in render.tiles if t != tile)
+    elif change == "short counts":
+        counts = counts[1:]
+    else:
+        colors = colors[8:]
+    distributed.send(sock, {"type": "result", "tile": tile, "counts": counts, "elapsed": 0.0, "stats": None}, colors)
+    with sock:
+        assert closed(sock)
+    assert not any(render.pixels)
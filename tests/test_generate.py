@@ -0,0 +1,20 @@
+import math
+import generate
+import samplers
+from bvh import BVHNode
+from rtweekend import seed_rng
+
+
+# a row renders the same pixels as the one row tile, both draw from the same seeded generator in the same order
+def test_render_row_matches_render_tile():
+    world = BVHNode(generate.random_scene(0, 3))
+    width, height, row = 32, 18, 9
+    samplers.start_pass(0)
+    seed_rng(5)
+    index, pixels = generate.render_row(width, height, 2, generate.camera, world, row)
+    seed_rng(5)
+    tile, counts = generate.render_tile(width, height, 2, generate.camera, world, 0, row, width, row + 1)
+    assert index == row and len(pixels) == width
+    assert [p.e for p in pixels] == [p.e for p in tile]
+    assert counts == [2] * width
+    assert all(math.isfinite(c) and c >= 0 for p in pixels for c in p.e)
@@ -0,0 +1,50 @@
+import os
+import subprocess
+import sys
+import pytest
+pytest.importorskip("numpy")
+resource = pytest.importorskip("resource")
+from scheduler import CHANNELS, FLOAT_SIZE
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WIDTH = 2048
+HEIGHT = WIDTH * 9 // 16
+
+
+def generate(*argv, limit=None) -> subprocess.CompletedProcess:
+    def cap():
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    return subprocess.run([sys.executable, "generate.py", *argv], cwd=ROOT, capture_output=True, text=True,
+                          preexec_fn=cap if limit is not None else None)
+
+
+# peak address space in bytes of a framebuffer file render too small for its buffer to matter: the interpreter,
+# numpy and the compiled kernels
+def baseline(scene, tmp_path) -> int:
+    script = ("import sys, generate; generate.main(sys.argv[1:]); "
+              "print([line.split()[1] for line in open('/proc/self/status') if line.startswith('VmPeak')][0])")
+    result = subprocess.run([sys.executable, "-c", script, "--scene", scene, "--width", "64", "--spp", "1", "--max-depth", "2", "--seed", "0",
+                             "--engine", "wavefront", "--executor", "serial", "--output", str(tmp_path / "small.ppm"), "--framebuffer", str(tmp_path / "small.bin")],
+                            cwd=ROOT, check=True, capture_output=True, text=True)
+    return int(result.stdout.split()[-1]) * 1024
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="reads /proc")
+def test_framebuffer_file_renders_under_a_memory_limit(tmp_path):
+    scene = str(tmp_path / "small.scene")
+    subprocess.run([sys.executable, "raytrace.py", "scene", "export", scene, "--seed", "0", "--grid", "1"], cwd=ROOT, check=True)
+    # half of what the in-memory render holds on top, the shared framebuffer and its copy out. every render is
+    # serial, on the one process the limit applies to
+    limit = baseline(scene, tmp_path) + WIDTH * HEIGHT * CHANNELS * FLOAT_SIZE // 2
+    common = ["--scene", scene, "--width", str(WIDTH), "--spp", "1", "--max-depth", "2", "--seed", "0", "--engine", "wavefront",
+              "--executor", "serial"]
+
+    on_disk = tmp_path / "file.ppm"
+    result = generate(*common, "--output", str(on_disk), "--framebuffer", str(tmp_path / "framebuffer.bin"), limit=limit)
+    assert result.returncode == 0, result.stderr
+    # the limit is one the in-memory render does not fit in
+    assert generate(*common, "--output", str(tmp_path / "capped.ppm"), limit=limit).returncode != 0
+    in_memory = tmp_path / "memory.ppm"
+    result = generate(*common, "--output", str(in_memory))
+    assert result.returncode == 0, result.stderr
+    assert on_disk.read_bytes() == in_memory.read_bytes()
@@ -0,0 +1,24 @@
+import pytest
+import generate
+import samplers
+import scheduler
+from bvh import BVHNode
+
+# the index of every start_sample, shared by the copies use() makes
+started = []
+
+
+class RecordingSampler(samplers.SobolSampler):
+    def start_sample(self, index: int):
+        started.append(index)
+        super().start_sample(index)
+
+
+@pytest.mark.parametrize("executor", ["serial", "thread"])
+def test_passes_continue_each_pixels_sequence(executor):
+    started.clear()
+    render_args = (3, generate.camera, BVHNode(generate.random_scene(0, 5)))
+    scheduler.render_tiles(generate.render_tile, render_args, 4, 2, 4, passes=3, seed=0, executor=executor, workers=2,
+                           render_kwargs={"sampler": RecordingSampler()})
+    # one tile of 8 pixels a pass, 3 samples each
+    assert started == [sample for first in (0, 3, 6) for _ in range(8) for sample in range(first, first + 3)]
@@ -0,0 +1,61 @@
+import pickle
+import random
+import generate
+import scene_file
+from hittable import Torus
+from material import Metal
+from ray import Ray
+from vec3 import Color, Point3, Vec3
+
+
+def world():
+    world = generate.random_scene(0, 3)
+    # equal by value but separate objects, they share one table entry
+    world.add(Torus(Point3(0, 1, 2), 1.2, 0.3, Metal(Color(0.8, 0.8, 0.9), 0.1)))
+    world.add(Torus(Point3(-2, 0.5, -1), 0.6, 0.2, Metal(Color(0.8, 0.8, 0.9), 0.1), mode="sdf"))
+    return world
+
+
+def rays(count: int):
+    rng = random.Random(4)
+    for _ in range(count):
+        origin = Point3(rng.uniform(-12, 12), rng.uniform(0.5, 8), rng.uniform(-12, 12))
+        yield Ray(origin, Point3(rng.uniform(-5, 5), rng.uniform(0, 2), rng.uniform(-5, 5)) - origin)
+
+
+def test_round_trip(tmp_path):
+    original = world()
+    path = str(tmp_path / "world.scene")
+    scene_file.save(path, original, generate.camera)
+    scene = scene_file.SceneFile(path)
+    try:
+        loaded = scene.world()
+        assert [type(obj) for obj in loaded.objects] == [type(obj) for obj in original.objects]
+        assert [obj.mode for obj in loaded.objects[-2:]] == ["analytic", "sdf"]
+        assert len(scene.material_kind) == len({scene_file._material_entry(obj.material) for obj in original.objects})
+        assert loaded.objects[-1].material is loaded.objects[-2].material
+
+        hits = 0
+        for r in rays(1000):
+            expected = original.hit(r, 0.001, float("inf"))
+            found = loaded.hit(r, 0.001, float("inf"))
+            assert (found is None) == (expected is None)
+            if expected is not None:
+                hits += 1
+                assert found.t == expected.t
+                assert scene_file._material_entry(found.material) == scene_file._material_entry(expected.material)
+        assert hits > 500
+
+        camera = scene.camera()
+        for field in ("origin", "lower_left_corner", "horizontal", "vertical", "u", "v"):
+            assert (getattr(camera, field) - getattr(generate.camera, field)).length() < 1e-9
+        assert (camera.aperture, camera.aspect_ratio, camera.vfov) == (generate.camera.aperture, generate.camera.aspect_ratio, generate.camera.vfov)
+
+        # a worker's copy of the BVH maps the same file
+        bvh = pickle.loads(pickle.dumps(scene_file.SceneBVH(scene)))
+        for r in rays(200):
+            expected = original.hit(r, 0.001, float("inf"))
+            found = bvh.hit(r, 0.001, float("inf"))
+            assert (found is None) == (expected is None) and (found is None or found.t == expected.t)
+    finally:
+        scene.close()
@@ -0,0 +1,58 @@
+import io
+import json
+import subprocess
+import sys
+import pytest
+import generate
+import scheduler
+from bench.service import ROOT, request, stream, submit
+from bvh import BVHNode
+from image_io import write_image
+
+# a small random_scene keeps the tiles quick
+JOB = dict(scene={"seed": 0, "grid": 3}, width=64, spp=4, tile_size=16, seed=0)
+
+
+@pytest.fixture(scope="module")
+def port():
+    service = subprocess.Popen([sys.executable, "service.py", "--listen", "127.0.0.1:0", "--workers", "2"], cwd=ROOT,
+                               stderr=subprocess.PIPE, text=True)
+    try:
+        yield int(service.stderr.readline().split()[2].rpartition(":")[2])
+    finally:
+        service.terminate()
+        service.wait()
+
+
+def status(port: int, job: int) -> dict:
+    return json.loads(request(port, "GET", f"/jobs/{job}")[1])
+
+
+def test_higher_priority_preempts_and_cancel_ends_a_job(port):
+    # 144 slow tiles on the full random_scene, far more than the service has slots, still running when it is cancelled
+    background = submit(port, **dict(JOB, scene={"seed": 0}, width=256, spp=16, priority=0))
+    urgent = submit(port, **dict(JOB, priority=10))
+    _, _, tiles, final = stream(port, urgent)
+    assert final["state"] == "done" and tiles == final["tiles"]
+    # the urgent job took every free slot, the background one only kept what was already in flight
+    behind = status(port, background)
+    assert behind["state"] == "running" and behind["tiles_done"] < behind["tiles"] // 2
+
+    assert json.loads(request(port, "DELETE", f"/jobs/{background}")[1])["state"] == "cancelled"
+    _, _, _, final = stream(port, background)
+    assert final["state"] == "cancelled"
+    assert status(port, background)["tiles_done"] == final["tiles_done"]
+    assert request(port, "GET", f"/jobs/{background}/image")[0] == 409
+
+
+def test_image_matches_a_local_render(port):
+    job = submit(port, **JOB)
+    assert stream(port, job)[3]["state"] == "done"
+    code, image = request(port, "GET", f"/jobs/{job}/image")
+    assert code == 200
+    width, height = JOB["width"], int(JOB["width"] / generate.aspect_ratio)
+    local = scheduler.render_tiles(generate.render_tile, (JOB["spp"], generate.camera, BVHNode(generate.random_scene(0, 3))),
+                                   width, height, JOB["tile_size"], seed=JOB["seed"], executor="serial")
+    expected = io.BytesIO()
+    write_image(expected, local, width, height)
+    assert image == expected.getvalue()
@@ -0,0 +1,11 @@
+import os
+import pytest
+from bench.startup import COMMANDS, best_of
+
+# RAYTRACE_STARTUP_SCALE multiplies every budget, for slow machines
+SCALE = float(os.environ.get("RAYTRACE_STARTUP_SCALE", "1"))
+
+
+@pytest.mark.parametrize("argv, budget", [(argv, budget) for _, argv, budget in COMMANDS], ids=[name for name, _, _ in COMMANDS])
+def test_starts_within_budget(argv, budget):
+    assert best_of(argv, 5) <= budget * SCALE
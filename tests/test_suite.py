@@ -0,0 +1,23 @@
+from bench.suite import machine_differences, merge, regressions
+
+META = dict(python="3.11.7", platform="Linux-x86_64", cpu_count=1, seed=0, quick=False)
+
+
+def report(meta: dict, samples_per_second: float) -> dict:
+    return dict(meta=meta, results=[dict(workload="first_image_64px", cores=1, samples_per_second=samples_per_second)])
+
+
+def test_regressions_only_against_the_same_machine():
+    baseline = report(META, 1000.0)
+    assert machine_differences(report(dict(META), 850.0), baseline) == []
+    assert len(regressions(report(dict(META), 850.0), baseline, 0.10)) == 1
+    assert regressions(report(dict(META), 950.0), baseline, 0.10) == []
+    other = report(dict(META, cpu_count=8, python="3.12.1"), 850.0)
+    assert machine_differences(other, baseline) == ["cpu_count 1, here 8", "python '3.11.7', here '3.12.1'"]
+
+
+def test_merge_drops_another_machines_results():
+    baseline = dict(meta=META, results=[dict(workload="torus_normals_64px", cores=1, samples_per_second=10.0)])
+    assert len(merge(baseline, report(dict(META), 1000.0))["results"]) == 2
+    merged = merge(baseline, report(dict(META, cpu_count=8), 1000.0))
+    assert merged["meta"]["cpu_count"] == 8 and [r["workload"] for r in merged["results"]] == ["first_image_64px"]
@@ -0,0 +1,47 @@
+import os
+from array import array
+import adaptive
+import generate
+import scheduler
+import tilecache
+
+
+def render(tmp_path, spp: int, *extra) -> bytes:
+    output = tmp_path / f"{spp}.ppm"
+    generate.main(["--width", "32", "--spp", str(spp), "--seed", "1", "--workers", "1", "--executor", "serial", "--output", str(output), *extra])
+    return output.read_bytes()
+
+
+def test_more_spp_reuses_the_cached_blocks(tmp_path, capsys):
+    cache = str(tmp_path / "cache")
+    render(tmp_path, 8, "--cache", cache)
+    capsys.readouterr()
+    image = render(tmp_path, 16, "--cache", cache)
+    # 16 spp is four blocks of 4 on the one tile, the first two cached by the 8 spp render
+    assert "cache hits:           2 of 4 (50.0%)" in capsys.readouterr().err
+    assert image == render(tmp_path, 16, "--pass-spp", "4")
+
+
+def test_adaptive_renders_stay_within_max_spp(tmp_path, monkeypatch):
+    counts = []
+    monkeypatch.setattr(adaptive, "write_heatmap", lambda path, pixel_counts, *rest: counts.append(list(pixel_counts)))
+    cache = str(tmp_path / "cache")
+    heatmap = str(tmp_path / "heatmap.ppm")
+    first = render(tmp_path, 16, "--adaptive", "--min-spp", "4", "--max-spp", "8", "--cache", cache, "--heatmap", heatmap)
+    # the second render comes from the cache
+    assert render(tmp_path, 16, "--adaptive", "--min-spp", "4", "--max-spp", "8", "--cache", cache, "--heatmap", heatmap) == first
+    for pixel_counts in counts:
+        assert 4 <= min(pixel_counts) and max(pixel_counts) <= 8
+
+
+def test_eviction_leaves_other_files_alone(tmp_path):
+    other = tmp_path / "cache" / "notes.txt"
+    other.parent.mkdir()
+    other.write_text("not a cache entry")
+    os.utime(other, (0, 0))
+    cache = tilecache.TileCache(str(other.parent), 0, "render")
+    cache.put((0, 0, 1, 1), 0, array("d", [0.0] * scheduler.CHANNELS))
+    cache.put((0, 0, 1, 1), 1, array("d", [0.0] * scheduler.CHANNELS))
+    assert cache.stats.evictions == 1
+    assert other.read_text() == "not a cache entry"
+    assert sorted(os.listdir(other.parent)) == sorted(["notes.txt", cache.key((0, 0, 1, 1), 1)])
@@ -0,0 +1,44 @@
+import random
+import pytest
+from hittable import Torus
+from material import Lambertian
+from ray import Ray
+from vec3 import Color, Point3, Vec3
+
+CENTER = Point3(0.5, -0.25, 0.0)
+
+
+# rays from around the torus towards points near it, with unit directions
+def rays(count: int):
+    rng = random.Random(3)
+    for _ in range(count):
+        origin = Point3(rng.uniform(-4, 4), rng.uniform(-4, 4), rng.uniform(-4, 4))
+        target = CENTER + Vec3(rng.uniform(-1.5, 1.5), rng.uniform(-1.5, 1.5), rng.uniform(-0.5, 0.5))
+        yield origin, (target - origin).unit_vector()
+
+
+@pytest.mark.parametrize("length", [1e-3, 1e-4, 1e-5])
+def test_short_directions_hit_where_unit_ones_do(length):
+    torus = Torus(CENTER, 1.0, 0.4, Lambertian(Color(0.5, 0.5, 0.5)))
+    for origin, direction in rays(500):
+        t = torus.hit_torus(Ray(origin, direction), 0.001, float("inf"))
+        # t in units of the short direction is the unit t over its length
+        short = torus.hit_torus(Ray(origin, direction * length), 0.001 / length, float("inf"))
+        assert (t < 0) == (short < 0)
+        if t >= 0:
+            assert abs(short * length - t) < 1e-6 * max(1.0, t)
+
+
+@pytest.mark.parametrize("length", [1e-3, 1e-5])
+def test_numba_short_directions_hit_where_unit_ones_do(length):
+    np = pytest.importorskip("numpy")
+    numba_kernels = pytest.importorskip("numba_kernels")
+    center = np.array([CENTER.x, CENTER.y, CENTER.z])
+    roots = np.empty(4)
+    for origin, d in rays(500):
+        t = numba_kernels._hit_torus(center, 1.0, 0.4, origin.x, origin.y, origin.z, d.x, d.y, d.z, 0.001, np.inf, roots)
+        short = numba_kernels._hit_torus(center, 1.0, 0.4, origin.x, origin.y, origin.z, d.x * length, d.y * length, d.z * length,
+                                         0.001 / length, np.inf, roots)
+        assert (t < 0) == (short < 0)
+        if t >= 0:
+            assert abs(short * length - t) < 1e-6 * max(1.0, t)
@@ -0,0 +1,40 @@
+# pytest-benchmark suite for the slotted Vec3: per-op timings against the old list-backed layout from
+# bench/vec3.py and tracemalloc bytes per Vec3/Ray/HitRecord. the renderer reads the slots directly, so there is no
+# list-backed render to time render_row against, tests/test_generate.py checks what it renders instead.
+# compare runs with pytest tests/test_vec3.py --benchmark-autosave, then --benchmark-compare
+import random
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from bench.vec3 import OPS, ListVec3, allocated_bytes
+from hittable import HitRecord
+from ray import Ray
+from vec3 import Vec3
+
+
+@pytest.mark.parametrize("cls", [ListVec3, Vec3], ids=["list", "slots"])
+@pytest.mark.parametrize("op", list(OPS))
+def test_op(benchmark, op, cls):
+    # the old class has no fused form, it runs the two-op expression instead
+    statement = OPS["a + t*b"] if op == "axpy" and cls is ListVec3 else OPS[op]
+    code = compile(statement, op, "eval")
+    env = {"V": cls, "a": cls(1.0, 2.0, 3.0), "b": cls(4.0, 5.0, 6.0)}
+    benchmark.group = f"vec3 {op}"
+    benchmark(eval, code, env)
+
+
+def test_memory(benchmark):
+    vec = lambda: Vec3(random.random(), random.random(), random.random())
+    sizes = {
+        "ListVec3": allocated_bytes(lambda: ListVec3(random.random(), random.random(), random.random())),
+        "Vec3": allocated_bytes(vec),
+        "Ray": allocated_bytes(lambda: Ray(vec(), vec())),
+        "HitRecord": allocated_bytes(lambda: HitRecord(vec(), vec(), None, random.random(), True)), # type: ignore
+    }
+    benchmark.extra_info.update({f"{name} bytes": round(size) for name, size in sizes.items()})
+    benchmark.group = "memory"
+    benchmark.pedantic(vec, rounds=1)
+    assert sizes["Vec3"] < sizes["ListVec3"]
+    # a slotted object plus its three floats
+    assert sizes["Vec3"] <= 136
@@ -0,0 +1,139 @@
+import hashlib
+import io
+import os
+import re
+from array import array
+from collections import OrderedDict
+from typing import Optional
+from camera import Camera
+from hittable import HittableList
+from scheduler import CHANNELS, Tile
+
+# bump when a change to the renderers changes what a seeded tile looks like, old entries then simply stop matching
+VERSION = 1
+# entries are r, g, b sums and the sample count per pixel in float64, the values the worker added into the
+# framebuffer, so replaying one gives exactly the framebuffer the render would have
+ITEM_SIZE = 8
+# samples per pass of a cached render without --pass-spp. entries are keyed by the samples per pass, so a fixed
+# block lets a later render with more --spp replay the earlier blocks instead of matching none of them
+BLOCK_SPP = 4
+# the names the cache gives its entries. only these are indexed and evicted, other files in the directory are left alone
+ENTRY_NAME = re.compile(r"[0-9a-f]{64}")
+
+
+# sha256 over the scene file encoding of the world and camera, equal scenes hash equal whatever object built them
+def scene_digest(world: HittableList, camera: Camera) -> str:
+    import scene_file
+    data = io.BytesIO()
+    scene_file.write(data, world, camera)
+    return hashlib.sha256(data.getvalue()).hexdigest()
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# what a render's tiles depend on besides the tile and pass: the scene digest, image size, seed, the tile renderer,
+# samples per pass and its settings. parts are hashed by repr, so they should be plain values
+def render_digest(*parts) -> str:
+    return hashlib.sha256(repr((VERSION,) + parts).encode()).hexdigest()
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    def report(self) -> str:
+        lookups = self.hits + self.misses
+        return "\n".join((
+            f"cache hits:           {self.hits} of {lookups} ({100 * self.hits / lookups if lookups else 0:.1f}%)",
+            f"cache stores:         {self.stores}",
+            f"cache evictions:      {self.evictions}",
+            f"cache bytes read:     {self.bytes_read}",
+            f"cache bytes written:  {self.bytes_written}",
+        ))
+
+
+# per-tile, per-pass results of one render on disk, one file per entry named by the sha256 of the render digest,
+# tile and pass. a pass of a seeded render covers samples [pass * spp, (pass + 1) * spp) of every pixel, so a later
+# run with more passes replays the cached ones and renders only the rest. least recently used entries, by file
+# mtime across runs, go once the entries hold more than max_bytes. only the process driving the render uses it
+class TileCache:
+    def __init__(self, directory: str, max_bytes: int, render: str):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.render = render
+        self.stats = CacheStats()
+        os.makedirs(directory, exist_ok=True)
+        entries = []
+        for entry in os.scandir(directory):
+            if entry.is_file() and ENTRY_NAME.fullmatch(entry.name):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name, stat.st_size))
+        # name -> size, least recently used first
+        self.entries: OrderedDict = OrderedDict((name, size) for _, name, size in sorted(entries))
+        self.size = sum(self.entries.values())
+        self._evict()
+
+    def key(self, tile: Tile, pass_index: int) -> str:
+        return hashlib.sha256(f"{self.render}:{tile}:{pass_index}".encode()).hexdigest()
+
+    def get(self, tile: Tile, pass_index: int) -> Optional[array]:
+        name = self.key(tile, pass_index)
+        x0, y0, x1, y1 = tile
+        expected = (x1 - x0) * (y1 - y0) * CHANNELS * ITEM_SIZE
+        path = os.path.join(self.directory, name)
+        if self.entries.get(name) != expected:
+            self.stats.misses += 1
+            return None
+        data = array("d")
+        try:
+            with open(path, "rb") as f:
+                data.frombytes(f.read())
+            os.utime(path)
+        except OSError:
+            self._forget(name)
+            self.stats.misses += 1
+            return None
+        self.entries.move_to_end(name)
+        self.stats.hits += 1
+        self.stats.bytes_read += expected
+        return data
+
+    def put(self, tile: Tile, pass_index: int, data: array):
+        name = self.key(tile, pass_index)
+        path = os.path.join(self.directory, name)
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as f:
+            data.tofile(f)
+        os.replace(temp_path, path)
+        size = len(data) * ITEM_SIZE
+        self.size += size - self.entries.pop(name, 0)
+        self.entries[name] = size
+        self.stats.stores += 1
+        self.stats.bytes_written += size
+        self._evict()
+
+    # keeps at least the newest entry, even when it alone is over the limit
+    def _evict(self):
+        while self.size > self.max_bytes and len(self.entries) > 1:
+            oldest = next(iter(self.entries))
+            try:
+                os.remove(os.path.join(self.directory, oldest))
+            except FileNotFoundError:
+                pass
+            self._forget(oldest)
+            self.stats.evictions += 1
+
+    def _forget(self, name: str):
+        self.size -= self.entries.pop(name, 0)
+
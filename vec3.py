@@ -1,74 +1,98 @@
 import math
-import random
+from rtweekend import random_uniform
 
 def clamp(x, minimum, maximum):
     return max(minimum, min(maximum, x))
 
 class Vec3:
+    __slots__ = ('x', 'y', 'z')
+
     def __init__(self, e0=0.0, e1=0.0, e2=0.0):
-        self.e = [e0, e1, e2]
+        self.x = e0
+        self.y = e1
+        self.z = e2
+
+    # components as a tuple, kept for code that reads v.e[i]
+    @property
+    def e(self):
+        return (self.x, self.y, self.z)
 
     # x y z separated by a space
     def __str__(self):
-        return f"{self.e[0]} {self.e[1]} {self.e[2]}"
+        return f"{self.x} {self.y} {self.z}"
     
     def __repr__(self) -> str:
-        return f"Vec3(x={self.e[0]}, y={self.e[1]}, z={self.e[2]})"
+        return f"Vec3(x={self.x}, y={self.y}, z={self.z})"
     
     
     # return vector with negative x,y,z values
     def __neg__(self):
-        return Vec3(-self.e[0], -self.e[1], -self.e[2])
+        return Vec3(-self.x, -self.y, -self.z)
     
     def __getitem__(self, index):
-        return self.e[index]
+        return (self.x, self.y, self.z)[index]
     
     # setitem
     def __setitem__(self, index, value):
-        self.e[index] = value
+        setattr(self, ('x', 'y', 'z')[index], value)
 
     # overload iadd
     def __iadd__(self, vec3):
-        self.e[0] += vec3.e[0]
-        self.e[1] += vec3.e[1]
-        self.e[2] += vec3.e[2]
+        self.x += vec3.x
+        self.y += vec3.y
+        self.z += vec3.z
         return self
     def __add__(self, vec3):
-        return Vec3(self.e[0] + vec3.e[0], self.e[1] + vec3.e[1], self.e[2] + vec3.e[2])
+        return Vec3(self.x + vec3.x, self.y + vec3.y, self.z + vec3.z)
     def __sub__(self, vec3):
-        return Vec3(self.e[0] - vec3.e[0], self.e[1] - vec3.e[1], self.e[2] - vec3.e[2])
+        return Vec3(self.x - vec3.x, self.y - vec3.y, self.z - vec3.z)
     # overload imul
     def __imul__(self, t): 
-        self.e[0] *= t
-        self.e[1] *= t
-        self.e[2] *= t
+        self.x *= t
+        self.y *= t
+        self.z *= t
         return self
+    # scalars are the common case, only Vec3 operands take the componentwise branch
     def __mul__(self, other):
-        if isinstance(other, Vec3):
-            return Vec3(self.e[0]*other.e[0], self.e[1]*other.e[1], self.e[2]*other.e[2])
-        elif isinstance(other, (int, float)):
-            return Vec3(self.e[0]* other, self.e[1] * other, self.e[2] * other)
-        else:
-            raise TypeError("Operand must be either Vec3 or int/float.")
+        if other.__class__ is Vec3:
+            return Vec3(self.x*other.x, self.y*other.y, self.z*other.z)
+        return Vec3(self.x * other, self.y * other, self.z * other)
     def __rmul__(self, other):
-        return self * other
+        return Vec3(self.x * other, self.y * other, self.z * other)
     def __itruediv__(self, t):
         self *= 1/t
         return self
     def __truediv__(self, t):
-        return Vec3(self.e[0] / t, self.e[1] / t, self.e[2] / t)
+        return Vec3(self.x / t, self.y / t, self.z / t)
+    def __getstate__(self):
+        return (self.x, self.y, self.z)
+    def __setstate__(self, state):
+        self.x, self.y, self.z = state
     def length(self):
-        return math.sqrt(self.length_squared())
+        return math.sqrt(self.x * self.x + self.y * self.y + self.z * self.z)
     def length_squared(self):
-        return self.e[0] * self.e[0] + self.e[1] * self.e[1] + self.e[2] * self.e[2]
+        return self.x * self.x + self.y * self.y + self.z * self.z
     def dot(self, vec3):
-        return self.e[0] * vec3.e[0]+ self.e[1] * vec3.e[1] + self.e[2] * vec3.e[2]
+        return self.x * vec3.x + self.y * vec3.y + self.z * vec3.z
     def cross(self, vec3):
-        return Vec3(self.e[1] * vec3.e[2] - self.e[2] * vec3.e[1], self.e[2] * vec3.e[0] - self.e[0] * vec3.e[2], self.e[0] * vec3.e[1] - self.e[1] * vec3.e[0])
+        return Vec3(self.y * vec3.z - self.z * vec3.y, self.z * vec3.x - self.x * vec3.z, self.x * vec3.y - self.y * vec3.x)
     def unit_vector(self):
-        return self / self.length()
+        inv_length = 1.0 / math.sqrt(self.x * self.x + self.y * self.y + self.z * self.z)
+        return Vec3(self.x * inv_length, self.y * inv_length, self.z * inv_length)
+
+    # fused a + t*b without the intermediate t*b
+    @staticmethod
+    def axpy(a: 'Vec3', t: float, b: 'Vec3') -> 'Vec3':
+        return Vec3(a.x + t * b.x, a.y + t * b.y, a.z + t * b.z)
+
+    # in place self += t*b
+    def iaxpy(self, t: float, b: 'Vec3') -> 'Vec3':
+        self.x += t * b.x
+        self.y += t * b.y
+        self.z += t * b.z
+        return self
     def write_color(self, samples_per_pixel = 1):
-        r, g, b = self.e
+        r, g, b = self.x, self.y, self.z
 
         scale = 1.0 / samples_per_pixel
         # gamma = 2
@@ -81,7 +105,7 @@ class Vec3:
     
     @staticmethod
     def random(min: float = 0, max: float = 1):
-        return Vec3(random.uniform(min, max), random.uniform(min, max), random.uniform(min, max))
+        return Vec3(random_uniform(min, max), random_uniform(min, max), random_uniform(min, max))
 
     @staticmethod
     def random_in_unit_sphere():
@@ -93,7 +117,7 @@ class Vec3:
     @staticmethod
     def random_in_unit_disk():
          while True:
-            candidate_point: Vec3 = Vec3(random.uniform(-1, 1), random.uniform(-1, 1), 0)
+            candidate_point: Vec3 = Vec3(random_uniform(-1, 1), random_uniform(-1, 1), 0)
             if(candidate_point.length_squared() >= 1):
                 continue
             return candidate_point
@@ -106,11 +130,11 @@ class Vec3:
     
     def near_zero(self):
         s = 1e-8
-        return all(math.isclose(_, 0, abs_tol=s) for _ in self.e)
+        return abs(self.x) <= s and abs(self.y) <= s and abs(self.z) <= s
     
     def refract(self, n, etai_over_etat: float):
         cos_theta = min(-self.dot(n), 1.0)
-        r_out_perp: Vec3 = etai_over_etat * (self + cos_theta*n)
+        r_out_perp: Vec3 = etai_over_etat * Vec3.axpy(self, cos_theta, n)
         r_out_parallel = -math.sqrt(abs(1.0 - r_out_perp.length_squared())) * n
         return r_out_perp + r_out_parallel
 
@@ -0,0 +1,226 @@
+from typing import List, Optional, Tuple
+import numpy as np
+from camera import Camera
+from hittable import HittableList, Sphere
+from material import Dielectric, Lambertian, Metal
+from vec3 import Color, Vec3
+import rtweekend
+
+# material kinds stored per sphere
+LAMBERTIAN = 0
+METAL = 1
+DIELECTRIC = 2
+
+# keep rays x spheres temporaries around a few MB
+MAX_PAIRS_PER_CHUNK = 1 << 21
+
+
+class SceneArrays:
+    def __init__(self, world: HittableList):
+        spheres = world.objects
+        for obj in spheres:
+            if not isinstance(obj, Sphere):
+                raise TypeError(f"wavefront engine only supports Sphere, got {type(obj).__name__}")
+        n = len(spheres)
+        self.centers = np.array([s.center.e for s in spheres], dtype=np.float64).reshape(n, 3)
+        self.radii = np.array([s.radius for s in spheres], dtype=np.float64)
+        self.kind = np.zeros(n, dtype=np.int8)
+        self.albedo = np.ones((n, 3), dtype=np.float64)
+        self.fuzz = np.zeros(n, dtype=np.float64)
+        self.ior = np.ones(n, dtype=np.float64)
+        for i, s in enumerate(spheres):
+            material = s.material
+            if isinstance(material, Lambertian):
+                self.kind[i] = LAMBERTIAN
+                self.albedo[i] = material.albedo.e
+            elif isinstance(material, Metal):
+                self.kind[i] = METAL
+                self.albedo[i] = material.albedo.e
+                self.fuzz[i] = material.fuzz
+            elif isinstance(material, Dielectric):
+                self.kind[i] = DIELECTRIC
+                self.ior[i] = material.index_of_refraction
+            else:
+                raise TypeError(f"wavefront engine does not support {type(material).__name__}")
+
+
+class CameraArrays:
+    def __init__(self, camera: Camera):
+        self.origin = np.array(camera.origin.e, dtype=np.float64)
+        self.lower_left_corner = np.array(camera.lower_left_corner.e, dtype=np.float64)
+        self.horizontal = np.array(camera.horizontal.e, dtype=np.float64)
+        self.vertical = np.array(camera.vertical.e, dtype=np.float64)
+        self.u = np.array(camera.u.e, dtype=np.float64)
+        self.v = np.array(camera.v.e, dtype=np.float64)
+        self.lens_radius = camera.lens_radius
+
+    def get_rays(self, s: np.ndarray, t: np.ndarray, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+        rd = self.lens_radius * random_in_unit_disk(rng, len(s))
+        offset = rd[:, :1] * self.u + rd[:, 1:2] * self.v
+        origins = self.origin + offset
+        directions = self.lower_left_corner + s[:, None] * self.horizontal + t[:, None] * self.vertical - origins
+        return origins, directions
+
+
+def dot(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return np.einsum('ij,ij->i', a, b)
+
+
+def unit_vector(v: np.ndarray) -> np.ndarray:
+    return v / np.sqrt(dot(v, v))[:, None]
+
+
+def random_unit_vector(rng: np.random.Generator, n: int) -> np.ndarray:
+    # normalized gaussian is uniform on the sphere, no rejection loop needed
+    return unit_vector(rng.standard_normal((n, 3)))
+
+
+def random_in_unit_sphere(rng: np.random.Generator, n: int) -> np.ndarray:
+    return random_unit_vector(rng, n) * np.cbrt(rng.random(n))[:, None]
+
+
+def random_in_unit_disk(rng: np.random.Generator, n: int) -> np.ndarray:
+    r = np.sqrt(rng.random(n))
+    phi = 2 * np.pi * rng.random(n)
+    return np.stack((r * np.cos(phi), r * np.sin(phi)), axis=1)
+
+
+def reflect(v: np.ndarray, n: np.ndarray) -> np.ndarray:
+    return v - 2 * dot(v, n)[:, None] * n
+
+
+def refract(uv: np.ndarray, n: np.ndarray, etai_over_etat: np.ndarray) -> np.ndarray:
+    cos_theta = np.minimum(-dot(uv, n), 1.0)
+    r_out_perp = etai_over_etat[:, None] * (uv + cos_theta[:, None] * n)
+    r_out_parallel = -np.sqrt(np.abs(1.0 - dot(r_out_perp, r_out_perp)))[:, None] * n
+    return r_out_perp + r_out_parallel
+
+
+def hit_spheres(scene: SceneArrays, origins: np.ndarray, directions: np.ndarray, t_min: float, t_max: float) -> Tuple[np.ndarray, np.ndarray]:
+    # returns closest t and sphere index per ray, index -1 on a miss
+    n_rays = len(origins)
+    closest_t = np.full(n_rays, t_max)
+    closest_idx = np.full(n_rays, -1, dtype=np.int64)
+    n_spheres = len(scene.radii)
+    if n_spheres == 0:
+        return closest_t, closest_idx
+    chunk = max(1, MAX_PAIRS_PER_CHUNK // n_spheres)
+    r2 = scene.radii * scene.radii
+    for start in range(0, n_rays, chunk):
+        stop = min(start + chunk, n_rays)
+        o = origins[start:stop]
+        d = directions[start:stop]
+        oc = o[:, None, :] - scene.centers[None, :, :]
+        a = dot(d, d)[:, None]
+        half_b = np.einsum('ijk,ik->ij', oc, d)
+        c = np.einsum('ijk,ijk->ij', oc, oc) - r2
+        discriminant = half_b * half_b - a * c
+        hit = discriminant >= 0
+        sqrtd = np.sqrt(np.where(hit, discriminant, 0.0))
+        # nearest root in range, falling back to the far root like Sphere.hit
+        root = (-half_b - sqrtd) / a
+        near_ok = hit & (root >= t_min) & (root <= t_max)
+        far = (-half_b + sqrtd) / a
+        far_ok = hit & ~near_ok & (far >= t_min) & (far <= t_max)
+        root = np.where(near_ok, root, np.where(far_ok, far, np.inf))
+        idx = np.argmin(root, axis=1)
+        t = root[np.arange(stop - start), idx]
+        found = np.isfinite(t)
+        closest_t[start:stop] = np.where(found, t, t_max)
+        closest_idx[start:stop] = np.where(found, idx, -1)
+    return closest_t, closest_idx
+
+
+def sky_color(directions: np.ndarray) -> np.ndarray:
+    unit_direction = unit_vector(directions)
+    t = 0.5 * (unit_direction[:, 1:2] + 1.0)
+    return (1.0 - t) * np.array([1.0, 1.0, 1.0]) + t * np.array([0.5, 0.7, 1.0])
+
+
+def trace(scene: SceneArrays, origins: np.ndarray, directions: np.ndarray, pixel: np.ndarray, n_pixels: int, max_depth: int, rng: np.random.Generator) -> np.ndarray:
+    # wavefront version of generate.ray_color: every depth step advances all live paths at once
+    accum = np.zeros((n_pixels, 3))
+    throughput = np.ones((len(origins), 3))
+    for _ in range(max_depth):
+        if len(origins) == 0:
+            break
+        t, idx = hit_spheres(scene, origins, directions, 0.001, np.inf)
+        missed = idx < 0
+        if missed.any():
+            sky = throughput[missed] * sky_color(directions[missed])
+            for channel in range(3):
+                accum[:, channel] += np.bincount(pixel[missed], weights=sky[:, channel], minlength=n_pixels)
+
+        # compact out escaped paths before scattering
+        alive = ~missed
+        origins, directions, throughput, pixel = origins[alive], directions[alive], throughput[alive], pixel[alive]
+        t, idx = t[alive], idx[alive]
+        n = len(idx)
+        if n == 0:
+            break
+
+        points = origins + t[:, None] * directions
+        outward_normal = (points - scene.centers[idx]) / scene.radii[idx][:, None]
+        front_face = dot(directions, outward_normal) < 0
+        normal = np.where(front_face[:, None], outward_normal, -outward_normal)
+        kind = scene.kind[idx]
+        scattered = np.empty_like(directions)
+        alive = np.ones(n, dtype=bool)
+
+        lambertian = kind == LAMBERTIAN
+        if lambertian.any():
+            nl = normal[lambertian]
+            direction = nl + random_unit_vector(rng, len(nl))
+            near_zero = np.all(np.abs(direction) < 1e-8, axis=1)
+            direction[near_zero] = nl[near_zero]
+            scattered[lambertian] = direction
+
+        metal = kind == METAL
+        if metal.any():
+            nm = normal[metal]
+            reflected = reflect(unit_vector(directions[metal]), nm)
+            direction = reflected + scene.fuzz[idx[metal]][:, None] * random_in_unit_sphere(rng, len(nm))
+            scattered[metal] = direction
+            alive[metal] = dot(direction, nm) > 0
+
+        dielectric = kind == DIELECTRIC
+        if dielectric.any():
+            nd = normal[dielectric]
+            ior = scene.ior[idx[dielectric]]
+            refraction_ratio = np.where(front_face[dielectric], 1.0 / ior, ior)
+            unit_direction = unit_vector(directions[dielectric])
+            cos_theta = np.minimum(-dot(unit_direction, nd), 1.0)
+            sin_theta = np.sqrt(1.0 - cos_theta * cos_theta)
+            r0 = ((1 - refraction_ratio) / (1 + refraction_ratio)) ** 2
+            reflectance = r0 + (1 - r0) * (1 - cos_theta) ** 5
+            do_reflect = (refraction_ratio * sin_theta > 1.0) | (reflectance > rng.random(len(nd)))
+            scattered[dielectric] = np.where(
+                do_reflect[:, None],
+                reflect(unit_direction, nd),
+                refract(unit_direction, nd, refraction_ratio),
+            )
+
+        # dielectric albedo is stored as 1 so the multiply is uniform across kinds
+        throughput = throughput * scene.albedo[idx]
+        origins, directions = points[alive], scattered[alive]
+        throughput, pixel = throughput[alive], pixel[alive]
+    return accum
+
+
+# pixels of [x0, x1) x [y0, y1), row by row, summed over samples, and the samples per pixel, like generate.render_tile
+def render_tile(width: int, height: int, samples_per_pixel: int, camera: CameraArrays, scene: SceneArrays, x0: int, y0: int, x1: int, y1: int, max_depth: int = 50, rng: Optional[np.random.Generator] = None) -> Tuple[List[Vec3], List[int]]:
+    # drawn from the shared generator so scheduler seeding covers this engine too
+    rng = rng if rng is not None else np.random.default_rng(rtweekend.thread_rng().getrandbits(64))
+    tile_width = x1 - x0
+    n_pixels = tile_width * (y1 - y0)
+    pixel = np.repeat(np.arange(n_pixels), samples_per_pixel)
+    u = (x0 + pixel % tile_width + rng.random(len(pixel))) / (width - 1)
+    v = (y0 + pixel // tile_width + rng.random(len(pixel))) / (height - 1)
+    origins, directions = camera.get_rays(u, v, rng)
+    accum = trace(scene, origins, directions, pixel, n_pixels, max_depth, rng)
+    # summed, like the scalar path, so write_color(samples_per_pixel) still applies
+    return [Color(*c) for c in accum.tolist()], [samples_per_pixel] * n_pixels
+
+
+def render_row(width: int, height: int, samples_per_pixel: int, camera: CameraArrays, scene: SceneArrays, row: int, max_depth: int = 50, rng: Optional[np.random.Generator] = None) -> Tuple[int, List[Vec3]]:
+    return row, render_tile(width, height, samples_per_pixel, camera, scene, 0, row, width, row + 1, max_depth, rng)[0]